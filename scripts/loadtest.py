@@ -0,0 +1,135 @@
+"""Headless load test for the v2 app: N concurrent sessions through the whole flow.
+
+Every simulated session runs wizard_1 -> wizard_2 -> wizard_3 -> executive ->
+professional (one randomly chosen scenario) with randomized wizard inputs,
+using Streamlit's AppTest. AppTest is not thread-safe (it patches sys.path
+and the runtime singleton), so concurrent sessions run in worker processes,
+each used for one batch of sessions only (max_tasks_per_child, Python 3.11+);
+within a batch, consecutive sessions share the process-wide caches as they
+would on one Streamlit server.
+
+Reports latency percentiles per step, and CPU time and RSS growth per session
+(measured inside the worker, which runs one session at a time). RSS uses
+psutil if installed, else the peak RSS from the resource module.
+
+    python scripts/loadtest.py --sessions 20 --parallel 4
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "v2", "mortgage-calculator-app.py")
+SCHRITTE = ["wizard_1", "wizard_2", "wizard_3", "executive", "professional"]
+SZENARIEN = [
+    "Immobilienkauf (innerhalb Familie)",
+    "Neubau (Investitions-Immobilie)",
+    "Immobilien-Portfolio (mehrere Objekte)",
+    "ETF-Sparplan (Alternative)",
+]
+
+
+def _rss_mb() -> float:
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2**20
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    return float("nan")
+
+
+def _klick(at: AppTest, label: str):
+    next(b for b in at.button if b.label == label).click().run()
+
+
+def sitzung(nummer: int, seed: int, timeout: float) -> dict:
+    """Run one session through all steps; returns seconds per step, CPU, RSS growth and exceptions."""
+    rss_vorher, cpu_vorher = _rss_mb(), time.process_time()
+    rng = random.Random(seed + nummer)
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    zeiten = {}
+
+    def schritt(name, aktion):
+        t0 = time.perf_counter()
+        aktion()
+        zeiten[name] = time.perf_counter() - t0
+
+    def wizard_1():
+        at.run()
+        at.number_input(key="v2_ek_a_input").set_value(rng.randrange(0, 400_001, 5_000))
+        at.number_input(key="v2_einkommen_a_input").set_value(rng.randrange(30_000, 200_001, 1_000))
+        at.number_input(key="v2_geschenk_a_input").set_value(rng.randrange(0, 500_001, 5_000))
+        _klick(at, "Weiter →")
+
+    def wizard_2():
+        at.number_input(key="v2_kaufpreis_input").set_value(rng.randrange(300_000, 2_000_001, 10_000))
+        at.number_input(key="v2_kaltmiete_input").set_value(rng.randrange(500, 5_001, 50))
+        at.slider(key="v2_etf_rendite_input").set_value(round(rng.uniform(3.0, 9.0), 1))
+        _klick(at, "Weiter →")
+
+    schritt("wizard_1", wizard_1)
+    schritt("wizard_2", wizard_2)
+    schritt("wizard_3", lambda: _klick(at, "Berechnen"))
+    schritt("executive", lambda: _klick(at, "Zeige ausführliche Berechnung und Daten →"))
+    schritt("professional", lambda: at.sidebar.radio(key="v2_szenario").set_value(rng.choice(SZENARIEN)).run())
+    return {"zeiten": zeiten, "cpu": time.process_time() - cpu_vorher, "rss": _rss_mb() - rss_vorher,
+            "fehler": [str(e.value) for e in at.exception]}
+
+
+def _worker(nummern: list, seed: int, timeout: float) -> list:
+    # one task per worker process (max_tasks_per_child=1): AppTest replaces __main__, so a
+    # reused process could not unpickle another task
+    return [sitzung(n, seed, timeout) for n in nummern]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sessions", type=int, default=10, help="Number of simulated sessions.")
+    parser.add_argument("--parallel", type=int, default=4, help="Sessions running at the same time.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds per script run.")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.parallel, max_tasks_per_child=1) as pool:
+        teile = [list(range(w, args.sessions, args.parallel)) for w in range(args.parallel)]
+        ergebnisse = [e for teil in pool.map(_worker, teile, [args.seed] * args.parallel,
+                                             [args.timeout] * args.parallel) for e in teil]
+    dauer = time.perf_counter() - t0
+
+    print(f"{args.sessions} Sitzungen, {args.parallel} parallel, {dauer:.1f} s gesamt "
+          f"({args.sessions / dauer:.2f} Sitzungen/s)")
+    print(f"{'Schritt':14s}{'p50':>8s}{'p90':>8s}{'p99':>8s}{'max':>8s}  (s)")
+    zeilen = {name: [e["zeiten"][name] for e in ergebnisse] for name in SCHRITTE}
+    zeilen["gesamt"] = [sum(e["zeiten"].values()) for e in ergebnisse]
+    zeilen["CPU"] = [e["cpu"] for e in ergebnisse]
+    for name, werte in zeilen.items():
+        p50, p90, p99 = np.percentile(werte, [50, 90, 99])
+        print(f"{name:14s}{p50:8.2f}{p90:8.2f}{p99:8.2f}{max(werte):8.2f}")
+    rss = np.array([e["rss"] for e in ergebnisse])
+    print(f"RSS-Zuwachs je Sitzung (MiB): Median {np.median(rss):.1f}, max {rss.max():.1f}"
+          + ("" if psutil is not None else " (Spitzen-RSS; psutil nicht installiert)"))
+
+    fehler = [f for e in ergebnisse for f in e["fehler"]]
+    for f in fehler[:5]:
+        print("Fehler:", f[:500])
+    sys.exit(1 if fehler else 0)
+
+
+if __name__ == "__main__":
+    main()
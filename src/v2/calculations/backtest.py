@@ -0,0 +1,284 @@
+"""Historical rolling-window backtest of the ETF Sparplan.
+
+A local CSV of monthly index returns (or index levels) is turned into the
+cumulative product G of (1 + r). For a Sparplan starting after month s, the
+depot value after h months is
+
+    G[s+h] * (K0 / G[s] + c * (S[s+h] - S[s])),   S = cumsum(1 / G),
+
+so every start month and every horizon is a lookup into G and S. The yearly
+growth factors and contribution values of all windows are built that way in
+one array operation and then taxed with etf_steuer.sparplan_pfade.
+
+The block bootstrap resamples the same series in circular blocks of months.
+Paths are generated and taxed in chunks of a bounded size; only per-year
+histograms of the Netto-Vermögen (relative to the paid-in capital, on a log
+grid) are kept, from which the percentiles are read at the end. It runs as
+a background job (hintergrund) with a progress bar.
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import altair as alt
+
+from calculations import etf_steuer, hintergrund
+
+_QUANTILE = [0.05, 0.25, 0.5, 0.75, 0.95]
+NETTO = "Netto Vermögen (n. St.)"
+
+N_PFADE = 100_000
+CHUNK = 2_000
+# Log grid of Netto / Eingezahlt for the streamed histograms (≈0.35 % per bin)
+_LOG_RASTER = np.linspace(np.log(1e-3), np.log(1e3), 4_001)
+
+
+def lade_renditen(datei) -> pd.Series:
+    """Monthly returns (decimal) from a CSV with a date column and a return or index-level column.
+
+    The last numeric column is used. Values are read as index levels if all
+    are positive and their median is above 2, as percent if any absolute
+    value exceeds 1, otherwise as decimal returns. Accepts ',' or ';' as
+    separator and a decimal comma.
+    """
+    roh = datei.getvalue() if hasattr(datei, "getvalue") else open(datei, "rb").read()
+    text = roh.decode("utf-8-sig") if isinstance(roh, bytes) else roh
+    sep = ";" if text.count(";") > text.count(",") else ","
+    df = pd.read_csv(io.StringIO(text), sep=sep, decimal="," if sep == ";" else ".")
+    werte = df.apply(pd.to_numeric, errors="coerce")
+    spalte = [c for c in werte.columns if werte[c].notna().mean() > 0.9][-1]
+    serie = werte[spalte].dropna()
+    index = pd.to_datetime(df.loc[serie.index, df.columns[0]], errors="coerce")
+    if index.notna().all():
+        serie.index = index
+
+    if (serie > 0).all() and serie.median() > 2:
+        serie = serie.pct_change().dropna()
+    elif serie.abs().max() > 1:
+        serie = serie / 100
+    return serie.astype(float)
+
+
+def rolling_sparplan(renditen, startkapital: float, sparrate: float, jahre: int, **steuer) -> dict:
+    """Taxed Sparplan for every start month with at least *jahre* years of data.
+
+    Returns (W, jahre) arrays keyed by the ETF table columns plus 'start'
+    (W,), the month index of each window's start.
+    """
+    r = np.asarray(renditen, dtype=float)
+    monate = 12 * jahre
+    n_fenster = len(r) - monate + 1
+    if n_fenster < 1:
+        raise ValueError(f"Zu wenige Daten: {len(r)} Monate für {jahre} Jahre.")
+
+    G = np.concatenate([[1.0], np.cumprod(1 + r)])
+    S = np.concatenate([[0.0], np.cumsum(1 / G[1:])])
+
+    start = np.arange(n_fenster)
+    grenzen = start[:, None] + 12 * np.arange(jahre + 1)[None, :]  # (W, jahre + 1) month index at year ends
+    wachstum = G[grenzen[:, 1:]] / G[grenzen[:, :-1]]
+    sparraten_endwert = sparrate * G[grenzen[:, 1:]] * (S[grenzen[:, 1:]] - S[grenzen[:, :-1]])
+
+    res = etf_steuer.sparplan_pfade(startkapital, wachstum, sparraten_endwert, sparrate, **steuer)
+    res["start"] = start
+    return res
+
+
+def _jahreswerte(renditen: np.ndarray, sparrate: float) -> tuple:
+    """Yearly growth factors and contribution end values (P, T) of monthly return paths (P, 12 T)."""
+    g = (1 + renditen).reshape(renditen.shape[0], -1, 12)
+    rest = np.cumprod(g[..., ::-1], axis=-1)[..., ::-1]  # growth from month m to year end
+    return rest[..., 0], sparrate * (1 + rest[..., 1:].sum(axis=-1))
+
+
+def bootstrap_sparplan(renditen, startkapital: float, sparrate: float, jahre: int, *, n_pfade: int = N_PFADE,
+                       blocklaenge: int = 12, vergleich=None, chunk: int = CHUNK, seed: int = 42,
+                       quantile=_QUANTILE, fortschritt=None, **steuer) -> dict:
+    """Percentiles of the taxed Netto-Vermögen over *n_pfade* block-bootstrapped paths.
+
+    Returns 'quantile' (len(quantile), jahre), 'mittel' (jahre,), the paid-in
+    capital 'eingezahlt' (jahre,) and, with a *vergleich* value (scalar or
+    (jahre,)), 'p_vergleich' (jahre,): the share of paths above it. Memory is
+    bounded by *chunk* paths at a time. *fortschritt(anteil)* is called after
+    every chunk.
+    """
+    r = np.asarray(renditen, dtype=float)
+    if len(r) < blocklaenge:
+        raise ValueError(f"Zu wenige Daten: {len(r)} Monate für Blöcke von {blocklaenge} Monaten.")
+    monate = 12 * jahre
+    n_bloecke = -(-monate // blocklaenge)
+    rng = np.random.default_rng(seed)
+    breite = _LOG_RASTER[1] - _LOG_RASTER[0]
+    n_bins = len(_LOG_RASTER) - 1
+
+    zaehler = np.zeros(jahre * n_bins, dtype=np.int64)
+    summe = np.zeros(jahre)
+    ueber = np.zeros(jahre)
+    eingezahlt = None
+    for beginn in range(0, n_pfade, chunk):
+        c = min(chunk, n_pfade - beginn)
+        anfang = rng.integers(0, len(r), (c, n_bloecke, 1))
+        monat = ((anfang + np.arange(blocklaenge)) % len(r)).reshape(c, -1)[:, :monate]
+        wachstum, sparraten_endwert = _jahreswerte(r[monat], sparrate)
+        res = etf_steuer.sparplan_pfade(startkapital, wachstum, sparraten_endwert, sparrate, **steuer)
+        netto = res[NETTO]
+        eingezahlt = np.maximum(res["Eingezahltes Kapital"][0], 1.0)
+
+        log_anteil = np.log(np.maximum(netto / eingezahlt, 1e-12))
+        bins = np.clip(((log_anteil - _LOG_RASTER[0]) / breite).astype(np.int64), 0, n_bins - 1)
+        zaehler += np.bincount((bins + n_bins * np.arange(jahre)).ravel(), minlength=jahre * n_bins)
+        summe += netto.sum(axis=0)
+        if vergleich is not None:
+            ueber += (netto > vergleich).sum(axis=0)
+        if fortschritt is not None:
+            fortschritt((beginn + c) / n_pfade)
+
+    # percentiles from the cumulative histogram, linear within a bin
+    zaehler = zaehler.reshape(jahre, n_bins)
+    cdf = np.cumsum(zaehler, axis=1) / n_pfade
+    werte = np.empty((len(quantile), jahre))
+    for t in range(jahre):
+        i = np.minimum(np.searchsorted(cdf[t], quantile), n_bins - 1)
+        vorher = np.where(i > 0, cdf[t, i - 1], 0.0)
+        anteil = (np.asarray(quantile) - vorher) / np.maximum(cdf[t, i] - vorher, 1e-12)
+        werte[:, t] = np.exp(_LOG_RASTER[i] + np.clip(anteil, 0, 1) * breite) * eingezahlt[t]
+
+    out = {"quantile": werte, "mittel": summe / n_pfade, "eingezahlt": eingezahlt}
+    if vergleich is not None:
+        out["p_vergleich"] = ueber / n_pfade
+    return out
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _bootstrap_cached(renditen: pd.Series, startkapital: float, sparrate: float, jahre: int, n_pfade: int,
+                      blocklaenge: int, vergleich: float, basiszins: float, teilfreistellung: float,
+                      personen: int, _fortschritt=None) -> dict:
+    return bootstrap_sparplan(renditen.to_numpy(), startkapital, sparrate, jahre, n_pfade=n_pfade,
+                              blocklaenge=blocklaenge, vergleich=vergleich, fortschritt=_fortschritt,
+                              basiszins=basiszins, teilfreistellung=teilfreistellung, personen=personen)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _backtest_cached(renditen: pd.Series, startkapital: float, sparrate: float, jahre: int, basiszins: float,
+                     teilfreistellung: float, personen: int) -> dict:
+    return rolling_sparplan(renditen.to_numpy(), startkapital, sparrate, jahre, basiszins=basiszins,
+                            teilfreistellung=teilfreistellung, personen=personen)
+
+
+def render_backtest_tab(p: dict, df_projektion: pd.DataFrame):
+    """ETF tab: upload a return series and show the rolling-window distribution."""
+    st.subheader("Historischer Backtest (rollierende Startmonate)")
+    datei = st.file_uploader(
+        "CSV mit monatlichen Indexrenditen oder Indexständen",
+        type=["csv", "txt"], key="etf_backtest_csv",
+        help="Erste Spalte Datum, letzte numerische Spalte Rendite (dezimal oder %) bzw. Indexstand.",
+    )
+    if datei is None:
+        st.info("Bitte eine lokale CSV-Datei hochladen, z.B. monatliche MSCI-World-Renditen.")
+        return
+
+    try:
+        renditen = lade_renditen(datei)
+        res = _backtest_cached(renditen, float(p["startkapital_gesamt"]), float(p["etf_sparrate"]),
+                               int(p["laufzeit_etf"]), float(p["basiszins"]), float(p["teilfreistellung"]),
+                               int(p["personen"]))
+    except (ValueError, IndexError, KeyError) as e:
+        st.error(f"Backtest nicht möglich: {e}")
+        return
+
+    netto = res["Netto Vermögen (n. St.)"]
+    jahre = netto.shape[1]
+    starts = renditen.index[res["start"]]
+    start_label = starts.strftime("%Y-%m") if isinstance(starts, pd.DatetimeIndex) else starts.astype(str)
+
+    ende = netto[:, -1]
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Startmonate", f"{len(ende):,}", help=f"{len(renditen):,} Monate Daten")
+    m2.metric("Schlechtester Start", f"{ende.min():,.0f} €", help=f"Start {start_label[int(ende.argmin())]}")
+    m3.metric("Median", f"{np.median(ende):,.0f} €")
+    m4.metric("Bester Start", f"{ende.max():,.0f} €", help=f"Start {start_label[int(ende.argmax())]}")
+    if not df_projektion.empty:
+        ziel = df_projektion.iloc[-1]["Netto Vermögen (n. St.)"]
+        st.caption(f"Konstante Rendite ({p['etf_rendite']} %) ergibt {ziel:,.0f} € — "
+                   f"erreicht oder übertroffen in {(ende >= ziel).mean():.0%} der historischen Startmonate.")
+
+    q = np.quantile(netto, _QUANTILE, axis=0)
+    band = pd.DataFrame({"Jahr": np.arange(1, jahre + 1), "P5": q[0], "P25": q[1], "Median": q[2], "P75": q[3],
+                         "P95": q[4], "Eingezahlt": res["Eingezahltes Kapital"][0]})
+    basis = alt.Chart(band).encode(x=alt.X("Jahr:O", title="Anlagehorizont (Jahre)"))
+    chart = (
+        basis.mark_area(opacity=0.2).encode(y=alt.Y("P5:Q", title="Netto Vermögen (€)"), y2="P95:Q")
+        + basis.mark_area(opacity=0.35).encode(y="P25:Q", y2="P75:Q")
+        + basis.mark_line(point=True).encode(
+            y="Median:Q",
+            tooltip=[alt.Tooltip("Jahr"), *[alt.Tooltip(f"{c}:Q", format=",.0f") for c in ["P5", "Median", "P95"]]],
+        )
+        + basis.mark_line(strokeDash=[4, 4], color="gray").encode(y="Eingezahlt:Q")
+    ).properties(height=380, title="Netto-Vermögen je Horizont über alle Startmonate (90 %- und 50 %-Band)")
+    st.altair_chart(chart, use_container_width=True)
+    st.dataframe(band.set_index("Jahr").style.format("{:,.0f}"), use_container_width=True)
+    st.caption("Versteuert wie die Projektion (Vorabpauschale jährlich, Liquidation am jeweiligen Horizont). "
+               "Werte nominal.")
+
+    st.markdown("---")
+    _render_bootstrap(renditen, p, df_projektion)
+
+
+def _render_bootstrap(renditen: pd.Series, p: dict, df_projektion: pd.DataFrame):
+    """Block-bootstrap section of the backtest tab, incl. P(ETF schlägt Immobilie)."""
+    st.subheader("Block-Bootstrap (Monte Carlo)")
+    immo = st.session_state.get("v2_results", {}).get("immo", {})
+    standard_vergleich = immo.get("endvermoegen") or (
+        float(df_projektion.iloc[-1][NETTO]) if not df_projektion.empty else 0.0)
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        n_pfade = st.select_slider("Anzahl Pfade", [10_000, 25_000, 50_000, 100_000], value=N_PFADE,
+                                   key="etf_bootstrap_pfade")
+    with c2:
+        blocklaenge = st.number_input("Blocklänge (Monate)", 1, 120, 12, 1, key="etf_bootstrap_block",
+                                      help="Zusammenhängende Monate je Ziehung; erhält Momentum und Crash-Phasen.")
+    with c3:
+        vergleich = st.number_input("Vermögen Immobilie zum Vergleich (€)", 0.0, 1e9, float(standard_vergleich),
+                                    10_000.0, key="etf_bootstrap_vergleich",
+                                    help="Standard: Endvermögen Immobilie aus der Executive Overview.")
+
+    try:
+        bs = hintergrund.im_hintergrund(
+            "etf_bootstrap", _bootstrap_cached, text=f"Simuliere {n_pfade:,} Pfade …", renditen=renditen,
+            startkapital=float(p["startkapital_gesamt"]), sparrate=float(p["etf_sparrate"]),
+            jahre=int(p["laufzeit_etf"]), n_pfade=int(n_pfade), blocklaenge=int(blocklaenge),
+            vergleich=float(vergleich), basiszins=float(p["basiszins"]),
+            teilfreistellung=float(p["teilfreistellung"]), personen=int(p["personen"]))
+    except ValueError as e:
+        st.error(f"Bootstrap nicht möglich: {e}")
+        return
+    if bs is None:
+        return
+
+    q = bs["quantile"]
+    jahre = q.shape[1]
+    m1, m2, m3 = st.columns(3)
+    m1.metric("P(ETF schlägt Immobilie)", f"{bs['p_vergleich'][-1]:.0%}",
+              help=f"Anteil der Pfade mit Netto-Vermögen nach {jahre} Jahren über {vergleich:,.0f} €.")
+    m2.metric("Median Netto-Vermögen", f"{q[2, -1]:,.0f} €")
+    m3.metric("5 %-Quantil", f"{q[0, -1]:,.0f} €", help="In 95 % der Pfade liegt das Ergebnis darüber.")
+
+    band = pd.DataFrame({"Jahr": np.arange(1, jahre + 1), "P5": q[0], "P25": q[1], "Median": q[2], "P75": q[3],
+                         "P95": q[4], "Mittelwert": bs["mittel"], "P(> Vergleich)": bs["p_vergleich"]})
+    basis = alt.Chart(band).encode(x=alt.X("Jahr:O", title="Anlagehorizont (Jahre)"))
+    chart = (
+        basis.mark_area(opacity=0.2).encode(y=alt.Y("P5:Q", title="Netto Vermögen (€)"), y2="P95:Q")
+        + basis.mark_area(opacity=0.35).encode(y="P25:Q", y2="P75:Q")
+        + basis.mark_line(point=True).encode(
+            y="Median:Q",
+            tooltip=[alt.Tooltip("Jahr"), *[alt.Tooltip(f"{c}:Q", format=",.0f") for c in ["P5", "Median", "P95"]],
+                     alt.Tooltip("P(> Vergleich):Q", format=".0%")],
+        )
+    ).properties(height=380, title=f"Netto-Vermögen über {n_pfade:,} Bootstrap-Pfade (90 %- und 50 %-Band)")
+    st.altair_chart(chart, use_container_width=True)
+    st.caption(f"Monatsrenditen in Blöcken von {blocklaenge} Monaten aus {len(renditen):,} historischen Monaten "
+               "gezogen (zirkulär). Perzentile aus einem laufend gefüllten Histogramm (Auflösung ≈0,35 %). "
+               "Werte nominal.")
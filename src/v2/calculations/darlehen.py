@@ -0,0 +1,157 @@
+"""Loan portfolio: several tranches (Bank-Annuität, KfW, Bauspar) amortized together.
+
+Every tranche is an annuity loan with its own Zinssatz, anfängliche Tilgung
+and tilgungsfreie Anlaufjahre (interest only). All tranches of all variants
+are held in one (V, K) state array, so the yearly recurrence is a handful of
+array operations regardless of the number of tranches.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from calculations import formulas
+from calculations.state_management import persistent_data_editor
+
+TRANCHEN_TYPEN = ["KfW", "Bauspar", "Annuität"]
+TRANCHEN_SPALTEN = ["Typ", "Betrag (€)", "Zinssatz (%)", "Tilgung (%)", "Tilgungsfreie Jahre"]
+
+
+def tranchen_plan(betrag, zinssatz, tilgung, tilgungsfrei=0, max_laufzeit=80):
+    """Annual schedule of a loan portfolio, summed over its tranches.
+
+    Inputs are scalars, (K,) arrays of tranches or (V, K) arrays of variants
+    x tranches. A tranche runs while its Restschuld is above 1 €; during its
+    tilgungsfreie Jahre only interest is paid, afterwards the payment is the
+    register's 'Monatliche Rate' formula (the annuity Betrag * (Zins +
+    Tilgung), in the last year only Zins plus Restschuld). Returns (V, T) arrays 'zins', 'tilgung', 'rate',
+    'restschuld', the mask 'aktiv' (any tranche running), 'laufzeit' (V,),
+    the full annual annuity 'jaehrliche_rate' (V,) and the
+    amount-weighted 'zinssatz' (V,) in % p.a.
+    """
+    arrays = [np.atleast_2d(np.asarray(x, dtype=float)) for x in (betrag, zinssatz, tilgung, tilgungsfrei)]
+    form = np.broadcast_shapes(*(a.shape for a in arrays))
+    restschuld, zins_pa, tilg_pa, frei = (np.broadcast_to(a, form).copy() for a in arrays)
+    zins_pa /= 100
+    tilg_pa /= 100
+    annuitaet = restschuld * (zins_pa + tilg_pa)
+    n = form[0]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zinssatz_mittel = np.where(
+            restschuld.sum(axis=1) > 0, (restschuld * zins_pa).sum(axis=1) / restschuld.sum(axis=1), 0.0
+        ) * 100
+    jaehrliche_rate = annuitaet.sum(axis=1)
+
+    zins = np.full((n, max_laufzeit), np.nan)
+    tilg = np.full((n, max_laufzeit), np.nan)
+    rest = np.full((n, max_laufzeit), np.nan)
+    aktiv = np.zeros((n, max_laufzeit), dtype=bool)
+
+    rate = formulas.funktion("rate")
+    t_max = 0
+    for j in range(max_laufzeit):
+        a = restschuld > 1.0
+        if not a.any():
+            break
+        t_max = j + 1
+        z = np.where(a, restschuld * zins_pa, 0.0)
+        t = np.where(a & (j >= frei), rate(annuitaet, z, restschuld) - z, 0.0)
+        restschuld = restschuld - t
+        a_v = a.any(axis=1)
+        aktiv[:, j] = a_v
+        zins[:, j] = np.where(a_v, z.sum(axis=1), np.nan)
+        tilg[:, j] = np.where(a_v, t.sum(axis=1), np.nan)
+        rest[:, j] = np.where(a_v, restschuld.sum(axis=1), np.nan)
+
+    return {
+        "zins": zins[:, :t_max],
+        "tilgung": tilg[:, :t_max],
+        "rate": zins[:, :t_max] + tilg[:, :t_max],
+        "restschuld": rest[:, :t_max],
+        "aktiv": aktiv[:, :t_max],
+        "laufzeit": aktiv.sum(axis=1),
+        "jaehrliche_rate": jaehrliche_rate,
+        "zinssatz": zinssatz_mittel,
+    }
+
+
+def weitere_tranchen(records) -> dict | None:
+    """Parse the sidebar tranche table (list of row dicts) into (K,) arrays.
+
+    Rows without Betrag are ignored; returns None if no tranche remains.
+    """
+    zeilen = [
+        r for r in (records or [])
+        if r.get("Betrag (€)") is not None and np.isfinite(float(r["Betrag (€)"])) and float(r["Betrag (€)"]) > 0
+    ]
+    if not zeilen:
+        return None
+
+    def spalte(name, default):
+        werte = [r.get(name) for r in zeilen]
+        return np.array([default if w is None or not np.isfinite(float(w)) else float(w) for w in werte])
+
+    return {
+        "betrag": spalte("Betrag (€)", 0.0),
+        "zinssatz": spalte("Zinssatz (%)", 0.0),
+        "tilgung": spalte("Tilgung (%)", 2.0),
+        "tilgungsfrei": spalte("Tilgungsfreie Jahre", 0.0),
+    }
+
+
+def portfolio(kreditbetrag, zinssatz, tilgung, tranchen: dict | None = None) -> dict:
+    """(V, K) tranche arrays: the bank annuity loan first, then *tranchen*.
+
+    The bank loan covers whatever part of *kreditbetrag* the other tranches
+    leave open (never below zero). *kreditbetrag*, *zinssatz* and *tilgung*
+    may be per-variant (V,) arrays.
+    """
+    kreditbetrag, zinssatz, tilgung = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(x, dtype=float)) for x in (kreditbetrag, zinssatz, tilgung))
+    )
+    if not tranchen:
+        return {"betrag": kreditbetrag[:, None], "zinssatz": zinssatz[:, None], "tilgung": tilgung[:, None],
+                "tilgungsfrei": np.zeros((len(kreditbetrag), 1))}
+
+    n, k = len(kreditbetrag), len(tranchen["betrag"])
+    bank = np.maximum(kreditbetrag - tranchen["betrag"].sum(), 0.0)
+
+    def mit_bank(erste, weitere):
+        return np.column_stack([erste, np.broadcast_to(weitere, (n, k))])
+
+    return {
+        "betrag": mit_bank(bank, tranchen["betrag"]),
+        "zinssatz": mit_bank(zinssatz, tranchen["zinssatz"]),
+        "tilgung": mit_bank(tilgung, tranchen["tilgung"]),
+        "tilgungsfrei": mit_bank(np.zeros(n), tranchen["tilgungsfrei"]),
+    }
+
+
+def jaehrliche_rate(kreditbetrag, zinssatz, tilgung, tranchen: dict | None = None) -> float:
+    """Full annual annuity of the portfolio (after all tilgungsfreie Jahre)."""
+    t = portfolio(kreditbetrag, zinssatz, tilgung, tranchen)
+    return float((t["betrag"] * (t["zinssatz"] + t["tilgung"]) / 100).sum(axis=1)[0])
+
+
+def render_tranchen_editor(key: str) -> list:
+    """Sidebar table for KfW / Bauspar tranches; returns the rows as a list of dicts."""
+    st.caption("Weitere Darlehen (optional). Das Bankdarlehen deckt den restlichen Kreditbetrag.")
+    tabelle = persistent_data_editor(
+        pd.DataFrame(columns=TRANCHEN_SPALTEN).astype({c: float for c in TRANCHEN_SPALTEN[1:]}),
+        key=key,
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "Typ": st.column_config.SelectboxColumn(options=TRANCHEN_TYPEN, default="KfW", required=True),
+            "Betrag (€)": st.column_config.NumberColumn(min_value=0.0, step=1_000.0, format="%.0f"),
+            "Zinssatz (%)": st.column_config.NumberColumn(min_value=0.0, max_value=15.0, step=0.05, default=2.5,
+                                                          format="%.2f"),
+            "Tilgung (%)": st.column_config.NumberColumn(min_value=0.5, max_value=20.0, step=0.1, default=2.0,
+                                                         format="%.1f"),
+            "Tilgungsfreie Jahre": st.column_config.NumberColumn(min_value=0, max_value=10, step=1, default=0,
+                                                                 format="%d"),
+        },
+    )
+    return tabelle.to_dict("records")
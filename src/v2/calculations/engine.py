@@ -0,0 +1,289 @@
+"""Vectorized projection engine for the property scenarios.
+
+Every input is a scalar or a 1-D array with one entry per variant (V). All
+variants are projected together: the annuity recurrence runs once per year
+over a (V,) vector, every other column is computed on (V, T) arrays by the
+executable formulas of the formula register (formulas.kompiliere), so the
+displayed formulas are the computed ones. Only the formulas the requested
+*spalten* depend on are evaluated. Years after a variant's Volltilgung are
+NaN.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from calculations import darlehen, formulas
+from calculations.tax import get_steuerlast_zusammen_vec
+
+MAX_LAUFZEIT = 80
+
+# Projection column -> value of the evaluation plan (or engine input)
+_SPALTEN = {
+    "Jahr": "jahr",
+    "Einkommen (zvE)": "einkommen",
+    "Grenzsteuersatz (%)": "grenzsteuersatz",
+    "Restschuld": "restschuld",
+    "Mieteinnahmen": "miete",
+    "Instandhaltung": "instandhaltung",
+    "Mietausfall": "mietausfall",
+    "Zinsanteil": "zins",
+    "Tilgungsanteil": "tilgungsanteil",
+    "Monatliche Gesamtkosten": "monatliche_gesamtkosten",
+    "Monatlicher Eigenaufwand": "monatlicher_eigenaufwand",
+    "AfA": "afa",
+    "Steuerersparnis": "steuerersparnis",
+    "Cashflow": "cashflow",
+    "Hauswert": "hauswert",
+    "Vermögen": "vermoegen",
+    "Zuwachs Vermögen": "zuwachs_vermoegen",
+    "Vorfälligkeitsentschädigung (Exit)": "vfe",
+    "Netto-Erlös bei Verkauf (Exit)": "netto_erloes",
+    "Scheidung: Ausgleichszahlung": "scheidung",
+    "Buchwert (steuerlich)": "buchwert",
+    "zvE Haushalt (mit V+V)": "zve_haushalt",
+}
+_EINGABEN = [
+    "jahr", "einkommen", "ek_a", "ek_b", "restschuld", "zins", "tilgungsanteil", "rate", "miete_pm",
+    "mietsteigerung_pa", "instandhaltung_pa", "kostensteigerung_pa", "mietausfall_pa", "wertsteigerung_pa",
+    "anfangswert", "anschaffungskosten", "kreditbetrag", "startkapital", "zugewinn_ausgleich", "anteil_a",
+    "anteil_b", "zinsbindung", "marktzins_verkauf", "verkaufskosten_prozent",
+]
+
+
+@lru_cache(maxsize=64)
+def _plan(spalten: tuple, afa_gegeben: bool) -> tuple:
+    # a given AfA schedule is an input; otherwise the plan computes it from kaufpreis / anteil_grundstueck
+    eingaben = [*_EINGABEN, "afa"] if afa_gegeben else [*_EINGABEN, "kaufpreis", "anteil_grundstueck"]
+    return formulas.kompiliere([_SPALTEN[s] for s in spalten], eingaben)
+
+
+def _vec(x, n):
+    """Broadcast a scalar / sequence to a float array of length *n*."""
+    return np.broadcast_to(np.asarray(x, dtype=float), (n,)).copy()
+
+
+def _n_varianten(*args):
+    return max(np.size(a) for a in args)
+
+
+def tilgungsplan(kreditbetrag, zinssatz, tilgung, max_laufzeit=MAX_LAUFZEIT, tranchen=None):
+    """Annual annuity schedule for V loans at once.
+
+    Mirrors the scenario loop: the year runs while the Restschuld is above 1 €,
+    the last Tilgung is capped at the Restschuld. Additional *tranchen* (see
+    darlehen.weitere_tranchen) are amortized alongside the bank loan, which
+    then only covers the rest of *kreditbetrag*. Returns a dict with (V, T)
+    arrays 'zins', 'tilgung', 'rate', 'restschuld', the boolean mask 'aktiv',
+    the number of years until Volltilgung 'laufzeit' (V,), the annual
+    annuity 'jaehrliche_rate' (V,) and the mean 'zinssatz' (V,).
+    """
+    n = _n_varianten(kreditbetrag, zinssatz, tilgung)
+    t = darlehen.portfolio(_vec(kreditbetrag, n), _vec(zinssatz, n), _vec(tilgung, n), tranchen)
+    return darlehen.tranchen_plan(t["betrag"], t["zinssatz"], t["tilgung"], t["tilgungsfrei"], max_laufzeit)
+
+
+def projektion_batch(
+    *,
+    kreditbetrag,
+    zinssatz,
+    tilgung,
+    zinsbindung,
+    anfangswert,
+    anschaffungskosten,
+    afa=None,
+    anteil_grundstueck=0.0,
+    miete_pm,
+    mietsteigerung_pa,
+    instandhaltung_pa,
+    kostensteigerung_pa,
+    mietausfall_pa,
+    wertsteigerung_pa,
+    einkommen_a,
+    einkommen_b,
+    nutze_sonderzeitraum=False,
+    sonder_jahre=(0, 0),
+    sonder_einkommen_a=0.0,
+    sonder_einkommen_b=0.0,
+    anteil_a=1.0,
+    anteil_b=0.0,
+    startkapital=0.0,
+    zugewinn_ausgleich=False,
+    marktzins_verkauf=0.0,
+    verkaufskosten_prozent=0.0,
+    tranchen=None,
+    max_laufzeit=MAX_LAUFZEIT,
+    spalten=None,
+):
+    """Project V variants of a rental property in one pass.
+
+    *afa* is a scalar, a (T,) schedule shared by all variants or a (V, T)
+    array; if None, the register's AfA formula is evaluated on the
+    anschaffungskosten (the Kaufpreis) and *anteil_grundstueck*. *sonder_jahre* is a (von, bis) pair or a (V, 2) array. *tranchen*
+    are further loans next to the bank loan (see tilgungsplan). Returns a
+    dict of (V, T) arrays keyed by the projection column names (plus the
+    'Buchwert (steuerlich)' and 'zvE Haushalt (mit V+V)' used for the exit) and 'laufzeit', 'jaehrliche_rate'
+    and the mean contract 'zinssatz', each (V,). *spalten* restricts the
+    (V, T) arrays to these columns (default: all).
+    """
+    spalten = tuple(_SPALTEN if spalten is None else spalten)
+    n = _n_varianten(
+        kreditbetrag, zinssatz, tilgung, zinsbindung, anfangswert, miete_pm, mietsteigerung_pa,
+        instandhaltung_pa, kostensteigerung_pa, mietausfall_pa, wertsteigerung_pa, einkommen_a, einkommen_b,
+        marktzins_verkauf, verkaufskosten_prozent,
+    )
+    plan = tilgungsplan(_vec(kreditbetrag, n), _vec(zinssatz, n), _vec(tilgung, n), max_laufzeit, tranchen)
+    aktiv = plan["aktiv"]
+    t_max = aktiv.shape[1]
+    jahr = np.arange(1, t_max + 1, dtype=float)[None, :]
+    col = lambda x: _vec(x, n)[:, None]  # noqa: E731  (V, 1) for broadcasting against (V, T)
+
+    # --- Einkommen inkl. Sonderzeitraum ---
+    sonder = np.broadcast_to(np.asarray(sonder_jahre, dtype=float).reshape(-1, 2), (n, 2))
+    im_sonder = (
+        col(nutze_sonderzeitraum).astype(bool)
+        & (sonder[:, :1] <= jahr) & (jahr <= sonder[:, 1:])
+    )
+    ek_a = np.where(im_sonder, col(sonder_einkommen_a), col(einkommen_a))
+    ek_b = np.where(im_sonder, col(sonder_einkommen_b), col(einkommen_b))
+
+    # --- AfA: a given schedule, else a formula of the plan ---
+    if afa is None:
+        afa_werte = {"kaufpreis": col(anschaffungskosten), "anteil_grundstueck": col(anteil_grundstueck)}
+    else:
+        afa = np.asarray(afa, dtype=float)
+        if afa.ndim == 0:
+            afa = np.full((n, t_max), float(afa))
+        else:
+            afa = np.atleast_2d(afa)
+            if afa.shape[1] < t_max:
+                afa = np.pad(afa, ((0, 0), (0, t_max - afa.shape[1])))
+            afa = np.broadcast_to(afa[:, :t_max], (n, t_max))
+        afa_werte = {"afa": afa}
+
+    werte = formulas.auswerten(_plan(spalten, afa is not None), {
+        **afa_werte,
+        "jahr": jahr, "einkommen": ek_a + ek_b, "ek_a": ek_a, "ek_b": ek_b, "restschuld": plan["restschuld"],
+        "zins": plan["zins"], "tilgungsanteil": plan["tilgung"], "rate": plan["rate"],
+        "miete_pm": col(miete_pm), "mietsteigerung_pa": col(mietsteigerung_pa),
+        "instandhaltung_pa": col(instandhaltung_pa), "kostensteigerung_pa": col(kostensteigerung_pa),
+        "mietausfall_pa": col(mietausfall_pa), "wertsteigerung_pa": col(wertsteigerung_pa),
+        "anfangswert": col(anfangswert), "anschaffungskosten": col(anschaffungskosten),
+        "kreditbetrag": col(kreditbetrag), "startkapital": col(startkapital),
+        "zugewinn_ausgleich": col(zugewinn_ausgleich), "anteil_a": col(anteil_a), "anteil_b": col(anteil_b),
+        "zinsbindung": _vec(zinsbindung, n), "marktzins_verkauf": _vec(marktzins_verkauf, n),
+        "verkaufskosten_prozent": col(verkaufskosten_prozent),
+    })
+
+    nan = np.where(aktiv, 1.0, np.nan)
+    res = {spalte: np.broadcast_to(werte[_SPALTEN[spalte]], (n, t_max)) * nan for spalte in spalten}
+    if "Restschuld" in res:
+        res["Restschuld"] = np.maximum(0, res["Restschuld"])
+    res["laufzeit"] = plan["laufzeit"]
+    res["jaehrliche_rate"] = plan["jaehrliche_rate"]
+    res["zinssatz"] = plan["zinssatz"]
+    return res
+
+
+def haushalt_portfolio(
+    *,
+    kaufpreis,
+    kreditbetrag,
+    zinssatz,
+    tilgung,
+    miete_pm,
+    instandhaltung_pa,
+    anteil_grundstueck,
+    afa_satz,
+    wertsteigerung_pa,
+    mietsteigerung_pa,
+    kostensteigerung_pa,
+    mietausfall_pa,
+    einkommen_a,
+    einkommen_b,
+    jahre=30,
+):
+    """Project N rental properties of one household over *jahre* years.
+
+    Property inputs are (N,) arrays, the rest is shared. Every property has
+    its own annuity loan (the N loans run as N variants of tilgungsplan) and
+    linear AfA on the building share, capped at the building value. The V+V
+    results of all properties enter one joint tariff evaluation per year.
+    Returns 'objekte' with (N, T) arrays and 'haushalt' with (T,) arrays.
+    """
+    kaufpreis = np.atleast_1d(np.asarray(kaufpreis, dtype=float))
+    n = len(kaufpreis)
+    jahr = np.arange(1, jahre + 1, dtype=float)[None, :]
+    col = lambda x: _vec(x, n)[:, None]  # noqa: E731
+
+    # the full schedule, so 'laufzeit' is not capped at the horizon; the arrays are cut to it
+    plan = tilgungsplan(_vec(kreditbetrag, n), _vec(zinssatz, n), _vec(tilgung, n), max(jahre, MAX_LAUFZEIT))
+    pad = ((0, 0), (0, max(jahre - plan["zins"].shape[1], 0)))
+    zins, tilg, restschuld = (np.pad(np.nan_to_num(plan[k]), pad)[:, :jahre] for k in ("zins", "tilgung", "restschuld"))
+
+    miete = col(miete_pm) * 12 * (1 + mietsteigerung_pa / 100) ** (jahr - 1)
+    instandhaltung = col(instandhaltung_pa) * (1 + kostensteigerung_pa / 100) ** (jahr - 1)
+    mietausfall = miete * (mietausfall_pa / 100)
+    gebaeudewert = col(kaufpreis) * (1 - col(anteil_grundstueck) / 100)
+    afa_voll = np.broadcast_to(gebaeudewert * col(afa_satz) / 100, (n, jahre))
+    afa = np.diff(np.minimum(np.cumsum(afa_voll, axis=1), gebaeudewert), axis=1, prepend=0.0)
+
+    ergebnis_vv = miete - (zins + afa + instandhaltung)
+    vv_summe = ergebnis_vv.sum(axis=0)
+    steuer_ohne = get_steuerlast_zusammen_vec(einkommen_a, einkommen_b)
+    steuer_mit = get_steuerlast_zusammen_vec(einkommen_a + vv_summe, einkommen_b)
+    # Marginal effect of each property: household tax without it minus with all
+    steuer_ohne_objekt = get_steuerlast_zusammen_vec(einkommen_a + vv_summe[None, :] - ergebnis_vv, einkommen_b)
+    steuer_allein = get_steuerlast_zusammen_vec(einkommen_a + ergebnis_vv, einkommen_b)
+
+    cashflow_vor_steuer = miete - (zins + tilg) - instandhaltung - mietausfall
+    wert = col(kaufpreis) * (1 + col(wertsteigerung_pa) / 100) ** jahr
+    steuerersparnis = steuer_ohne - steuer_mit
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grenzsteuersatz = np.where(vv_summe != 0, steuerersparnis / np.abs(vv_summe), 0.0)
+
+    return {
+        "objekte": {
+            "Restschuld": restschuld,
+            "Zinsanteil": zins,
+            "Tilgungsanteil": tilg,
+            "Mieteinnahmen": miete,
+            "Instandhaltung": instandhaltung,
+            "Mietausfall": mietausfall,
+            "AfA": afa,
+            "Ergebnis V+V": ergebnis_vv,
+            "Cashflow vor Steuer": cashflow_vor_steuer,
+            "Steuerwirkung (marginal)": steuer_ohne_objekt - steuer_mit,
+            "Steuerwirkung (einzeln)": steuer_ohne - steuer_allein,
+            "Immobilienwert": wert,
+            "Vermögen": wert - restschuld,
+        },
+        "haushalt": {
+            "Jahr": jahr[0].astype(int),
+            "zvE Haushalt (mit V+V)": np.full(jahre, float(einkommen_a + einkommen_b)) + vv_summe,
+            "Grenzsteuersatz (%)": np.round(grenzsteuersatz * 100, 1),
+            "Restschuld": restschuld.sum(axis=0),
+            "Mieteinnahmen": miete.sum(axis=0),
+            "Zinsanteil": zins.sum(axis=0),
+            "Tilgungsanteil": tilg.sum(axis=0),
+            "AfA": afa.sum(axis=0),
+            "Ergebnis V+V": vv_summe,
+            "Steuerersparnis": steuerersparnis,
+            "Cashflow": cashflow_vor_steuer.sum(axis=0) + steuerersparnis,
+            "Immobilienwert": wert.sum(axis=0),
+            "Vermögen": (wert - restschuld).sum(axis=0),
+        },
+        "laufzeit": plan["laufzeit"],
+        "jaehrliche_rate": plan["jaehrliche_rate"],
+    }
+
+
+def als_dataframe(res: dict, variante: int = 0, spalten=None) -> pd.DataFrame:
+    """Slice variant *variante* out of a projektion_batch result as a DataFrame."""
+    n = int(res["laufzeit"][variante])
+    spalten = spalten or [k for k, v in res.items() if np.ndim(v) == 2]
+    df = pd.DataFrame({c: res[c][variante, :n] for c in spalten})
+    if "Jahr" in df.columns:
+        df["Jahr"] = df["Jahr"].astype(int)
+    return df
@@ -0,0 +1,96 @@
+"""ETF Sparplan with German investment-fund taxation (InvStG, thesaurierend).
+
+Per year: Vorabpauschale = Wert am Jahresanfang x Basiszins x 0.7 (pro rata
+for the contributions of the year, 1/12 less per full month before the
+purchase), capped at the value increase of the year. Taxable is the part
+after Teilfreistellung above the Sparerpauschbetrag; the tax is taken from
+the depot at year end. Already taxed Vorabpauschalen raise the cost basis,
+so the liquidation value of every year only taxes the remaining gain.
+
+Months are accumulated in closed form; the yearly recurrence runs once over
+all scenarios (S,) at the same time.
+"""
+
+import numpy as np
+
+ABGELTUNGSTEUER = 0.25 * 1.055  # inkl. Solidaritätszuschlag, ohne Kirchensteuer
+BASISZINS = 2.53  # % (Basiszins 2025)
+TEILFREISTELLUNG_AKTIENFONDS = 30.0  # %
+SPARERPAUSCHBETRAG = 1_000.0  # € je Person
+
+# Sum of the pro-rata factors (13 - Monat) / 12 of twelve month-end contributions
+_ANTEIL_SPARRATEN = sum((13 - m) / 12 for m in range(1, 13))
+
+
+def _vec(x, n):
+    return np.broadcast_to(np.asarray(x, dtype=float), (n,)).copy()
+
+
+def sparplan(startkapital, rendite, sparrate, jahre: int, **steuer) -> dict:
+    """Year-end values of S Sparpläne with a constant return over *jahre* years.
+
+    *startkapital*, *rendite* (% p.a., monthly compounding) and *sparrate*
+    (€ per month, paid at month end) are scalars or (S,) arrays; *steuer*
+    goes to sparplan_pfade. Returns (S, jahre) arrays keyed by the ETF table
+    columns.
+    """
+    n = max(np.size(x) for x in (startkapital, rendite, sparrate))
+    r_m = _vec(rendite, n) / 100 / 12
+    q12 = (1 + r_m) ** 12
+    sparrate = _vec(sparrate, n)
+    sparraten_endwert = np.where(r_m != 0, sparrate * (q12 - 1) / np.where(r_m != 0, r_m, 1), 12 * sparrate)
+    return sparplan_pfade(
+        startkapital, np.repeat(q12[:, None], jahre, axis=1), np.repeat(sparraten_endwert[:, None], jahre, axis=1),
+        sparrate, **steuer,
+    )
+
+
+def sparplan_pfade(startkapital, wachstum, sparraten_endwert, sparrate, *, basiszins=BASISZINS,
+                   teilfreistellung=TEILFREISTELLUNG_AKTIENFONDS, personen=1, steuersatz=ABGELTUNGSTEUER) -> dict:
+    """Taxed Sparplan along given return paths.
+
+    *wachstum* (S, T) is the growth factor of the depot in each year,
+    *sparraten_endwert* (S, T) the year-end value of that year's twelve
+    contributions of *sparrate* (€ per month). The remaining inputs are
+    scalars or (S,) arrays.
+    """
+    wachstum = np.atleast_2d(wachstum)
+    sparraten_endwert = np.atleast_2d(sparraten_endwert)
+    n, jahre = wachstum.shape
+    sparrate = _vec(sparrate, n)
+    basis_faktor = _vec(basiszins, n) / 100 * 0.7
+    steuerpflichtig = 1 - _vec(teilfreistellung, n) / 100
+    pauschbetrag = SPARERPAUSCHBETRAG * _vec(personen, n)
+
+    kapital = _vec(startkapital, n)
+    eingezahlt = kapital.copy()
+    kostenbasis = kapital.copy()  # Anschaffungskosten + versteuerte Vorabpauschalen
+    steuer_kumuliert = np.zeros(n)
+
+    spalten = ["Eingezahltes Kapital", "Brutto Vermögen", "Vorabpauschale", "Steuer (Vorabpauschale)",
+               "Gewinn (unrealisiert)", "Potenzielle Steuer", "Netto Vermögen (n. St.)", "Gezahlte Steuer (kumuliert)"]
+    out = {c: np.empty((n, jahre)) for c in spalten}
+    for t in range(jahre):
+        kapital_ende = kapital * wachstum[:, t] + sparraten_endwert[:, t]
+        zuwachs = kapital_ende - kapital - 12 * sparrate
+        vorab = np.clip((kapital + _ANTEIL_SPARRATEN * sparrate) * basis_faktor, 0.0, np.maximum(zuwachs, 0.0))
+        vorab_stpfl = vorab * steuerpflichtig
+        steuer_vorab = np.maximum(vorab_stpfl - pauschbetrag, 0.0) * steuersatz
+        rest_pauschbetrag = np.maximum(pauschbetrag - vorab_stpfl, 0.0)
+
+        kapital = kapital_ende - steuer_vorab
+        eingezahlt = eingezahlt + 12 * sparrate
+        kostenbasis = kostenbasis + 12 * sparrate + vorab
+        steuer_kumuliert = steuer_kumuliert + steuer_vorab
+
+        steuer_exit = np.maximum((kapital - kostenbasis) * steuerpflichtig - rest_pauschbetrag, 0.0) * steuersatz
+
+        out["Eingezahltes Kapital"][:, t] = eingezahlt
+        out["Brutto Vermögen"][:, t] = kapital
+        out["Vorabpauschale"][:, t] = vorab
+        out["Steuer (Vorabpauschale)"][:, t] = steuer_vorab
+        out["Gewinn (unrealisiert)"][:, t] = kapital - eingezahlt
+        out["Potenzielle Steuer"][:, t] = steuer_exit
+        out["Netto Vermögen (n. St.)"][:, t] = kapital - steuer_exit
+        out["Gezahlte Steuer (kumuliert)"][:, t] = steuer_kumuliert
+    return out
@@ -0,0 +1,132 @@
+"""Exit analysis: sale proceeds for every exit year across simulated market paths.
+
+The property value follows a lognormal path around the deterministic
+Wertsteigerung, the market rate at sale (for the Vorfälligkeitsentschädigung)
+a mean-reverting path (zinsmodell). Loan, rent and tax columns come from the
+deterministic projection. Net proceeds are evaluated for all paths x exit
+years in one pass; a path's optimal exit year maximizes the present value of
+the cashflows until the sale plus the net proceeds at the sale.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import altair as alt
+
+from calculations import formulas
+from calculations.zinsmodell import simuliere_zinspfade
+
+N_PFADE = 2_000
+SPEKULATIONSFRIST = 10
+N_RASTER = 201
+# Projection columns the analysis reads (besides the value column)
+_SPALTEN = ["Restschuld", "Zinsanteil", "Tilgungsanteil", "Cashflow", "Buchwert (steuerlich)",
+            "zvE Haushalt (mit V+V)"]
+
+
+def wertpfade(jahre: int, volatilitaet: float, n_pfade: int = N_PFADE, seed=None) -> np.ndarray:
+    """(n_pfade, jahre) lognormal value factors with mean 1 around the deterministic path."""
+    rng = np.random.default_rng(seed)
+    sigma = volatilitaet / 100
+    z = rng.standard_normal((n_pfade, jahre)) * sigma
+    return np.exp(np.cumsum(z, axis=1) - 0.5 * sigma ** 2 * np.arange(1, jahre + 1))
+
+
+def _interpoliere(flaeche: np.ndarray, raster: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Linear lookup of (P, T) values *x* in the (T, M) *flaeche* over the even grid *raster*."""
+    pos = np.clip((x - raster[0]) / (raster[1] - raster[0]), 0, len(raster) - 1)
+    i0 = np.minimum(pos.astype(int), len(raster) - 2)
+    w = pos - i0
+    t = np.arange(flaeche.shape[0])[None, :]
+    return flaeche[t, i0] * (1 - w) + flaeche[t, i0 + 1] * w
+
+
+def exit_analyse(res: dict, p: dict, wertspalte: str, *, volatilitaet_wert: float, volatilitaet_zins: float,
+                 diskontierung: float, n_pfade: int = N_PFADE, seed: int = 42) -> dict:
+    """Net proceeds (P, T) and optimal exit years (P,) for variant 0 of a projektion_batch result."""
+    jahre = int(res["laufzeit"][0])
+    jahr = np.arange(1, jahre + 1)
+    spalte = lambda name: res[name][0, :jahre][None, :]  # noqa: E731
+
+    hauswert = spalte(wertspalte) * wertpfade(jahre, volatilitaet_wert, n_pfade, seed)
+    marktzins = simuliere_zinspfade(p["marktzins_verkauf"], mittelwert=p["marktzins_verkauf"], reversion=0.15,
+                                    volatilitaet=volatilitaet_zins, jahre=jahre, n_pfade=n_pfade, seed=seed + 1)
+    restschuld = spalte("Restschuld")
+    # VFE surface exit year x market-rate grid, then looked up per path
+    raster = np.linspace(marktzins.min(), max(marktzins.max(), marktzins.min() + 0.01), N_RASTER)
+    flaeche = formulas.vorfaelligkeit(spalte("Zinsanteil") + spalte("Tilgungsanteil"), restschuld,
+                                    p["zinsbindung"], raster[None, :])[0]
+    vfe = _interpoliere(flaeche, raster, marktzins)
+    netto = formulas.exit_erloes(hauswert, restschuld, vfe, spalte("Buchwert (steuerlich)"),
+                               spalte("zvE Haushalt (mit V+V)"), p["verkaufskosten_prozent"], jahr)
+
+    abzinsung = (1 + diskontierung / 100) ** -jahr
+    barwert = np.cumsum(spalte("Cashflow") * abzinsung, axis=1) + netto * abzinsung
+    optimal = np.argmax(barwert, axis=1) + 1
+    return {"jahr": jahr, "netto": netto, "barwert": barwert, "optimal": optimal}
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _exit_analyse_cached(_berechne_batch, p: dict, wertspalte: str, volatilitaet_wert: float,
+                         volatilitaet_zins: float, diskontierung: float) -> dict:
+    return exit_analyse(_berechne_batch(p, spalten=[wertspalte, *_SPALTEN]), p, wertspalte, volatilitaet_wert=volatilitaet_wert,
+                        volatilitaet_zins=volatilitaet_zins, diskontierung=diskontierung)
+
+
+def render_exit_analyse(p: dict, berechne_batch, key_suffix: str = "", wertspalte: str = "Hauswert"):
+    """Analyse block: distribution of the optimal exit year and of the net proceeds per year."""
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        volatilitaet_wert = st.number_input("Volatilität Immobilienwert (% p.a.)", 0.0, 30.0, 6.0, 0.5,
+                                            key=f"exit_vola_{key_suffix}")
+    with c2:
+        volatilitaet_zins = st.number_input("Volatilität Marktzins (%-Pkt. p.a.)", 0.0, 3.0, 0.8, 0.1,
+                                            key=f"exit_zvola_{key_suffix}")
+    with c3:
+        diskontierung = st.number_input("Kalkulationszins (% p.a.)", 0.0, 15.0, 4.0, 0.1,
+                                        key=f"exit_disk_{key_suffix}",
+                                        help="Abzinsung von Cashflows und Verkaufserlös, z.B. die Rendite der Alternativanlage.")
+
+    ana = _exit_analyse_cached(berechne_batch, p, wertspalte, volatilitaet_wert, volatilitaet_zins,
+                               diskontierung)
+    jahr, netto, optimal = ana["jahr"], ana["netto"], ana["optimal"]
+
+    verteilung = pd.Series(optimal).value_counts(normalize=True).reindex(jahr, fill_value=0.0)
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Häufigster optimaler Exit", f"Jahr {int(verteilung.idxmax())}",
+              help=f"In {verteilung.max():.0%} der {len(optimal):,} Pfade.")
+    m2.metric(f"P(Exit ab Jahr {SPEKULATIONSFRIST})", f"{(optimal >= SPEKULATIONSFRIST).mean():.0%}",
+              help="Anteil der Pfade, deren optimaler Verkauf nach der Spekulationsfrist liegt.")
+    if len(jahr) >= SPEKULATIONSFRIST:
+        sprung = netto[:, SPEKULATIONSFRIST - 1].mean() - netto[:, SPEKULATIONSFRIST - 2].mean()
+        m3.metric(f"Ø Erlössprung Jahr {SPEKULATIONSFRIST - 1} → {SPEKULATIONSFRIST}", f"{sprung:+,.0f} €",
+                  help="Wegfall der Spekulationssteuer und geringere Vorfälligkeitsentschädigung.")
+
+    q = np.quantile(netto, [0.05, 0.25, 0.5, 0.75, 0.95], axis=0)
+    band = pd.DataFrame({"Jahr": jahr, "P5": q[0], "P25": q[1], "Median": q[2], "P75": q[3], "P95": q[4],
+                         "Erwartung": netto.mean(axis=0)})
+    basis = alt.Chart(band).encode(x=alt.X("Jahr:O", title="Exit-Jahr"))
+    regel = alt.Chart(pd.DataFrame({"Jahr": [SPEKULATIONSFRIST]})).mark_rule(strokeDash=[4, 4]).encode(x="Jahr:O")
+    chart = (
+        basis.mark_area(opacity=0.2).encode(y=alt.Y("P5:Q", title="Netto-Erlös bei Verkauf (€)"), y2="P95:Q")
+        + basis.mark_area(opacity=0.35).encode(y="P25:Q", y2="P75:Q")
+        + basis.mark_line(point=True).encode(
+            y="Erwartung:Q",
+            tooltip=[alt.Tooltip("Jahr"), *[alt.Tooltip(f"{c}:Q", format=",.0f") for c in ["P5", "Erwartung", "P95"]]],
+        )
+        + regel
+    ).properties(height=300, title="Erwarteter Netto-Erlös je Exit-Jahr (90 %- und 50 %-Band)")
+    st.altair_chart(chart, use_container_width=True)
+
+    hist = (
+        alt.Chart(verteilung.rename("Anteil").rename_axis("Jahr").reset_index())
+        .mark_bar()
+        .encode(
+            x=alt.X("Jahr:O", title="Optimales Exit-Jahr"),
+            y=alt.Y("Anteil:Q", title="Anteil der Pfade", axis=alt.Axis(format="%")),
+            tooltip=[alt.Tooltip("Jahr"), alt.Tooltip("Anteil:Q", format=".1%")],
+        )
+        .properties(height=220)
+    )
+    st.altair_chart(hist, use_container_width=True)
+    st.caption("Optimal = höchster Barwert aus Cashflows bis zum Verkauf plus Netto-Erlös. Werte nominal.")
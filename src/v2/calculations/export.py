@@ -0,0 +1,200 @@
+"""Export of projections and batch results to CSV, Excel and Parquet.
+
+Every writer consumes an iterator of DataFrame chunks with the same columns
+and writes them one after the other: CSV row blocks, Excel rows through a
+streaming workbook (xlsxwriter in constant-memory mode, or openpyxl in
+write-only mode) and Parquet row groups (pyarrow). Batch results (V, T) are
+turned into long-format chunks a few variants at a time, so no frame with
+all rows is built first. Excel and Parquet are offered only if one of their
+optional packages is installed.
+
+Limits: the finished file is held in memory, since the download button
+sends it as one payload. Excel is written row by row, but the writers work
+cell by cell in Python (about 10 s per 200,000 rows of 10 columns); CSV
+and Parquet are meant for large exports.
+"""
+
+import hashlib
+import io
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+CHUNK_ZEILEN = 100_000
+EXCEL_MAX_ZEILEN = 1_048_575  # per sheet, without the header row
+
+FORMATE = {
+    "CSV": ("csv", "text/csv"),
+    "Excel (XLSX)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def verfuegbare_formate() -> list[str]:
+    """Formats whose writer can be used in this runtime."""
+    verfuegbar = {"CSV": True, "Excel (XLSX)": xlsxwriter is not None or openpyxl is not None,
+                  "Parquet": pyarrow is not None}
+    return [f for f in FORMATE if verfuegbar[f]]
+
+
+def frame_bloecke(df: pd.DataFrame, chunk: int = CHUNK_ZEILEN):
+    """Consecutive row blocks of *df* (views, no copies)."""
+    for beginn in range(0, max(len(df), 1), chunk):
+        yield df.iloc[beginn:beginn + chunk]
+
+
+def batch_bloecke(res: dict, namen: list, spalten: list | None = None, chunk: int = CHUNK_ZEILEN):
+    """Long-format blocks (Variante, Jahr, *spalten*) of a projektion_batch result.
+
+    *spalten* defaults to all (V, T) arrays of *res*; years after the
+    Volltilgung of a variant (NaN in every column) are skipped.
+    """
+    if spalten is None:
+        spalten = [k for k, v in res.items() if isinstance(v, np.ndarray) and v.ndim == 2]
+    n_var, n_jahre = res[spalten[0]].shape
+    pro_block = max(1, chunk // n_jahre)
+    jahre = np.arange(1, n_jahre + 1)
+    for beginn in range(0, n_var, pro_block):
+        v = slice(beginn, min(beginn + pro_block, n_var))
+        block = pd.DataFrame({
+            "Variante": np.repeat(np.asarray(namen[v], dtype=object), n_jahre),
+            "Jahr": np.tile(jahre, v.stop - v.start),
+            **{s: np.asarray(res[s][v], dtype=float).ravel() for s in spalten},
+        })
+        yield block[block[spalten].notna().any(axis=1)]
+
+
+def schreibe_csv(bloecke, ziel):
+    """Semicolon-separated CSV with decimal comma (German Excel), UTF-8 with BOM."""
+    text = io.TextIOWrapper(ziel, encoding="utf-8-sig", newline="", write_through=True)
+    for i, block in enumerate(bloecke):
+        block.to_csv(text, sep=";", decimal=",", index=False, header=i == 0)
+    text.detach()
+
+
+def _zeilen(block: pd.DataFrame) -> list:
+    # Excel writers do not accept NaN / numpy scalars: one vectorized conversion per block to Python values
+    return block.astype(object).where(block.notna(), None).to_numpy().tolist()
+
+
+def _blatt_zeilen(bloecke):
+    # (sheet number, row values); every sheet starts with the header row
+    blatt, zeile = -1, EXCEL_MAX_ZEILEN
+    for block in bloecke:
+        for werte in _zeilen(block):
+            if zeile >= EXCEL_MAX_ZEILEN:
+                blatt, zeile = blatt + 1, 0
+                yield blatt, list(block.columns)
+            zeile += 1
+            yield blatt, werte
+
+
+def schreibe_xlsx(bloecke, ziel):
+    """One worksheet per EXCEL_MAX_ZEILEN rows, written row by row.
+
+    Only the current rows are kept by the writer (constant-memory /
+    write-only mode); the cost grows with the number of cells (see above).
+    """
+    if xlsxwriter is not None:
+        buch = xlsxwriter.Workbook(ziel, {"constant_memory": True, "nan_inf_to_errors": True})
+        blaetter, zeilen = [], []
+        for nr, werte in _blatt_zeilen(bloecke):
+            if nr == len(blaetter):
+                blaetter.append(buch.add_worksheet(f"Daten {nr + 1}"))
+                zeilen.append(0)
+            blaetter[nr].write_row(zeilen[nr], 0, werte)
+            zeilen[nr] += 1
+        if not blaetter:
+            buch.add_worksheet("Daten 1")
+        buch.close()
+        return
+    buch = openpyxl.Workbook(write_only=True)
+    blaetter = []
+    for nr, werte in _blatt_zeilen(bloecke):
+        if nr == len(blaetter):
+            blaetter.append(buch.create_sheet(f"Daten {nr + 1}"))
+        blaetter[nr].append(werte)
+    if not blaetter:
+        buch.create_sheet("Daten 1")
+    buch.save(ziel)
+
+
+def schreibe_parquet(bloecke, ziel):
+    """One Parquet row group per block."""
+    schreiber = None
+    for block in bloecke:
+        tabelle = pyarrow.Table.from_pandas(block, preserve_index=False)
+        if schreiber is None:
+            schreiber = pyarrow.parquet.ParquetWriter(ziel, tabelle.schema)
+        schreiber.write_table(tabelle.cast(schreiber.schema))
+    if schreiber is not None:
+        schreiber.close()
+
+
+_SCHREIBER = {"CSV": schreibe_csv, "Excel (XLSX)": schreibe_xlsx, "Parquet": schreibe_parquet}
+
+
+def exportiere(bloecke, dateiformat: str) -> bytes:
+    """File content of the chunks in *bloecke* in *dateiformat* (a key of FORMATE)."""
+    ziel = io.BytesIO()
+    _SCHREIBER[dateiformat](bloecke, ziel)
+    return ziel.getvalue()
+
+
+def _fingerabdruck(stand) -> str:
+    return hashlib.sha256(pickle.dumps(stand, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+def render_export(bloecke_fuer, dateiname: str, key_suffix: str = "", label: str = "Exportieren", stand=None):
+    """Format picker and download button; *bloecke_fuer()* returns a fresh chunk iterator.
+
+    The file is written when the button is clicked (deferred download).
+    Where that is not supported (the browser build) it is written on an
+    extra click first and kept for the download; *stand* (any picklable
+    value describing the exported data, e.g. the inputs) ties it to that
+    data, so a file built from other inputs is never offered.
+    """
+    formate = verfuegbare_formate()
+    c1, c2 = st.columns([2, 1])
+    dateiformat = c1.selectbox("Format", formate, key=f"export_format_{key_suffix}", label_visibility="collapsed",
+                               help="Excel wird Zelle für Zelle geschrieben und ist bei großen Datenmengen langsam; "
+                                    "dafür CSV oder Parquet wählen.")
+    endung, mime = FORMATE[dateiformat]
+    datei = f"{dateiname}.{endung}"
+    with c2:
+        if sys.platform != "emscripten":
+            st.download_button(label, lambda: exportiere(bloecke_fuer(), dateiformat), file_name=datei, mime=mime,
+                               key=f"export_{key_suffix}", on_click="ignore", use_container_width=True)
+            return
+        fertig_key = f"export_daten_{key_suffix}"
+        kennung = (datei, _fingerabdruck(stand))
+        fertig = st.session_state.get(fertig_key)
+        if fertig is not None and fertig[0] != kennung:  # built for another format or from other inputs
+            st.session_state.pop(fertig_key)
+            fertig = None
+        if fertig is None:
+            if st.button("Datei erzeugen", key=f"export_erzeugen_{key_suffix}", use_container_width=True):
+                st.session_state[fertig_key] = (kennung, exportiere(bloecke_fuer(), dateiformat))
+                st.rerun()
+            return
+        st.download_button(label, fertig[1], file_name=datei, mime=mime, key=f"export_{key_suffix}",
+                           on_click=lambda: st.session_state.pop(fertig_key, None), use_container_width=True)
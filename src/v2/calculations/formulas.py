@@ -1,25 +1,313 @@
-"""Formula database for all scenarios."""
+"""Formula database for all scenarios.
+
+Entries with an 'Ergebnis' also carry the vectorized 'Funktion' that
+computes it; its parameter names are the 'Eingaben' (engine inputs or the
+'Ergebnis' of other entries). kompiliere() orders the entries a set of
+results needs into one evaluation plan and auswerten() runs it on (V, T)
+arrays, so the projection engine computes exactly the formulas shown here.
+The yearly steps of the recurrences (the loan payment in
+darlehen.tranchen_plan, the Neubau AfA in berechne_neubau_afa) are entries
+too and are called through funktion(). Entries without 'Funktion' explain
+figures of the input forms and are marked as such in the formula tab.
+
+Every formula list is indexed once at import into a register: the entries
+sorted by name, an inverted index from normalized tokens (lower case,
+without accents and umlauts, plus a few synonyms such as "abschreibung" for
+"AfA") to entries, the sorted vocabulary and the pre-built expander labels.
+A search word is looked up as a whole token in the index and as a prefix by
+bisecting the sorted vocabulary, instead of scanning all texts or tokens.
+"""
+
+import bisect
+import inspect
+import re
+import unicodedata
+
+import numpy as np
+
+from calculations.tax import get_steuerlast_zusammen_vec
 
 bs = chr(92)  # backslash for LaTeX
 
-_immobilien_formeln = [
+
+# =============================================================================
+# Executable formulas
+# =============================================================================
+
+def vorfaelligkeit(rate, restschuld, zinsbindung, marktzins):
+    """Vorfälligkeitsentschädigung (Aktiv-Passiv) for an exit at the end of every year.
+
+    *rate* and *restschuld* are the (V, T) annual contract schedule,
+    *zinsbindung* is a scalar or (V,), *marktzins* (% p.a.) is a scalar, (V,)
+    or a (V, M) grid of market rates. The contractual payments until the end
+    of the Zinsbindung plus the Restschuld at that date are discounted at the
+    market rate; the penalty is what exceeds the Restschuld at the exit.
+    Returns a (V, T, M) surface (M = 1 for scalar / (V,) market rates).
+    """
+    rate = np.nan_to_num(np.atleast_2d(rate))
+    restschuld = np.nan_to_num(np.atleast_2d(restschuld))
+    n, t_max = rate.shape
+    zb = np.broadcast_to(np.asarray(zinsbindung, dtype=int), (n,))
+    m = np.asarray(marktzins, dtype=float) / 100
+    m = np.broadcast_to(m, (n, m.shape[1])) if m.ndim == 2 else np.broadcast_to(m.reshape(-1), (n,))[:, None]
+
+    k = np.arange(1, t_max + 1)
+    abzinsung = (1 + m[:, None, :]) ** -k[None, :, None]  # (V, T, M)
+    in_zb = (k[None, :] <= zb[:, None])[:, :, None]
+    # Barwert der Raten aus Jahr k..T (Suffix-Summe), nur innerhalb der Zinsbindung
+    barwert_raten = np.cumsum((np.where(in_zb, rate[:, :, None], 0.0) * abzinsung)[:, ::-1], axis=1)[:, ::-1]
+    barwert_raten = np.concatenate([barwert_raten[:, 1:], np.zeros_like(barwert_raten[:, :1])], axis=1)
+
+    zb_idx = np.clip(zb - 1, 0, t_max - 1)
+    rest_zb = np.where(zb <= t_max, restschuld[np.arange(n), zb_idx], 0.0)
+    barwert_rest = rest_zb[:, None, None] * abzinsung[np.arange(n), zb_idx][:, None, :]
+
+    barwert = (barwert_raten + barwert_rest) / abzinsung  # auf das Exit-Jahr bezogen
+    return np.where(in_zb & (k[None, :, None] < zb[:, None, None]),
+                    np.maximum(0.0, barwert - restschuld[:, :, None]), 0.0)
+
+
+def exit_erloes(hauswert, restschuld, vfe, buchwert, zve, verkaufskosten_prozent, jahr):
+    """Net proceeds of a sale at the end of year *jahr* (inputs broadcast).
+
+    Within the 10-year Spekulationsfrist the gain over the steuerlicher
+    Buchwert is added to the household zvE of the sale year (*zve*, incl.
+    V+V) and the tariff is evaluated again, so the progression on the gain
+    is captured.
+    """
+    verkaufskosten = hauswert * (verkaufskosten_prozent / 100)
+    gewinn = (hauswert - verkaufskosten) - buchwert
+    steuerpflichtig = np.where((jahr < 10) & (gewinn > 0), gewinn, 0.0)
+    spekulationssteuer = get_steuerlast_zusammen_vec(zve + steuerpflichtig, 0.0) - get_steuerlast_zusammen_vec(zve, 0.0)
+    return hauswert - restschuld - vfe - verkaufskosten - spekulationssteuer
+
+
+def _steuerersparnis(ek_a, ek_b, ergebnis_vv, anteil_a, anteil_b):
+    zve_a, zve_b = ek_a + ergebnis_vv * anteil_a, ek_b + ergebnis_vv * anteil_b
+    return get_steuerlast_zusammen_vec(ek_a, ek_b) - get_steuerlast_zusammen_vec(zve_a, zve_b)
+
+
+def _grenzsteuersatz(steuerersparnis, ergebnis_vv):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.round(np.where(ergebnis_vv != 0, steuerersparnis / np.abs(ergebnis_vv), 0.0) * 100, 1)
+
+
+def _buchwert(anschaffungskosten, afa, jahr):
+    # a constant AfA per variant is (V, 1): spread it over the years before summing
+    afa = np.broadcast_to(afa, np.broadcast_shapes(np.shape(afa), np.shape(jahr)))
+    return anschaffungskosten - np.cumsum(afa, axis=1)
+
+
+def _zuwachs_vermoegen(vermoegen, anfangswert, kreditbetrag):
+    return vermoegen - np.concatenate([anfangswert - kreditbetrag, vermoegen[:, :-1]], axis=1)
+
+
+_projektion_formeln = [
     {
         "Name": "AfA (Absetzung für Abnutzung)",
         "Kategorie": "Immobilie",
-        "Beschreibung": "Jährlicher steuerlicher Abschreibungsbetrag auf das Gebäude.",
-        "Formel": f"AfA = (Kaufpreis {bs}times (1 - {bs}frac{{Grundstücksanteil}}{{100}})) {bs}times 0.02"
+        "Beschreibung": "Jährlicher steuerlicher Abschreibungsbetrag auf das Gebäude (linear 2 %).",
+        "Formel": f"AfA = (Kaufpreis {bs}times (1 - {bs}frac{{Grundstücksanteil}}{{100}})) {bs}times 0.02",
+        "Ergebnis": "afa",
+        "Funktion": lambda kaufpreis, anteil_grundstueck: kaufpreis * (1 - anteil_grundstueck / 100) * 0.02,
     },
     {
-        "Name": "Brutto-Mietrendite",
+        "Name": "Monatliche Rate",
         "Kategorie": "Immobilie",
-        "Beschreibung": "Verhältnis der Jahresmiete zum Kaufpreis.",
-        "Formel": f"Rendite = {bs}frac{{Monatsmiete {bs}times 12}}{{Kaufpreis}} {bs}times 100"
+        "Beschreibung": "Annuität an die Bank (Jahresrate / 12); im Jahr der Volltilgung nur Zins und Restschuld. Weitere Darlehen werden mit ihrem eigenen Zins und ihrer Tilgung addiert; in tilgungsfreien Jahren nur der Zins.",
+        "Formel": f"Rate_t = {bs}min{bs}left(Kreditbetrag {bs}times {bs}frac{{Zins{bs}% + Tilgung{bs}%}}{{100}},{bs}; Zins_t + RS_{{t-1}}{bs}right), {bs}quad Monatsrate_t = {bs}frac{{Rate_t}}{{12}}",
+        "Ergebnis": "rate",  # per tranche and year in darlehen.tranchen_plan; the plan gets the sum as input
+        "Funktion": lambda annuitaet, zins, restschuld_vorjahr: np.minimum(annuitaet, zins + restschuld_vorjahr),
+    },
+    {
+        "Name": "Mieteinnahmen",
+        "Kategorie": "Projektion",
+        "Beschreibung": "Jahreskaltmiete im Jahr t, jährlich um die Mietsteigerung erhöht.",
+        "Formel": f"Miete_t = Monatsmiete {bs}times 12 {bs}times (1 + {bs}frac{{Mietsteigerung{bs}%}}{{100}})^{{t-1}}",
+        "Ergebnis": "miete",
+        "Funktion": lambda miete_pm, mietsteigerung_pa, jahr: miete_pm * 12 * (1 + mietsteigerung_pa / 100) ** (jahr - 1),
+    },
+    {
+        "Name": "Instandhaltung",
+        "Kategorie": "Projektion",
+        "Beschreibung": "Instandhaltungskosten im Jahr t, jährlich um die Kostensteigerung erhöht.",
+        "Formel": f"I_t = I_{{p.a.}} {bs}times (1 + {bs}frac{{Kostensteigerung{bs}%}}{{100}})^{{t-1}}",
+        "Ergebnis": "instandhaltung",
+        "Funktion": lambda instandhaltung_pa, kostensteigerung_pa, jahr: (
+            instandhaltung_pa * (1 + kostensteigerung_pa / 100) ** (jahr - 1)),
+    },
+    {
+        "Name": "Mietausfall",
+        "Kategorie": "Projektion",
+        "Beschreibung": "Pauschaler Ausfall durch Leerstand oder Zahlungsausfälle.",
+        "Formel": f"Mietausfall_t = Miete_t {bs}times {bs}frac{{Mietausfall{bs}%}}{{100}}",
+        "Ergebnis": "mietausfall",
+        "Funktion": lambda miete, mietausfall_pa: miete * (mietausfall_pa / 100),
+    },
+    {
+        "Name": "Ergebnis Vermietung & Verpachtung",
+        "Kategorie": "Steuer",
+        "Beschreibung": "Steuerliches Ergebnis V+V; negativ mindert es das zu versteuernde Einkommen.",
+        "Formel": "V{+}V_t = Miete_t - (Zins_t + AfA_t + I_t)",
+        "Ergebnis": "ergebnis_vv",
+        "Funktion": lambda miete, zins, afa, instandhaltung: miete - (zins + afa + instandhaltung),
+    },
+    {
+        "Name": "Steuerersparnis",
+        "Kategorie": "Steuer",
+        "Beschreibung": "Differenz der Steuerlast (Splittingtarif) ohne und mit dem anteiligen Ergebnis V+V.",
+        "Formel": f"{bs}Delta Steuer = Steuer(zvE_A, zvE_B) - Steuer(zvE_A + V{{+}}V {bs}cdot Anteil_A, zvE_B + V{{+}}V {bs}cdot Anteil_B)",
+        "Ergebnis": "steuerersparnis",
+        "Funktion": _steuerersparnis,
+    },
+    {
+        "Name": "zvE Haushalt (mit V+V)",
+        "Kategorie": "Steuer",
+        "Beschreibung": "Zu versteuerndes Einkommen beider Personen inklusive Ergebnis V+V.",
+        "Formel": f"zvE = zvE_A + zvE_B + V{{+}}V {bs}cdot (Anteil_A + Anteil_B)",
+        "Ergebnis": "zve_haushalt",
+        "Funktion": lambda ek_a, ek_b, ergebnis_vv, anteil_a, anteil_b: (
+            ek_a + ergebnis_vv * anteil_a + ek_b + ergebnis_vv * anteil_b),
+    },
+    {
+        "Name": "Grenzsteuersatz",
+        "Kategorie": "Steuer",
+        "Beschreibung": "Steuerersparnis je Euro Ergebnis V+V (effektiver Satz auf das V+V-Ergebnis).",
+        "Formel": f"Grenzsteuersatz = {bs}frac{{{bs}Delta Steuer}}{{|V{{+}}V|}} {bs}times 100",
+        "Ergebnis": "grenzsteuersatz",
+        "Funktion": _grenzsteuersatz,
     },
     {
         "Name": "Cashflow (nach Steuer)",
-        "Kategorie": "Immobilie",
+        "Kategorie": "Projektion",
         "Beschreibung": "Geldfluss nach allen Einnahmen und Ausgaben.",
-        "Formel": "CF = Miete - (Zins + Tilgung) - Instandhaltung - Mietausfall + Steuerersparnis"
+        "Formel": "CF = Miete - (Zins + Tilgung) - Instandhaltung - Mietausfall + Steuerersparnis",
+        "Ergebnis": "cashflow",
+        "Funktion": lambda miete, rate, instandhaltung, mietausfall, steuerersparnis: (
+            miete - rate - instandhaltung - mietausfall + steuerersparnis),
+    },
+    {
+        "Name": "Monatliche Gesamtkosten",
+        "Kategorie": "Projektion",
+        "Beschreibung": "Bankrate (im letzten Jahr nur der Rest), Instandhaltung und Mietausfall pro Monat.",
+        "Formel": f"K_t = {bs}frac{{Rate_t + I_t + Mietausfall_t}}{{12}}",
+        "Ergebnis": "monatliche_gesamtkosten",
+        "Funktion": lambda rate, instandhaltung, mietausfall: (rate + instandhaltung + mietausfall) / 12,
+    },
+    {
+        "Name": "Monatlicher Eigenaufwand",
+        "Kategorie": "Projektion",
+        "Beschreibung": "Monatliche Zuzahlung aus eigener Tasche vor Steuern.",
+        "Formel": f"Eigenaufwand_t = K_t - {bs}frac{{Miete_t}}{{12}}",
+        "Ergebnis": "monatlicher_eigenaufwand",
+        "Funktion": lambda monatliche_gesamtkosten, miete: monatliche_gesamtkosten - miete / 12,
+    },
+    {
+        "Name": "Hauswert",
+        "Kategorie": "Projektion",
+        "Beschreibung": "Marktwert der Immobilie am Ende des Jahres t.",
+        "Formel": f"Wert_t = Wert_0 {bs}times (1 + {bs}frac{{Wertsteigerung{bs}%}}{{100}})^t",
+        "Ergebnis": "hauswert",
+        "Funktion": lambda anfangswert, wertsteigerung_pa, jahr: anfangswert * (1 + wertsteigerung_pa / 100) ** jahr,
+    },
+    {
+        "Name": "Vermögen",
+        "Kategorie": "Projektion",
+        "Beschreibung": "Immobilienvermögen nach Abzug der Restschuld.",
+        "Formel": "Vermögen_t = Wert_t - Restschuld_t",
+        "Ergebnis": "vermoegen",
+        "Funktion": lambda hauswert, restschuld: hauswert - restschuld,
+    },
+    {
+        "Name": "Zuwachs Vermögen",
+        "Kategorie": "Projektion",
+        "Beschreibung": "Veränderung des Vermögens gegenüber dem Vorjahr.",
+        "Formel": f"Zuwachs_t = Vermögen_t - Vermögen_{{t-1}}, {bs}quad Vermögen_0 = Wert_0 - Kreditbetrag",
+        "Ergebnis": "zuwachs_vermoegen",
+        "Funktion": _zuwachs_vermoegen,
+    },
+    {
+        "Name": "Zugewinn (Scheidung)",
+        "Kategorie": "Risiko",
+        "Beschreibung": "Ausgleichszahlung bei Alleineigentum ohne Ehevertrag: die Hälfte des Vermögenszuwachses über das Startkapital.",
+        "Formel": f"Ausgleich_t = {bs}frac{{1}}{{2}} {bs}max(0, Vermögen_t - Startkapital)",
+        "Ergebnis": "scheidung",
+        "Funktion": lambda vermoegen, startkapital, zugewinn_ausgleich: np.where(
+            zugewinn_ausgleich.astype(bool) & (vermoegen - startkapital > 0), (vermoegen - startkapital) / 2, 0.0),
+    },
+    {
+        "Name": "Buchwert (steuerlich)",
+        "Kategorie": "Steuer",
+        "Beschreibung": "Anschaffungs- bzw. Baukosten abzüglich der kumulierten Abschreibung.",
+        "Formel": f"Buchwert(t) = Anschaffungskosten - {bs}sum_{{i=1}}^{{t}} AfA(i)",
+        "Ergebnis": "buchwert",
+        "Funktion": _buchwert,
+    },
+    {
+        "Name": "Vorfälligkeitsentschädigung (Aktiv-Passiv)",
+        "Kategorie": "Exit",
+        "Beschreibung": "Barwert der vertraglichen Raten bis Ende der Zinsbindung plus Restschuld zu diesem Zeitpunkt, abgezinst mit dem Marktzins, abzüglich der Restschuld beim Verkauf.",
+        "Formel": f"VFE_e = {bs}max{bs}left(0, {bs}sum_{{k=e+1}}^{{ZB}} {bs}frac{{Rate_k}}{{(1+m)^{{k-e}}}} + {bs}frac{{RS_{{ZB}}}}{{(1+m)^{{ZB-e}}}} - RS_e{bs}right)",
+        "Ergebnis": "vfe",
+        "Funktion": lambda rate, restschuld, zinsbindung, marktzins_verkauf: (
+            vorfaelligkeit(rate, restschuld, zinsbindung, marktzins_verkauf)[:, :, 0]),
+    },
+    {
+        "Name": "Netto-Erlös bei Verkauf (Exit)",
+        "Kategorie": "Exit",
+        "Beschreibung": "Erlös nach Restschuld, Vorfälligkeitsentschädigung, Verkaufskosten und – innerhalb von 10 Jahren – Spekulationssteuer auf den Gewinn über dem Buchwert.",
+        "Formel": f"Erlös_t = Wert_t - RS_t - VFE_t - Wert_t {bs}cdot {bs}frac{{VK{bs}%}}{{100}} - {bs}big(Steuer(zvE + Gewinn_t) - Steuer(zvE){bs}big)",
+        "Ergebnis": "netto_erloes",
+        "Funktion": lambda hauswert, restschuld, vfe, buchwert, zve_haushalt, verkaufskosten_prozent, jahr: exit_erloes(
+            hauswert, restschuld, vfe, buchwert, zve_haushalt, verkaufskosten_prozent, jahr),
+    },
+]
+
+def funktion(ergebnis: str):
+    """The vectorized callable of the formula that computes *ergebnis*."""
+    return _AUSFUEHRBAR[ergebnis]["Funktion"]
+
+
+def kompiliere(ziele, eingaben) -> tuple:
+    """Evaluation plan: the formulas needed for *ziele* from *eingaben*, in dependency order."""
+    plan, bekannt = [], set(eingaben)
+
+    def besuche(name: str, pfad: tuple):
+        if name in bekannt:
+            return
+        if name in pfad:
+            raise ValueError(f"Zyklische Formeln: {' -> '.join((*pfad, name))}")
+        if name not in _AUSFUEHRBAR:
+            raise KeyError(f"Weder Eingabe noch Formel: '{name}'")
+        eintrag = _AUSFUEHRBAR[name]
+        for arg in eintrag["Eingaben"]:
+            besuche(arg, (*pfad, name))
+        bekannt.add(name)
+        plan.append(eintrag)
+
+    for ziel in ziele:
+        besuche(ziel, ())
+    return tuple(plan)
+
+
+def auswerten(plan, werte: dict) -> dict:
+    """Run *plan* on the inputs *werte* (arrays broadcasting to (V, T)); returns all values."""
+    werte = dict(werte)
+    for eintrag in plan:
+        werte[eintrag["Ergebnis"]] = eintrag["Funktion"](**{k: werte[k] for k in eintrag["Eingaben"]})
+    return werte
+
+
+# =============================================================================
+# Formula lists per scenario
+# =============================================================================
+
+_immobilien_formeln = _projektion_formeln + [
+    {
+        "Name": "Brutto-Mietrendite",
+        "Kategorie": "Immobilie",
+        "Beschreibung": "Verhältnis der Jahresmiete zum Kaufpreis.",
+        "Formel": f"Rendite = {bs}frac{{Monatsmiete {bs}times 12}}{{Kaufpreis}} {bs}times 100"
     },
     {
         "Name": "Eigenkapitalquote",
@@ -45,62 +333,47 @@ _immobilien_formeln = [
         "Beschreibung": "Finanzierungsbedarf.",
         "Formel": "Kredit = (Kaufpreis + Nebenkosten) - Eigenkapital"
     },
-    {
-        "Name": "Monatliche Rate",
-        "Kategorie": "Immobilie",
-        "Beschreibung": "Annuität an die Bank.",
-        "Formel": f"Rate = Kreditbetrag {bs}times {bs}frac{{Zins{bs}% + Tilgung{bs}%}}{{100}} {bs}times {bs}frac{{1}}{{12}}"
-    },
-    {
-        "Name": "Steuerersparnis",
-        "Kategorie": "Immobilie",
-        "Beschreibung": "Differenz Steuerlast mit vs. ohne Immobilie.",
-        "Formel": f"{bs}Delta Steuer = Steuer_{{ohne}} - Steuer_{{mit}}"
-    },
     {
         "Name": "Äquivalente ETF-Sparrate",
         "Kategorie": "Vergleich",
         "Beschreibung": "Monatliche Sparrate, die nötig ist, um mit einem ETF das gleiche Endvermögen zu erreichen wie mit der Immobilie. Hierbei wird angenommen, dass das Startkapital (Eigenkapital) bereits zu Beginn angelegt wird.",
         "Formel": f"Sparrate = {bs}frac{{Endvermoegen - Startkapital {bs}cdot (1+i)^n}}{{ {bs}frac{{(1+i)^n - 1}}{{i}} }} {bs}quad (i = {bs}frac{{Rendite_{{p.a.}}}}{{12 {bs}cdot 100}}, n = Monate)"
     },
-    {
-        "Name": "Zugewinn (Scheidung)",
-        "Kategorie": "Risiko",
-        "Beschreibung": "Wertzuwachs während der Ehe (vereinfacht).",
-        "Formel": "Zugewinn = (Wert_{aktuell} - Schulden_{aktuell}) - (Wert_{Start} - Schulden_{Start})"
-    },
 ]
 
-_neubau_formeln = [
+_neubau_formeln = [e for e in _projektion_formeln if e["Ergebnis"] != "afa"] + [
     {
         "Name": "AfA Linear (§7 Abs. 4)",
         "Kategorie": "Neubau",
         "Beschreibung": "Lineare Abschreibung: 3% der Baukosten pro Jahr für 33⅓ Jahre. Gilt für Gebäude mit Fertigstellung nach 31.12.2022.",
-        "Formel": f"AfA_{{linear}} = Baukosten {bs}times 0.03"
+        "Formel": f"AfA_{{linear}} = Baukosten {bs}times 0.03",
+        "Ergebnis": "afa_linear",
+        "Funktion": lambda baukosten: baukosten * 0.03,
     },
     {
         "Name": "AfA Degressiv (§7 Abs. 5a)",
         "Kategorie": "Neubau",
         "Beschreibung": "Degressive Abschreibung: 5% des verbleibenden Buchwerts pro Jahr (declining balance). Gilt für Bauantrag/Kaufvertrag Okt 2023 – Sep 2029.",
-        "Formel": f"AfA_{{degressiv}}(t) = Buchwert(t-1) {bs}times 0.05"
+        "Formel": f"AfA_{{degressiv}}(t) = Buchwert(t-1) {bs}times 0.05",
+        "Ergebnis": "afa_degressiv",
+        "Funktion": lambda buchwert: buchwert * 0.05,
     },
     {
         "Name": "Wechsel Degressiv → Linear",
         "Kategorie": "Neubau",
-        "Beschreibung": "Einmaliger, unwiderruflicher Wechsel zur linearen Methode. Optimal wenn linearer Betrag > degressiver Betrag.",
-        "Formel": f"AfA_{{linear,neu}} = {bs}frac{{Buchwert(t)}}{{Restnutzungsdauer}}"
+        "Beschreibung": "Einmaliger, unwiderruflicher Wechsel zur linearen Methode. Optimal wenn linearer Betrag > degressiver Betrag. Ab dem Wechsel wird der Restbuchwert gleichmäßig auf die Restnutzungsdauer verteilt (im letzten Jahr der ganze Rest).",
+        "Formel": f"AfA_{{linear,neu}}(t) = {bs}frac{{Buchwert(t-1)}}{{{bs}max(RND_t, 1)}}, {bs}quad RND_t = 33{bs}tfrac{{1}}{{3}} - (t-1)",
+        "Ergebnis": "afa_wechsel",
+        "Funktion": lambda buchwert, restnutzungsdauer: buchwert / np.maximum(restnutzungsdauer, 1.0),
     },
     {
         "Name": "§7b Sonder-AfA",
         "Kategorie": "Neubau",
         "Beschreibung": "Zusätzliche Abschreibung von 5% der Baukosten für die ersten 4 Jahre. Voraussetzung: QNG-Zertifizierung, max. €5.200/m² Baukosten.",
-        "Formel": f"Sonder_{{AfA}} = Baukosten {bs}times 0.05 {bs}quad (Jahr 1{bs}text{{-}}4)"
-    },
-    {
-        "Name": "Buchwert Gebäude",
-        "Kategorie": "Neubau",
-        "Beschreibung": "Verbleibender steuerlicher Wert des Gebäudes nach kumulierter Abschreibung.",
-        "Formel": f"Buchwert(t) = Baukosten - {bs}sum_{{i=1}}^{{t}} AfA(i)"
+        "Formel": f"Sonder_{{AfA}} = Baukosten {bs}times 0.05 {bs}quad (Jahr 1{bs}text{{-}}4, {bs}; Baukosten {bs}le 5200 {bs}times m^2)",
+        "Ergebnis": "sonder_afa",
+        "Funktion": lambda baukosten, wohnflaeche_m2, jahr: np.where(
+            (jahr <= 4) & (baukosten <= 5200 * wohnflaeche_m2), baukosten * 0.05, 0.0),
     },
     {
         "Name": "Gesamtinvestition Neubau",
@@ -120,41 +393,92 @@ _neubau_formeln = [
         "Beschreibung": "Verhältnis der Jahresmiete zur Gesamtinvestition.",
         "Formel": f"Rendite = {bs}frac{{Monatsmiete {bs}times 12}}{{Gesamtinvestition}} {bs}times 100"
     },
-    {
-        "Name": "Cashflow (nach Steuer)",
-        "Kategorie": "Neubau",
-        "Beschreibung": "Geldfluss nach allen Einnahmen und Ausgaben.",
-        "Formel": "CF = Miete - (Zins + Tilgung) - Instandhaltung - Mietausfall + Steuerersparnis"
-    },
     {
         "Name": "Kreditbetrag (Neubau)",
         "Kategorie": "Neubau",
         "Beschreibung": "Finanzierungsbedarf beim Neubau.",
         "Formel": "Kredit = Gesamtinvestition - Eigenkapital"
     },
-    {
-        "Name": "Steuerersparnis",
-        "Kategorie": "Neubau",
-        "Beschreibung": "Differenz Steuerlast mit vs. ohne Immobilie.",
-        "Formel": f"{bs}Delta Steuer = Steuer_{{ohne}} - Steuer_{{mit}}"
-    },
-    {
-        "Name": "Zugewinn (Scheidung)",
-        "Kategorie": "Risiko",
-        "Beschreibung": "Wertzuwachs während der Ehe (vereinfacht).",
-        "Formel": "Zugewinn = (Wert_{aktuell} - Schulden_{aktuell}) - (Wert_{Start} - Schulden_{Start})"
-    },
 ]
 
 _etf_formeln = _immobilien_formeln  # ETF scenario currently shares the same formula DB
 
+_AUSFUEHRBAR = {}
+for _eintrag in _immobilien_formeln + _neubau_formeln:
+    if "Funktion" in _eintrag:
+        _eintrag["Eingaben"] = tuple(inspect.signature(_eintrag["Funktion"]).parameters)
+        _AUSFUEHRBAR[_eintrag["Ergebnis"]] = _eintrag
+
+
+# Normalized token -> additional search terms (both directions are indexed)
+_SYNONYME = {
+    "afa": ["abschreibung", "absetzung"],
+    "vfe": ["vorfalligkeitsentschadigung"],
+    "ek": ["eigenkapital"],
+    "rate": ["annuitat"],
+    "cf": ["cashflow"],
+    "bnk": ["baunebenkosten"],
+    "invest": ["gesamtinvestition"],
+    "zugewinn": ["scheidung"],
+    "restschuld": ["schuld"],
+}
+
+
+def normalisiere(text: str) -> str:
+    """Lower case without accents; umlauts and their ae/oe/ue spelling map to the same letters."""
+    text = unicodedata.normalize("NFKD", text.lower().replace("ß", "ss"))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"([aou])e", r"\1", text)
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9§]+", normalisiere(text))
+
+
+def _register(formeln: list) -> dict:
+    eintraege = tuple(sorted(formeln, key=lambda x: x["Name"]))
+    synonyme = {}
+    for wort, andere in _SYNONYME.items():
+        for a in andere:
+            synonyme.setdefault(wort, set()).add(a)
+            synonyme.setdefault(a, set()).add(wort)
+    index = {}
+    for i, item in enumerate(eintraege):
+        formel = re.sub(r"\\[a-zA-Z]+", " ", item["Formel"])  # without LaTeX commands
+        for t in _tokens(" ".join([item["Name"], item["Kategorie"], item["Beschreibung"], formel])):
+            for wort in [t, *synonyme.get(t, ())]:
+                index.setdefault(wort, set()).add(i)
+    return {
+        "eintraege": eintraege,
+        "index": {t: frozenset(ids) for t, ids in index.items()},
+        "tokens": tuple(sorted(index)),
+        "labels": tuple(f"{item['Name']} ({item['Kategorie']})" for item in eintraege),
+    }
+
+
+_REGISTER = {
+    "Neubau (Investitions-Immobilie)": _register(_neubau_formeln),
+    "Immobilienkauf (innerhalb Familie)": _register(_immobilien_formeln),
+}
+_REGISTER["ETF-Sparplan (Alternative)"] = _REGISTER["Immobilienkauf (innerhalb Familie)"]
+
+
+def get_formeln(scenario) -> dict:
+    """Return the formula register of the given scenario (entries sorted by name)."""
+    return _REGISTER.get(scenario, _REGISTER["Immobilienkauf (innerhalb Familie)"])
+
 
-def get_formeln(scenario):
-    """Return sorted formula list for the given scenario."""
-    if scenario == "Neubau (Investitions-Immobilie)":
-        formeln = list(_neubau_formeln)
-    elif scenario == "ETF-Sparplan (Alternative)":
-        formeln = list(_etf_formeln)
-    else:
-        formeln = list(_immobilien_formeln)
-    return sorted(formeln, key=lambda x: x["Name"])
+def suche(register: dict, text: str) -> list[int]:
+    """Positions of the entries matching every word of *text* (as an indexed token or its prefix)."""
+    index, tokens = register["index"], register["tokens"]
+    treffer = None
+    for wort in _tokens(text):
+        ids = set(index.get(wort, ()))
+        i = bisect.bisect_right(tokens, wort)  # longer tokens starting with *wort* follow it in sort order
+        while i < len(tokens) and tokens[i].startswith(wort):
+            ids |= index[tokens[i]]
+            i += 1
+        treffer = ids if treffer is None else treffer & ids
+        if not treffer:
+            return []
+    return list(range(len(register["eintraege"]))) if treffer is None else sorted(treffer)
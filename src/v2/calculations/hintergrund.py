@@ -0,0 +1,132 @@
+"""Background jobs: heavy computations in a worker thread with progress and cancellation.
+
+A job is started on the script run that first asks for its result. While it
+runs, a fragment polls its progress and reruns the app once it is done, so
+the rest of the page (and the sidebar) stays usable. A job is identified by
+a name and the hash of its inputs; asking for the same name with other
+inputs cancels the running job. Cancellation is cooperative: the job
+function gets a *fortschritt(anteil)* callback, which raises Abgebrochen
+once the job was cancelled.
+
+Without thread support (the browser build) the job runs synchronously
+behind a progress bar.
+"""
+
+import hashlib
+import pickle
+import sys
+import threading
+
+import streamlit as st
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = get_script_run_ctx = None
+
+POLL_S = 0.5
+# results that are ready this fast (e.g. cache hits) are returned in the same run
+WARTEN_S = 0.1
+
+
+class Abgebrochen(Exception):
+    """Raised inside a job once it was cancelled."""
+
+
+def _schluessel(eingaben: dict) -> str:
+    # like st.cache_data, arguments starting with '_' are not hashed
+    gehasht = sorted((k, v) for k, v in eingaben.items() if not k.startswith("_"))
+    return hashlib.sha256(pickle.dumps(gehasht, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+def _threads_verfuegbar() -> bool:
+    return sys.platform != "emscripten" and hasattr(st, "fragment")
+
+
+def _ausfuehren(job: dict, funktion, eingaben: dict, melde=None):
+    def fortschritt(anteil: float):
+        if job["abbruch"].is_set():
+            raise Abgebrochen
+        job["anteil"] = min(max(float(anteil), 0.0), 1.0)
+        if melde is not None:
+            melde(job["anteil"])
+
+    try:
+        job["ergebnis"] = funktion(**eingaben, _fortschritt=fortschritt)
+    except Abgebrochen:
+        job["abgebrochen"] = True
+    except Exception as e:  # re-raised on the script thread
+        job["fehler"] = e
+    finally:
+        job["fertig"].set()
+
+
+def _starte(name: str, funktion, eingaben: dict, text: str) -> dict:
+    job = {"schluessel": _schluessel(eingaben), "anteil": 0.0, "ergebnis": None, "fehler": None,
+           "abgebrochen": False, "abbruch": threading.Event(), "fertig": threading.Event()}
+    st.session_state.setdefault("v2_jobs", {})[name] = job
+    if _threads_verfuegbar():
+        thread = threading.Thread(target=_ausfuehren, args=(job, funktion, eingaben), name=f"job-{name}",
+                                  daemon=True)
+        if add_script_run_ctx is not None:
+            add_script_run_ctx(thread, get_script_run_ctx())  # st.cache_data inside the job
+        try:
+            thread.start()
+        except RuntimeError:  # no thread support in this runtime
+            pass
+        else:
+            job["fertig"].wait(WARTEN_S)
+            return job
+    balken = st.progress(0.0, text=text)
+    _ausfuehren(job, funktion, eingaben, melde=lambda a: balken.progress(a, text=f"{text} {a:.0%}"))
+    balken.empty()
+    return job
+
+
+def abbrechen(name: str):
+    """Cancel the job *name* (it stops at its next progress report)."""
+    job = st.session_state.get("v2_jobs", {}).get(name)
+    if job is not None:
+        job["abbruch"].set()
+
+
+def _neu_starten(name: str):
+    st.session_state.get("v2_jobs", {}).pop(name, None)
+
+
+if hasattr(st, "fragment"):
+    @st.fragment(run_every=POLL_S)
+    def _fortschritt(name: str, text: str):
+        job = st.session_state.get("v2_jobs", {}).get(name)
+        if job is None or job["fertig"].is_set():
+            st.rerun()
+        c1, c2 = st.columns([5, 1])
+        c1.progress(job["anteil"], text=f"{text} {job['anteil']:.0%}")
+        c2.button("Abbrechen", key=f"job_abbrechen_{name}", on_click=abbrechen, args=(name,),
+                  use_container_width=True)
+
+
+def im_hintergrund(name: str, funktion, *, text: str = "Berechne …", **eingaben):
+    """Result of *funktion(**eingaben, _fortschritt=...)*, computed in the background.
+
+    Returns None (and shows a progress bar) while the job is running or after
+    it was cancelled; exceptions of the job are raised here.
+    """
+    job = st.session_state.get("v2_jobs", {}).get(name)
+    if job is None or job["schluessel"] != _schluessel(eingaben):
+        if job is not None:
+            job["abbruch"].set()
+        job = _starte(name, funktion, eingaben, text)
+
+    if job["fertig"].is_set():
+        if job["fehler"] is not None:
+            raise job["fehler"]
+        if job["abgebrochen"]:
+            c1, c2 = st.columns([5, 1])
+            c1.info("Berechnung abgebrochen.")
+            c2.button("Neu starten", key=f"job_neu_{name}", on_click=_neu_starten, args=(name,),
+                      use_container_width=True)
+            return None
+        return job["ergebnis"]
+    _fortschritt(name, text)
+    return None
@@ -0,0 +1,188 @@
+"""Financing structure explorer: end wealth vs. monthly burden over a dense grid.
+
+Grid axes are the anfängliche Tilgung, the Zinsbindung (priced with a term
+premium per 5 years of Bindung) and the share of the Startkapital that goes
+into the property; the rest is invested in an ETF (taxed, etf_steuer). Each
+point is projected with the scenario's batched engine in chunks, one after
+the other (threads gave no speed-up: the engine's many small array steps
+hold the GIL most of the time, and 100,000 points take about half a second
+anyway). The whole grid runs as a background job (hintergrund), so the page
+stays usable meanwhile.
+
+For a common horizon the end wealth is the property equity, the ETF and the
+former loan rate, which is invested in the ETF from the Volltilgung on. The
+non-dominated frontier minimizes the first-year Monatlicher Eigenaufwand and
+maximizes the end wealth among the points that keep the Restschuld after the
+Zinsbindung below a chosen limit.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import altair as alt
+
+from calculations import etf_steuer, export, hintergrund
+
+CHUNK = 4_000
+MAX_PUNKTE_GRAFIK = 4_000
+
+
+def gitter(tilgung, zinsbindung, anteil_immobilie) -> dict:
+    """Flattened full grid of the three axes (each a 1-D array)."""
+    t, z, a = np.meshgrid(tilgung, zinsbindung, anteil_immobilie, indexing="ij")
+    return {"tilgung": t.ravel(), "zinsbindung": z.ravel().astype(int), "anteil_immobilie": a.ravel()}
+
+
+def _in_chunks(funktion, n: int, chunk: int = CHUNK, fortschritt=None) -> list:
+    """Apply *funktion(slice)* to consecutive slices of range(n).
+
+    *fortschritt(anteil)* is called after every finished slice.
+    """
+    teile = [slice(i, min(i + chunk, n)) for i in range(0, n, chunk)]
+    ergebnisse = []
+    for s in teile:
+        ergebnisse.append(funktion(s))
+        if fortschritt is not None:
+            fortschritt(len(ergebnisse) / len(teile))
+    return ergebnisse
+
+
+def bewerte(berechne_batch, p: dict, punkte: dict, *, gesamtinvestition: float, anfangswert: float, horizont: int,
+            etf_rendite: float, zinsaufschlag: float, fortschritt=None) -> dict:
+    """Burden, end wealth and Restschuld after the Zinsbindung for every grid point (P,)."""
+    eigenkapital = float(p["startkapital_gesamt"])
+    r_m = etf_rendite / 100 / 12
+
+    def chunk(s: slice) -> dict:
+        tilgung, zinsbindung = punkte["tilgung"][s], punkte["zinsbindung"][s]
+        ek_immobilie = eigenkapital * punkte["anteil_immobilie"][s]
+        zinssatz = p["zinssatz"] + zinsaufschlag * (zinsbindung - p["zinsbindung"]) / 5
+        res = berechne_batch(p, {"tilgung": tilgung, "zinsbindung": zinsbindung, "zinssatz": zinssatz,
+                                 "kreditbetrag": gesamtinvestition - ek_immobilie,
+                                 "startkapital_gesamt": ek_immobilie},
+                             spalten=["Restschuld", "Monatlicher Eigenaufwand"])
+        n, t_max = res["Restschuld"].shape
+        zeile = np.arange(n)
+        laufzeit = res["laufzeit"]
+
+        def am_jahr(spalte, jahr):  # value at the end of *jahr*, 0 once the loan is paid off
+            rest = np.column_stack([np.nan_to_num(res[spalte]), np.zeros(n)])
+            return np.where(jahr <= laufzeit, rest[zeile, np.clip(jahr, 1, t_max) - 1], 0.0)
+
+        wertsteigerung = np.asarray(p["wertsteigerung_pa"], dtype=float)
+        immobilie = anfangswert * (1 + wertsteigerung / 100) ** horizont - am_jahr("Restschuld", horizont)
+        etf = etf_steuer.sparplan(eigenkapital - ek_immobilie, etf_rendite, 0.0, horizont,
+                                  personen=2)["Netto Vermögen (n. St.)"][:, -1]
+        monate_frei = 12 * np.maximum(horizont - laufzeit, 0)
+        faktor = np.where(r_m > 0, ((1 + r_m) ** monate_frei - 1) / max(r_m, 1e-12), monate_frei)
+        freie_rate = res["jaehrliche_rate"] / 12 * faktor
+        return {
+            "zinssatz": zinssatz,
+            "belastung": res["Monatlicher Eigenaufwand"][:, 0],
+            "vermoegen": immobilie + etf + freie_rate,
+            "restschuld_zb": am_jahr("Restschuld", zinsbindung),
+            "volltilgung": laufzeit,
+        }
+
+    teile = _in_chunks(chunk, len(punkte["tilgung"]), fortschritt=fortschritt)
+    return {k: np.concatenate([t[k] for t in teile]) for k in teile[0]}
+
+
+def pareto_front(belastung: np.ndarray, vermoegen: np.ndarray) -> np.ndarray:
+    """Indices of the points not dominated in (min belastung, max vermoegen), by rising belastung."""
+    reihenfolge = np.lexsort((-vermoegen, belastung))
+    v = vermoegen[reihenfolge]
+    bisher = np.concatenate([[-np.inf], np.maximum.accumulate(v)[:-1]])
+    return reihenfolge[v > bisher]
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def _bewerte_cached(_berechne_batch, p: dict, n_tilgung: int, n_anteil: int, gesamtinvestition: float,
+                    anfangswert: float, horizont: int, etf_rendite: float, zinsaufschlag: float,
+                    _fortschritt=None) -> dict:
+    punkte = gitter(np.linspace(1.0, 6.0, n_tilgung), np.arange(5, 31), np.linspace(0.0, 1.0, n_anteil))
+    # at least 1 000 € of loan, so that every point has a financing to compare
+    punkte["anteil_immobilie"] = np.minimum(
+        punkte["anteil_immobilie"], max(gesamtinvestition - 1_000, 0.0) / max(p["startkapital_gesamt"], 1.0))
+    t0 = time.perf_counter()
+    werte = bewerte(_berechne_batch, p, punkte, gesamtinvestition=gesamtinvestition, anfangswert=anfangswert,
+                    horizont=horizont, etf_rendite=etf_rendite, zinsaufschlag=zinsaufschlag, fortschritt=_fortschritt)
+    return {**punkte, **werte, "dauer_s": time.perf_counter() - t0}
+
+
+def render_pareto(p: dict, berechne_batch, *, gesamtinvestition: float, anfangswert: float, key_suffix: str = ""):
+    """Analyse block: Pareto frontier of end wealth vs. monthly burden."""
+    if not st.toggle("Raster berechnen", key=f"pareto_aktiv_{key_suffix}",
+                     help="Bis zu ~100 000 Finanzierungsvarianten; dauert einige Sekunden."):
+        st.caption("Tilgung 1–6 %, Zinsbindung 5–30 Jahre und Anteil des Startkapitals in der Immobilie "
+                   "(Rest im ETF) werden gemeinsam variiert.")
+        return
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        horizont = st.number_input("Horizont (Jahre)", 5, 60, 30, 1, key=f"pareto_horizont_{key_suffix}")
+        aufloesung = st.select_slider("Rasterpunkte", ["~10 000", "~50 000", "~100 000"], value="~100 000",
+                                      key=f"pareto_aufloesung_{key_suffix}")
+    with c2:
+        etf_rendite = st.number_input("ETF-Rendite (% p.a.)", 0.0, 15.0,
+                                      float(st.session_state.get("v2_etf_rendite", 7.0)), 0.1,
+                                      key=f"pareto_etf_{key_suffix}")
+        zinsaufschlag = st.number_input("Zinsaufschlag je 5 J. Zinsbindung (%-Pkt.)", 0.0, 1.0, 0.15, 0.05,
+                                        key=f"pareto_aufschlag_{key_suffix}",
+                                        help=f"Relativ zur Eingabe ({p['zinsbindung']} J. zu {p['zinssatz']:.2f} %).")
+    with c3:
+        max_restschuld = st.number_input("Max. Restschuld nach Zinsbindung (€)", 0.0, 1e8,
+                                         float(round(gesamtinvestition, -4)), 10_000.0,
+                                         key=f"pareto_rest_{key_suffix}",
+                                         help="Begrenzt das Zinsänderungsrisiko bei der Anschlussfinanzierung.")
+
+    n_tilgung, n_anteil = {"~10 000": (26, 15), "~50 000": (51, 37), "~100 000": (101, 41)}[aufloesung]
+    r = hintergrund.im_hintergrund(
+        f"pareto_{key_suffix}", _bewerte_cached, text="Berechne Raster …", _berechne_batch=berechne_batch, p=p,
+        n_tilgung=n_tilgung, n_anteil=n_anteil, gesamtinvestition=gesamtinvestition, anfangswert=anfangswert,
+        horizont=int(horizont), etf_rendite=etf_rendite, zinsaufschlag=zinsaufschlag)
+    if r is None:
+        return
+
+    zulaessig = np.flatnonzero(r["restschuld_zb"] <= max_restschuld)
+    if zulaessig.size == 0:
+        st.warning("Kein Rasterpunkt hält die Restschuld-Grenze ein.")
+        return
+    front = zulaessig[pareto_front(r["belastung"][zulaessig], r["vermoegen"][zulaessig])]
+    st.caption(f"{len(r['tilgung']):,} Rasterpunkte in {r['dauer_s']:.1f} s, davon {zulaessig.size:,} innerhalb der "
+               f"Restschuld-Grenze; {front.size} liegen auf der Pareto-Front.")
+
+    def tabelle(idx):
+        return pd.DataFrame({
+            "Tilgung (%)": r["tilgung"][idx], "Zinsbindung (J)": r["zinsbindung"][idx],
+            "Zinssatz (%)": r["zinssatz"][idx], "EK in Immobilie (%)": r["anteil_immobilie"][idx] * 100,
+            "Belastung (€/Monat)": r["belastung"][idx], "Endvermögen (€)": r["vermoegen"][idx],
+            "Restschuld nach Zinsbindung (€)": r["restschuld_zb"][idx], "Volltilgung (J)": r["volltilgung"][idx],
+        })
+
+    rng = np.random.default_rng(0)
+    stichprobe = rng.choice(zulaessig, min(zulaessig.size, MAX_PUNKTE_GRAFIK), replace=False)
+    achsen = {"x": alt.X("Belastung (€/Monat):Q", title="Monatlicher Eigenaufwand Jahr 1 (€)"),
+              "y": alt.Y("Endvermögen (€):Q", title=f"Endvermögen nach {horizont} Jahren (€)",
+                         scale=alt.Scale(zero=False))}
+    tooltip = [alt.Tooltip("Tilgung (%):Q", format=".2f"), "Zinsbindung (J):Q",
+               alt.Tooltip("EK in Immobilie (%):Q", format=".0f"), alt.Tooltip("Belastung (€/Monat):Q", format=",.0f"),
+               alt.Tooltip("Endvermögen (€):Q", format=",.0f"),
+               alt.Tooltip("Restschuld nach Zinsbindung (€):Q", format=",.0f")]
+    wolke = alt.Chart(tabelle(stichprobe)).mark_circle(size=12, opacity=0.25, color="gray").encode(
+        **achsen, tooltip=tooltip)
+    df_front = tabelle(front)
+    linie = alt.Chart(df_front).mark_line(point=True).encode(
+        **achsen, color=alt.Color("Zinsbindung (J):Q", scale=alt.Scale(scheme="viridis")), tooltip=tooltip)
+    st.altair_chart((wolke + linie).interactive().properties(height=420), use_container_width=True)
+
+    st.dataframe(df_front.style.format("{:,.0f}").format({"Tilgung (%)": "{:.2f}", "Zinssatz (%)": "{:.2f}"}),
+                 use_container_width=True, hide_index=True)
+    export.render_export(
+        lambda: (tabelle(np.arange(i, min(i + export.CHUNK_ZEILEN, len(r["tilgung"]))))
+                 for i in range(0, len(r["tilgung"]), export.CHUNK_ZEILEN)),
+        f"finanzierungsraster_{key_suffix}", key_suffix=f"pareto_{key_suffix}", label="Alle Rasterpunkte exportieren",
+        stand=(p, n_tilgung, n_anteil, gesamtinvestition, anfangswert, horizont, etf_rendite, zinsaufschlag))
+    st.caption("Endvermögen = Immobilie − Restschuld + ETF aus dem übrigen Startkapital (versteuert) + ab der "
+               "Volltilgung die frühere Rate als ETF-Sparplan (brutto). Der Vertragszins gilt bis zur Volltilgung.")
@@ -0,0 +1,311 @@
+"""Local SQLite store for named parameter sets and cached projections.
+
+Named scenarios keep the persistent widget values (st.session_state['data'])
+beyond the end of a session. Every scenario belongs to an owner key (see
+professional_plan) and is only listed, loaded, replaced or deleted under
+that key; the database stores a hash of it. Computed projections are cached under the hash
+of their calculation inputs, so loading a saved scenario (or any input set
+that was computed before) is a cache read instead of a recomputation.
+
+Cache keys include a hash of the source files that compute the projections
+(engine, formula register, tax, loans, ETF and the scenario modules), so any
+change of the math invalidates the cache without a manual version bump.
+
+The projection cache is bounded by total payload size and evicts the least
+recently used entries first. In front of it sits a process-wide in-memory
+cache (bounded by entry count and TTL, guarded by a lock), which all
+Streamlit sessions of the server process share: a projection that any
+session computed is served to the others without unpickling. Cached objects
+are shared, so callers must not modify them in place.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import sqlite3
+except ImportError:  # e.g. Pyodide builds without the sqlite3 module
+    sqlite3 = None
+
+# Bump when the format of the cached objects changes in a way the source hash below does not cover.
+CACHE_VERSION = 5
+# Sources (relative to src/v2) whose code produces the cached projections
+_QUELLEN = [
+    "calculations/engine.py", "calculations/formulas.py", "calculations/tax.py", "calculations/darlehen.py",
+    "calculations/etf_steuer.py", "scenarios/*.py",
+]
+
+DB_PATH = os.environ.get(
+    "MORTGAGE_CALC_DB",
+    os.path.join(os.path.expanduser("~"), ".cache", "mortgage-calculator", "scenarios.sqlite3"),
+)
+MAX_CACHE_BYTES = int(os.environ.get("MORTGAGE_CALC_CACHE_BYTES", 64 * 1024 * 1024))
+MAX_MEMORY_ENTRIES = int(os.environ.get("MORTGAGE_CALC_MEMORY_ENTRIES", 256))
+MEMORY_TTL_S = float(os.environ.get("MORTGAGE_CALC_MEMORY_TTL", 3600))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS szenarien (
+    besitzer    TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    szenario    TEXT NOT NULL,
+    params_json TEXT NOT NULL,
+    input_hash  TEXT,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (besitzer, name)
+);
+CREATE INDEX IF NOT EXISTS idx_szenarien_besitzer_updated ON szenarien (besitzer, updated_at);
+
+CREATE TABLE IF NOT EXISTS projektionen (
+    input_hash  TEXT PRIMARY KEY,
+    payload     BLOB NOT NULL,
+    size_bytes  INTEGER NOT NULL,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_projektionen_last_access ON projektionen (last_access);
+"""
+
+_initialized = set()
+
+
+def _quellen_hash() -> str:
+    basis = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    h = hashlib.sha256()
+    for muster in _QUELLEN:
+        for pfad in sorted(glob.glob(os.path.join(basis, muster))):
+            with open(pfad, "rb") as f:
+                h.update(os.path.relpath(pfad, basis).encode("utf-8"))
+                h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+# Version part of every cache key
+CODE_VERSION = f"{CACHE_VERSION}-{_quellen_hash()}"
+
+_memory = OrderedDict()  # input_hash -> (expires_at, obj), least recently used first
+_memory_lock = threading.Lock()
+_stats = {"memory": 0, "sqlite": 0, "miss": 0}
+
+
+def input_hash(params: dict) -> str:
+    """Canonical hash of a calculation input dict (order-independent)."""
+    payload = json.dumps(
+        {"_v": CODE_VERSION, **params}, sort_keys=True, default=str, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_available() -> bool:
+    """True if the SQLite store can be used in this runtime."""
+    return sqlite3 is not None
+
+
+@contextmanager
+def _connect():
+    """Open a connection, commit on success and always close it."""
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+    con = sqlite3.connect(DB_PATH, timeout=10)
+    try:
+        if DB_PATH not in _initialized:
+            spalten = [row[1] for row in con.execute("PRAGMA table_info(szenarien)")]
+            if spalten and "besitzer" not in spalten:
+                # scenarios saved before owner keys existed cannot be assigned to anyone
+                con.execute("ALTER TABLE szenarien RENAME TO szenarien_ohne_besitzer")
+            con.executescript(_SCHEMA)
+            _initialized.add(DB_PATH)
+        with con:
+            yield con
+    finally:
+        con.close()
+
+
+# =============================================================================
+# Named parameter sets
+# =============================================================================
+
+def _besitzer_id(besitzer: str) -> str:
+    return hashlib.sha256(besitzer.encode("utf-8")).hexdigest()
+
+
+def speichere_szenario(besitzer: str, name: str, szenario: str, params: dict, projektion_hash: str | None = None,
+                       ueberschreiben: bool = False) -> bool:
+    """Save a named parameter set of *besitzer*.
+
+    An existing set of the same name is only replaced with *ueberschreiben*;
+    returns False if it was kept.
+    """
+    if not is_available():
+        return False
+    werte = (_besitzer_id(besitzer), name, szenario, json.dumps(params, default=str), projektion_hash, time.time())
+    with _connect() as con:
+        if ueberschreiben:
+            con.execute(
+                "INSERT OR REPLACE INTO szenarien (besitzer, name, szenario, params_json, input_hash, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", werte)
+            return True
+        cur = con.execute(
+            "INSERT OR IGNORE INTO szenarien (besitzer, name, szenario, params_json, input_hash, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", werte)
+        return cur.rowcount == 1
+
+
+def lade_szenario(besitzer: str, name: str) -> dict | None:
+    """Return {'szenario', 'params', 'input_hash'} for *name* of *besitzer* or None."""
+    if not is_available():
+        return None
+    with _connect() as con:
+        row = con.execute(
+            "SELECT szenario, params_json, input_hash FROM szenarien WHERE besitzer = ? AND name = ?",
+            (_besitzer_id(besitzer), name),
+        ).fetchone()
+    if row is None:
+        return None
+    return {"szenario": row[0], "params": json.loads(row[1]), "input_hash": row[2]}
+
+
+def liste_szenarien(besitzer: str) -> list[str]:
+    """Names of the parameter sets of *besitzer*, most recently updated first."""
+    if not is_available():
+        return []
+    with _connect() as con:
+        rows = con.execute("SELECT name FROM szenarien WHERE besitzer = ? ORDER BY updated_at DESC",
+                           (_besitzer_id(besitzer),)).fetchall()
+    return [r[0] for r in rows]
+
+
+def loesche_szenario(besitzer: str, name: str):
+    """Delete a named parameter set of *besitzer* (its cached projection stays in the LRU)."""
+    if not is_available():
+        return
+    with _connect() as con:
+        con.execute("DELETE FROM szenarien WHERE besitzer = ? AND name = ?", (_besitzer_id(besitzer), name))
+
+
+# =============================================================================
+# Projection cache
+# =============================================================================
+
+def lade_projektion(key: str):
+    """Return the cached object for *key* (touching its LRU stamp) or None.
+
+    An entry that no longer unpickles (written by other code) is dropped and
+    treated as missing.
+    """
+    if not is_available():
+        return None
+    with _connect() as con:
+        row = con.execute("SELECT payload FROM projektionen WHERE input_hash = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            obj = pickle.loads(row[0])
+        except Exception:  # AttributeError, ModuleNotFoundError, EOFError, UnpicklingError, ...
+            con.execute("DELETE FROM projektionen WHERE input_hash = ?", (key,))
+            return None
+        con.execute("UPDATE projektionen SET last_access = ? WHERE input_hash = ?", (time.time(), key))
+    return obj
+
+
+def speichere_projektion(key: str, obj):
+    """Store *obj* under *key* and evict least recently used entries above MAX_CACHE_BYTES."""
+    if not is_available():
+        return
+    payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    now = time.time()
+    with _connect() as con:
+        con.execute(
+            "INSERT OR REPLACE INTO projektionen (input_hash, payload, size_bytes, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, payload, len(payload), now, now),
+        )
+        _evict(con)
+
+
+def _evict(con):
+    total = con.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM projektionen").fetchone()[0]
+    if total <= MAX_CACHE_BYTES:
+        return
+    to_delete = []
+    for key, size in con.execute("SELECT input_hash, size_bytes FROM projektionen ORDER BY last_access ASC"):
+        if total <= MAX_CACHE_BYTES:
+            break
+        to_delete.append((key,))
+        total -= size
+    con.executemany("DELETE FROM projektionen WHERE input_hash = ?", to_delete)
+
+
+# =============================================================================
+# Process-wide memory cache
+# =============================================================================
+
+def _memory_get(key: str):
+    with _memory_lock:
+        entry = _memory.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _memory[key]
+            return None
+        _memory.move_to_end(key)
+        return entry[1]
+
+
+def _memory_put(key: str, obj):
+    with _memory_lock:
+        _memory[key] = (time.monotonic() + MEMORY_TTL_S, obj)
+        _memory.move_to_end(key)
+        while len(_memory) > MAX_MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _count(quelle: str):
+    with _memory_lock:
+        _stats[quelle] += 1
+
+
+def cache_statistik() -> dict:
+    """Hits per layer ('memory', 'sqlite'), misses, the hit rate and the number of entries in memory."""
+    with _memory_lock:
+        stats = dict(_stats)
+        stats["eintraege"] = len(_memory)
+    anfragen = stats["memory"] + stats["sqlite"] + stats["miss"]
+    stats["trefferquote"] = (stats["memory"] + stats["sqlite"]) / anfragen if anfragen else 0.0
+    return stats
+
+
+def leere_speicher_cache():
+    """Drop all in-memory entries and reset the statistics (the SQLite cache is kept)."""
+    with _memory_lock:
+        _memory.clear()
+        _stats.update(memory=0, sqlite=0, miss=0)
+
+
+def cached_projektion(params: dict, berechne):
+    """Return berechne(params), served from memory or the store when the inputs were seen before."""
+    key = input_hash(params)
+    result = _memory_get(key)
+    if result is not None:
+        _count("memory")
+        return result
+    try:
+        result = lade_projektion(key)
+    except Exception:  # an unreadable store is a cache miss, never an error of the page
+        result = None
+    if result is None:
+        _count("miss")
+        result = berechne(params)
+        try:
+            speichere_projektion(key, result)
+        except Exception:  # e.g. an unpicklable result or a full disk: the page keeps the computed result
+            pass
+    else:
+        _count("sqlite")
+    _memory_put(key, result)
+    return result
@@ -0,0 +1,168 @@
+"""Sondertilgung optimizer: annual extra repayments chosen by dynamic programming.
+
+State is the Restschuld on a grid, the action the Sondertilgung of the year
+(a fraction of the contractual cap, limited by the liquidity budget). The
+Bellman recursion evaluates all grid points x actions of a year in one array
+operation and interpolates the next year's value function linearly, so a
+30-year solve is a few milliseconds. The chosen policy is then replayed
+exactly (off-grid) from the actual Kreditbetrag.
+
+Money that is not used for Sondertilgung, and the rate that is freed after
+Volltilgung, is invested at *anlage_rendite* until the end of the horizon.
+Interest is tax deductible at *grenzsteuersatz* (rental property), the
+household's marginal rate from the tariff at its zvE including V+V.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from calculations import darlehen
+from calculations.tax import get_grenzsteuersatz_zusammen_vec
+
+ZIELE = ["Endvermögen maximieren", "Zinskosten minimieren"]
+N_GITTER = 1_201
+N_STUFEN = 21
+
+
+def _jahr(restschuld, s, zins_pa, annuitaet):
+    """One year of the annuity loan with Sondertilgung *s* paid at year end.
+
+    Returns (zins, regular tilgung, Restschuld after Sondertilgung).
+    """
+    zins = restschuld * zins_pa
+    tilg = np.clip(annuitaet - zins, 0.0, restschuld)
+    return zins, tilg, np.maximum(restschuld - tilg - s, 0.0)
+
+
+def _belohnung(zins, tilg, s, annuitaet, budget_pa, grenzsteuersatz, aufzinsung, ziel):
+    if ziel == ZIELE[1]:
+        return -zins
+    # freie Liquidität: Budget - Sondertilgung + nicht benötigte Rate + Steuerersparnis der Zinsen
+    frei = budget_pa - s + (annuitaet - zins - tilg) + zins * grenzsteuersatz
+    return frei * aufzinsung
+
+
+def optimiere(kreditbetrag: float, zinssatz: float, tilgung: float, zinsbindung: int, *, budget_pm: float,
+              cap_prozent: float = 5.0, anschlusszins: float | None = None, anlage_rendite: float = 0.0,
+              grenzsteuersatz: float = 0.0, ziel: str = ZIELE[0], jahre: int | None = None,
+              n_gitter: int = N_GITTER, n_stufen: int = N_STUFEN) -> dict:
+    """Optimal Sondertilgung per year for one annuity loan.
+
+    The annual Sondertilgung is at most *cap_prozent* of the original
+    Kreditbetrag and at most 12 * *budget_pm*. After the Zinsbindung the
+    Restschuld runs on at *anschlusszins* (default: unchanged) with the same
+    rate. The horizon *jahre* defaults to the regular Laufzeit without
+    Sondertilgung. Returns the replayed plan as a DataFrame ('plan'), the
+    plan without Sondertilgung ('ohne') and the solve time in ms.
+    """
+    anschlusszins = zinssatz if anschlusszins is None else anschlusszins
+    annuitaet = kreditbetrag * (zinssatz + tilgung) / 100
+    if jahre is None:
+        jahre = int(darlehen.tranchen_plan(kreditbetrag, zinssatz, tilgung)["laufzeit"][0])
+    zins_pa = np.where(np.arange(jahre) < zinsbindung, zinssatz, anschlusszins) / 100
+    budget_pa = 12 * budget_pm
+    s_max = min(kreditbetrag * cap_prozent / 100, budget_pa)
+    aufzinsung = (1 + anlage_rendite / 100) ** (jahre - 1 - np.arange(jahre))
+    g = min(max(grenzsteuersatz, 0.0), 100.0) / 100  # a deduction never costs tax
+
+    t0 = time.perf_counter()
+    gitter = np.linspace(0.0, kreditbetrag, n_gitter)
+    aktionen = np.linspace(0.0, s_max, n_stufen)
+
+    # werte[t] is the value function at the start of year t on the grid; the
+    # terminal value repays any remaining debt from wealth (Endvermögen).
+    werte = np.empty((jahre + 1, n_gitter))
+    werte[jahre] = -gitter if ziel == ZIELE[0] else 0.0
+    R = gitter[:, None]
+    for t in range(jahre - 1, -1, -1):
+        zins, tilg, _ = _jahr(R, 0.0, zins_pa[t], annuitaet)
+        s = np.minimum(aktionen[None, :], R - tilg)
+        q = (_belohnung(zins, tilg, s, annuitaet, budget_pa, g, aufzinsung[t], ziel)
+             + np.interp(R - tilg - s, gitter, werte[t + 1]))
+        werte[t] = q.max(axis=1)
+    dauer_ms = (time.perf_counter() - t0) * 1000
+
+    def replay(mit_sondertilgung: bool) -> pd.DataFrame:
+        zeilen, R_t = [], kreditbetrag
+        for t in range(jahre):
+            zins, tilg, _ = _jahr(R_t, 0.0, zins_pa[t], annuitaet)
+            s = 0.0
+            if mit_sondertilgung and R_t > 1.0:
+                # exact (off-grid) choice against the interpolated value of the next year
+                s_opt = np.minimum(aktionen, R_t - tilg)
+                q = (_belohnung(zins, tilg, s_opt, annuitaet, budget_pa, g, aufzinsung[t], ziel)
+                     + np.interp(R_t - tilg - s_opt, gitter, werte[t + 1]))
+                s = float(s_opt[np.argmax(q)])
+            R_t = max(R_t - tilg - s, 0.0)
+            zeilen.append({"Jahr": t + 1, "Zinsanteil": zins, "Tilgungsanteil": tilg, "Sondertilgung": s,
+                           "Restschuld": R_t})
+        return pd.DataFrame(zeilen)
+
+    plan, ohne = replay(True), replay(False)
+    for df in (plan, ohne):
+        frei = budget_pa - df["Sondertilgung"] + (annuitaet - df["Zinsanteil"] - df["Tilgungsanteil"]) \
+            + df["Zinsanteil"] * g
+        df["Anlage"] = (frei * aufzinsung).cumsum() / aufzinsung  # invested liquidity, valued at year end
+    return {"plan": plan, "ohne": ohne, "dauer_ms": dauer_ms, "s_max": s_max}
+
+
+def mittlerer_grenzsteuersatz(zve_haushalt) -> float:
+    """Mean marginal tax rate (%) at the household zvE of the projection years (NaN years are skipped)."""
+    zve = np.asarray(zve_haushalt, dtype=float)
+    zve = zve[~np.isnan(zve)]
+    return float(get_grenzsteuersatz_zusammen_vec(zve).mean() * 100) if zve.size else 0.0
+
+
+def render_sondertilgung(p: dict, berechne_batch, key_suffix: str = ""):
+    """Analyse block: optimize the Sondertilgung of the bank loan."""
+    tranchen = darlehen.portfolio(p["kreditbetrag"], p["zinssatz"], p["tilgung"],
+                                  darlehen.weitere_tranchen(p.get("tranchen")))
+    bankdarlehen = float(tranchen["betrag"][0, 0])
+    if bankdarlehen <= 1.0:
+        st.info("Kein Bankdarlehen vorhanden.")
+        return
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        budget_pm = st.number_input("Budget für Sondertilgung (€/Monat)", 0.0, 20_000.0, 500.0, 50.0,
+                                    key=f"st_budget_{key_suffix}")
+        cap_prozent = st.number_input("Max. Sondertilgung (% p.a.)", 0.0, 100.0, 5.0, 0.5,
+                                      key=f"st_cap_{key_suffix}",
+                                      help="Vertraglich vereinbartes Sondertilgungsrecht, bezogen auf den Darlehensbetrag.")
+    with c2:
+        anlage_rendite = st.number_input("Rendite Alternativanlage (% p.a., nach Steuer)", 0.0, 15.0, 4.0, 0.1,
+                                         key=f"st_rendite_{key_suffix}")
+        anschlusszins = st.number_input("Zins nach Zinsbindung (%)", 0.1, 15.0, float(p["zinssatz"]), 0.1,
+                                        key=f"st_anschluss_{key_suffix}")
+    with c3:
+        ziel = st.radio("Ziel", ZIELE, key=f"st_ziel_{key_suffix}")
+        zve = berechne_batch(p, spalten=["zvE Haushalt (mit V+V)"])["zvE Haushalt (mit V+V)"][0]
+        grenzsteuersatz = mittlerer_grenzsteuersatz(zve)
+        st.caption(f"Zinsen mindern die Steuer mit Ø {grenzsteuersatz:.1f} % (Grenzsteuersatz beim zvE des "
+                   "Haushalts inkl. V+V).")
+
+    res = optimiere(bankdarlehen, p["zinssatz"], p["tilgung"], int(p["zinsbindung"]), budget_pm=budget_pm,
+                    cap_prozent=cap_prozent, anschlusszins=anschlusszins, anlage_rendite=anlage_rendite,
+                    grenzsteuersatz=grenzsteuersatz, ziel=ziel)
+    plan, ohne = res["plan"], res["ohne"]
+    laufzeit = int((plan["Restschuld"] > 1.0).sum()) + 1
+    laufzeit_ohne = int((ohne["Restschuld"] > 1.0).sum()) + 1
+
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Sondertilgungen gesamt", f"{plan['Sondertilgung'].sum():,.0f} €")
+    m2.metric("Zinsersparnis", f"{ohne['Zinsanteil'].sum() - plan['Zinsanteil'].sum():,.0f} €",
+              help=f"Volltilgung nach {min(laufzeit, len(plan))} statt {min(laufzeit_ohne, len(ohne))} Jahren")
+    end_mit = plan["Anlage"].iloc[-1] - plan["Restschuld"].iloc[-1]
+    end_ohne = ohne["Anlage"].iloc[-1] - ohne["Restschuld"].iloc[-1]
+    m3.metric("Mehr-Vermögen am Ende", f"{end_mit - end_ohne:+,.0f} €",
+              help="Angelegte freie Liquidität minus Restschuld, verglichen mit 'keine Sondertilgung'.")
+    st.caption(f"Optimiert über {len(plan)} Jahre in {res['dauer_ms']:.0f} ms (Bankdarlehen {bankdarlehen:,.0f} €). "
+               "Werte nominal.")
+
+    anzeige = plan[["Jahr", "Sondertilgung", "Zinsanteil", "Restschuld"]].copy()
+    anzeige["Restschuld ohne Sondertilgung"] = ohne["Restschuld"]
+    st.dataframe(anzeige[anzeige["Sondertilgung"] > 0].style.format("{:,.0f}").format({"Jahr": "{:d}"}),
+                 use_container_width=True, hide_index=True)
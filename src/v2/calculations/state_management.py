@@ -6,6 +6,7 @@ values from st.session_state['data']. This ensures that input values are
 preserved when switching between different scenarios.
 """
 
+import pandas as pd
 import streamlit as st
 from typing import Any, Optional
 
@@ -225,3 +226,27 @@ def persistent_checkbox(
     
     st.session_state["data"][key] = val
     return val
+
+
+def persistent_data_editor(
+    data: pd.DataFrame,
+    key: str,
+    **kwargs
+) -> pd.DataFrame:
+    """
+    Wrapper for st.data_editor that persists the edited rows in st.session_state['data'].
+    The table is stored as a list of row dicts; *data* is only the initial content.
+    """
+    init_session_state()
+
+    # The editor keeps its edits relative to the frame it was created with, so
+    # that frame must stay fixed while the widget lives.
+    base_key = f"{key}__base"
+    if key not in st.session_state or base_key not in st.session_state:
+        rows = st.session_state["data"].get(key)
+        st.session_state[base_key] = pd.DataFrame(list(rows), columns=data.columns) if rows is not None else data
+
+    val = st.data_editor(st.session_state[base_key], key=key, **kwargs)
+
+    st.session_state["data"][key] = val.to_dict("records")
+    return val
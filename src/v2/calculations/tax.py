@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 
 def berechne_einkommensteuer(zve):
     """Vereinfachte Formel EStG 2024/2025 (Progressionszonen).
@@ -35,3 +37,32 @@ def get_steuerlast_zusammen(einkommen_a, einkommen_b):
     zve_gesamt = einkommen_a + einkommen_b
     steuer = 2 * berechne_einkommensteuer(zve_gesamt / 2)
     return steuer
+
+
+def berechne_einkommensteuer_vec(zve):
+    """Vektorisierte Variante von berechne_einkommensteuer für numpy-Arrays."""
+    zve = np.maximum(0.0, np.asarray(zve, dtype=float))
+    y = (zve - 11604) / 10000
+    z = (zve - 17005) / 10000
+    st = np.select(
+        [zve <= 11604, zve <= 17005, zve <= 66760, zve <= 277825],
+        [0.0, (922.98 * y + 1400) * y, (181.19 * z + 2397) * z + 1082.7, 0.42 * zve - 10633.76],
+        default=0.45 * zve - 18968.51,
+    )
+    return np.floor(st)
+
+
+def get_steuerlast_zusammen_vec(einkommen_a, einkommen_b):
+    """Vektorisierte Zusammenveranlagung (Splitting) für numpy-Arrays."""
+    zve_gesamt = np.asarray(einkommen_a, dtype=float) + np.asarray(einkommen_b, dtype=float)
+    return 2 * berechne_einkommensteuer_vec(zve_gesamt / 2)
+
+
+def get_grenzsteuersatz_zusammen_vec(zve_gesamt, schritt=100.0):
+    """Grenzsteuersatz (0..1) der Zusammenveranlagung beim zvE *zve_gesamt*.
+
+    Steuer auf die letzten *schritt* Euro je Euro; der Tarif rundet auf volle
+    Euro ab, daher nicht auf 1 Euro genau.
+    """
+    zve = np.asarray(zve_gesamt, dtype=float)
+    return (get_steuerlast_zusammen_vec(zve, 0.0) - get_steuerlast_zusammen_vec(zve - schritt, 0.0)) / schritt
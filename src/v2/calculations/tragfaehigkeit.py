@@ -0,0 +1,144 @@
+"""Affordability from the bank's perspective: the maximum Kaufpreis per Zinssatz x Zinsbindung.
+
+A Kaufpreis is affordable if the loan it needs (Kaufpreis plus Nebenkosten
+minus Eigenkapital) satisfies the bank rules:
+
+* monthly rate <= max. Ratenquote x (Haushaltsnetto + credited share of the rent),
+* Beleihungsauslauf: Kreditbetrag <= max. share of the Kaufpreis,
+* optionally: Restschuld at the end of the Zinsbindung <= max. share of the Kaufpreis.
+
+All cells of the Zinssatz x Zinsbindung grid are bisected together; every
+step is one batched loan-portfolio schedule (darlehen.tranchen_plan).
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from calculations import darlehen
+from calculations.tax import get_steuerlast_zusammen
+
+N_RUNDEN = 32
+OBERGRENZE = 20_000_000.0
+REGELN = ["Ratenquote", "Beleihungsauslauf", "Restschuld nach Zinsbindung"]
+
+_REICHT = "background-color: #c8e6c9; color: black"
+_REICHT_NICHT = "background-color: #ffcdd2; color: black"
+
+
+def max_kaufpreis(*, eigenkapital: float, nebenkosten_prozent: float, netto_pm: float, miete_pm: float, zinssatz,
+                  zinsbindung, tilgung: float, max_ratenquote: float = 35.0, max_beleihung: float = 90.0,
+                  mietanrechnung: float = 70.0, max_restschuld_zb: float | None = None, tranchen: dict | None = None,
+                  n_runden: int = N_RUNDEN) -> dict:
+    """Maximum Kaufpreis for every combination of *zinssatz* (Z,) and *zinsbindung* (B,).
+
+    Returns (Z, B) arrays 'kaufpreis', 'gesamtinvestition', 'kreditbetrag',
+    'rate_pm' and 'grenze' (index into REGELN of the rule that binds first;
+    -1 if the Kaufpreis reaches OBERGRENZE).
+    """
+    z, b = np.meshgrid(np.atleast_1d(np.asarray(zinssatz, dtype=float)),
+                       np.atleast_1d(np.asarray(zinsbindung, dtype=int)), indexing="ij")
+    form = z.shape
+    z, b = z.ravel(), b.ravel()
+    faktor = 1 + nebenkosten_prozent / 100
+    rate_max = max_ratenquote / 100 * (netto_pm + mietanrechnung / 100 * miete_pm)
+
+    def pruefe(kaufpreis):
+        kredit = np.maximum(kaufpreis * faktor - eigenkapital, 0.0)
+        t = darlehen.portfolio(kredit, z, tilgung, tranchen)
+        rate_pm = (t["betrag"] * (t["zinssatz"] + t["tilgung"]) / 100).sum(axis=1) / 12
+        verletzt = np.zeros((len(REGELN), len(z)), dtype=bool)
+        verletzt[0] = rate_pm > rate_max
+        verletzt[1] = kredit > max_beleihung / 100 * kaufpreis
+        if max_restschuld_zb is not None:
+            plan = darlehen.tranchen_plan(t["betrag"], t["zinssatz"], t["tilgung"], t["tilgungsfrei"],
+                                          max_laufzeit=int(b.max()))
+            rest = np.column_stack([plan["restschuld"], np.zeros(len(z))])  # paid off -> 0
+            rest_zb = np.nan_to_num(rest[np.arange(len(z)), np.minimum(b, rest.shape[1]) - 1])
+            verletzt[2] = rest_zb > max_restschuld_zb / 100 * kaufpreis
+        return verletzt, kredit, rate_pm
+
+    unten = np.zeros(len(z))
+    oben = np.full(len(z), OBERGRENZE)
+    verletzt_oben, _, _ = pruefe(oben)
+    offen = verletzt_oben.any(axis=0)
+    unten[~offen] = OBERGRENZE
+    for _ in range(n_runden):
+        mitte = (unten + oben) / 2
+        verletzt, _, _ = pruefe(mitte)
+        ok = ~verletzt.any(axis=0) | ~offen
+        unten = np.where(ok, mitte, unten)
+        oben = np.where(ok, oben, mitte)
+
+    verletzt_oben, _, _ = pruefe(oben)
+    _, kredit, rate_pm = pruefe(unten)
+    grenze = np.where(offen, np.argmax(verletzt_oben, axis=0), -1)
+    return {
+        "kaufpreis": unten.reshape(form),
+        "gesamtinvestition": (unten * faktor).reshape(form),
+        "kreditbetrag": kredit.reshape(form),
+        "rate_pm": rate_pm.reshape(form),
+        "grenze": grenze.reshape(form),
+    }
+
+
+def render_tragfaehigkeit(p: dict, *, nebenkosten_prozent: float, kaufpreis: float, key_suffix: str = "",
+                          objekt_label: str = "Kaufpreis"):
+    """Analyse block: affordability table over Zinssatz x Zinsbindung for the scenario inputs *p*.
+
+    *kaufpreis* is the current object value and *nebenkosten_prozent* the
+    costs on top of it, both as the scenario defines them (Neubau: Grundstück
+    + Baukosten, and Bau-/Kaufnebenkosten).
+    """
+    zve = p["std_einkommen_mann"] + p["std_einkommen_frau"]
+    netto_standard = (zve - get_steuerlast_zusammen(p["std_einkommen_mann"], p["std_einkommen_frau"])) / 12
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        netto_pm = st.number_input("Haushaltsnetto (€/Monat)", 0.0, 100_000.0, float(round(netto_standard, -1)),
+                                   100.0, key=f"tf_netto_{key_suffix}",
+                                   help="Standard: zvE minus Einkommensteuer (Splitting), ohne Sozialabgaben.")
+        mietanrechnung = st.number_input("Anrechnung Mieteinnahmen (%)", 0.0, 100.0, 70.0, 5.0,
+                                         key=f"tf_miete_{key_suffix}")
+    with c2:
+        max_ratenquote = st.number_input("Max. Rate / Einkommen (%)", 5.0, 80.0, 35.0, 1.0,
+                                         key=f"tf_quote_{key_suffix}")
+        max_beleihung = st.number_input("Max. Beleihungsauslauf (%)", 10.0, 120.0, 90.0, 5.0,
+                                        key=f"tf_ltv_{key_suffix}", help=f"Kreditbetrag / {objekt_label}.")
+    with c3:
+        max_restschuld = st.number_input("Max. Restschuld nach Zinsbindung (%)", 0.0, 120.0, 70.0, 5.0,
+                                         key=f"tf_rest_{key_suffix}",
+                                         help=f"Bezogen auf den {objekt_label}; 0 = keine Vorgabe.")
+        spanne = st.number_input("Zinsspanne ± (%-Pkt.)", 0.0, 3.0, 1.0, 0.25, key=f"tf_spanne_{key_suffix}")
+
+    zinssaetze = np.round(np.arange(max(p["zinssatz"] - spanne, 0.25), p["zinssatz"] + spanne + 1e-9, 0.25), 2)
+    bindungen = np.array(sorted({5, 10, 15, 20, 25, 30, int(p["zinsbindung"])}))
+    res = max_kaufpreis(
+        eigenkapital=p["startkapital_gesamt"], nebenkosten_prozent=nebenkosten_prozent, netto_pm=netto_pm,
+        miete_pm=p["mieteinnahmen_pm"], zinssatz=np.append(zinssaetze, p["zinssatz"]), zinsbindung=bindungen,
+        tilgung=p["tilgung"], max_ratenquote=max_ratenquote, max_beleihung=max_beleihung,
+        mietanrechnung=mietanrechnung, max_restschuld_zb=max_restschuld or None,
+        tranchen=darlehen.weitere_tranchen(p.get("tranchen")),
+    )
+
+    # last row is the scenario's own Zinssatz
+    j = int(np.flatnonzero(bindungen == int(p["zinsbindung"]))[0])
+    maximum, grenze = res["kaufpreis"][-1, j], int(res["grenze"][-1, j])
+    m1, m2, m3 = st.columns(3)
+    m1.metric(f"Max. {objekt_label}", f"{maximum:,.0f} €", delta=f"{maximum - kaufpreis:+,.0f} € zur Eingabe",
+              delta_color="normal")
+    m2.metric("Max. Gesamtinvestition", f"{res['gesamtinvestition'][-1, j]:,.0f} €",
+              help=f"Kreditbetrag {res['kreditbetrag'][-1, j]:,.0f} €, Rate {res['rate_pm'][-1, j]:,.0f} €/Monat.")
+    m3.metric("Begrenzt durch", REGELN[grenze] if grenze >= 0 else "—")
+
+    tabelle = pd.DataFrame(res["kaufpreis"][:-1], index=[f"{z:.2f} %" for z in zinssaetze],
+                           columns=[f"{b} J." for b in bindungen])
+    tabelle.index.name = "Zinssatz"
+    st.markdown(f"**Max. {objekt_label} nach Zinssatz und Zinsbindung** (Tilgung {p['tilgung']:.1f} %)")
+    farben = lambda df: pd.DataFrame(np.where(df >= kaufpreis, _REICHT, _REICHT_NICHT),  # noqa: E731
+                                     index=df.index, columns=df.columns)
+    st.dataframe(tabelle.style.format("{:,.0f}").apply(farben, axis=None), use_container_width=True)
+    st.caption(f"Eigenkapital {p['startkapital_gesamt']:,.0f} €, Nebenkosten {nebenkosten_prozent:.1f} % "
+               f"auf den {objekt_label}, Kaltmiete {p['mieteinnahmen_pm']:,.0f} €/Monat (anteilig angerechnet). "
+               f"Grün: der aktuelle {objekt_label} ({kaufpreis:,.0f} €) ist finanzierbar. "
+               "Weitere Darlehen aus der Seitenleiste sind enthalten.")
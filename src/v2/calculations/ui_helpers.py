@@ -1,7 +1,36 @@
 """Reusable UI helper functions shared across all scenarios."""
 
+import hashlib
+
+import numpy as np
 import streamlit as st
 import altair as alt
+import pandas as pd
+
+from calculations import export
+from calculations.formulas import suche
+
+# Above this many rows the table skips the pandas Styler (which renders every
+# cell on each rerun) and uses native column formatting instead.
+STYLER_MAX_ROWS = 120
+# Rows per page in native mode; st.dataframe virtualizes within a page.
+TABLE_PAGE_SIZE = 5_000
+
+_GRUEN = "background-color: #c8e6c9; color: black"
+_ROT = "background-color: #ffcdd2; color: black"
+_AFA = "background-color: #e8f5e9; color: black"
+_SONDER = "background-color: #fff3cd; color: black"
+
+# Column -> (style for values > 0, style for values < 0)
+_VORZEICHEN_STYLES = {
+    "Cashflow": (_GRUEN, _ROT),
+    "Zuwachs Vermögen": ("background-color: #dcedc8; color: black", ""),
+    "Steuerersparnis": ("background-color: #e1bee7; color: black", ""),
+    "Monatlicher Eigenaufwand": ("background-color: #ffebee; color: black", _AFA),
+    "Netto-Erlös bei Verkauf (Exit)": (_GRUEN, _ROT),
+}
+_AFA_COLS = ["AfA", "Sonder-AfA (§7b)", "AfA Gesamt"]
+_TEXT_COLS = ["AfA (Methode)"]
 
 
 def render_toggles():
@@ -31,8 +60,148 @@ def apply_inflation(df, inflationsrate, exclude_cols=None):
     return df_display
 
 
+def highlight_masks(df, sonder_jahre=None):
+    """Return a frame of CSS strings (same shape as *df*) for the table colors.
+
+    All rules are evaluated as vectorized masks per column instead of one
+    Python callback per cell, so the cost does not grow with Styler.map calls.
+    """
+    css = pd.DataFrame("", index=df.index, columns=df.columns)
+    for col, (style_pos, style_neg) in _VORZEICHEN_STYLES.items():
+        if col in df.columns:
+            werte = df[col].to_numpy(dtype=float)
+            css[col] = np.where(werte > 0, style_pos, np.where(werte < 0, style_neg, ""))
+    for col in _AFA_COLS:
+        if col in df.columns:
+            css[col] = _AFA
+    if sonder_jahre and "Einkommen (zvE)" in df.columns and "Jahr" in df.columns:
+        im_sonderzeitraum = df["Jahr"].between(sonder_jahre[0], sonder_jahre[1]).to_numpy()
+        css.loc[im_sonderzeitraum, "Einkommen (zvE)"] = _SONDER
+    return css
+
+
+def _column_config(cols):
+    """Native st.dataframe number formats matching the Styler formats."""
+    config = {}
+    for col in cols:
+        if col == "Jahr":
+            config[col] = st.column_config.NumberColumn(col, format="%d")
+        elif col == "Grenzsteuersatz (%)":
+            config[col] = st.column_config.NumberColumn(col, format="%.1f %%")
+        elif col not in _TEXT_COLS:
+            config[col] = st.column_config.NumberColumn(col, format="%.2f €")
+    return config
+
+
+def render_table_tab(df_display, cols_default, key_suffix="", sonder_jahre=None, highlight=True):
+    """Render the projection table with a column picker.
+
+    Small frames are shown through the Styler with colored highlights. Large
+    frames (monthly output, batch results) are sent once as Arrow with native
+    column formatting and paged, so the rendering cost stays flat.
+    """
+    cols_all = df_display.columns.tolist()
+    defaults = [c for c in cols_default if c in cols_all]
+    cols_selected = st.multiselect(
+        "Spalten anzeigen:", cols_all, default=defaults,
+        key=f"table_select_{key_suffix}" if key_suffix else None,
+    )
+    df_filtered = df_display[cols_selected]
+    col_alle, col_export = st.columns([1, 2])
+    alle = col_alle.checkbox("Alle Spalten exportieren", key=f"table_export_alle_{key_suffix}")
+    with col_export:
+        export.render_export(lambda: export.frame_bloecke(df_display if alle else df_filtered),
+                             f"projektion_{key_suffix or 'tabelle'}", key_suffix=f"tabelle_{key_suffix}",
+                             stand=(projection_hash(df_display), cols_selected, alle))
+
+    if len(df_filtered) <= STYLER_MAX_ROWS:
+        format_dict = {col: "{:,.2f} €" for col in cols_selected if col not in ["Jahr", "Grenzsteuersatz (%)", *_TEXT_COLS]}
+        if "Jahr" in cols_selected: format_dict["Jahr"] = "{:.0f}"
+        if "Grenzsteuersatz (%)" in cols_selected: format_dict["Grenzsteuersatz (%)"] = "{:.1f} %"
+        styler = df_filtered.style.format(format_dict).hide(axis="index")
+        if highlight:
+            styler = styler.apply(highlight_masks, axis=None, sonder_jahre=sonder_jahre)
+        st.dataframe(styler, use_container_width=True, height=700, hide_index=True)
+        return
+
+    n_pages = -(-len(df_filtered) // TABLE_PAGE_SIZE)
+    if n_pages > 1:
+        page = st.number_input(
+            f"Seite (von {n_pages}, je {TABLE_PAGE_SIZE:,} Zeilen)", min_value=1, max_value=n_pages, value=1,
+            key=f"table_page_{key_suffix}" if key_suffix else None,
+        )
+        start = (int(page) - 1) * TABLE_PAGE_SIZE
+        df_filtered = df_filtered.iloc[start:start + TABLE_PAGE_SIZE]
+    st.dataframe(
+        df_filtered, use_container_width=True, height=700, hide_index=True,
+        column_config=_column_config(cols_selected),
+    )
+
+
+def projection_hash(df):
+    """Return a stable content hash of *df* (values + column names).
+
+    Used as cache key for everything derived from a projection frame, so
+    reruns with an unchanged projection can skip the derived work.
+    """
+    h = hashlib.sha1(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    return h.hexdigest()
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _chart_long_format(_df, df_hash, selected_cols):
+    """Melt the selected columns into long format with reduced precision.
+
+    Values are rounded to whole euros and stored as float32 / categorical,
+    which keeps the payload sent to the browser small.
+    """
+    chart_data = _df[["Jahr", *selected_cols]].melt(
+        "Jahr", value_vars=list(selected_cols), var_name="Kategorie", value_name="Wert"
+    )
+    chart_data["Jahr"] = chart_data["Jahr"].astype("int16")
+    chart_data["Kategorie"] = chart_data["Kategorie"].astype("category")
+    chart_data["Wert"] = chart_data["Wert"].astype(float).round(0).astype("float32")
+    return chart_data
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _line_chart_spec(df_hash, selected_cols, _chart_data):
+    """Vega-Lite spec (dict) of the line chart, built once per projection + column selection.
+
+    Cached as data, not as the Altair object: every caller gets its own copy,
+    so no chart object is shared between sessions.
+    """
+    # Create a selection that binds to the legend
+    selection = alt.selection_point(fields=['Kategorie'], bind='legend')
+
+    return (
+        alt.Chart(_chart_data)
+        .mark_line(point=True)
+        .encode(
+            x=alt.X("Jahr:O", title="Jahr"),
+            y=alt.Y("Wert:Q", title="Betrag (€)", scale=alt.Scale(zero=False)),
+            color=alt.Color("Kategorie:N"),
+            opacity=alt.condition(selection, alt.value(1), alt.value(0.2)),
+            tooltip=[
+                alt.Tooltip("Jahr", title="Jahr"),
+                alt.Tooltip("Kategorie", title="Kategorie"),
+                alt.Tooltip("Wert", title="Wert", format=",.0f"),
+            ],
+        )
+        .add_params(selection)
+        .properties(height=600)
+        .interactive()
+        .to_dict()
+    )
+
+
 def render_graph_tab(df_display, default_cols, key_suffix=""):
-    """Render an Altair line chart with multiselect column picker."""
+    """Render an Altair line chart with multiselect column picker.
+
+    The long-format data and the chart spec are cached per projection hash
+    and column selection, so reruns that do not change either are cheap.
+    """
     st.subheader("Visuelle Auswertung")
     
     # Filter out columns that are not useful for plotting
@@ -50,48 +219,37 @@ def render_graph_tab(df_display, default_cols, key_suffix=""):
     )
 
     if selected_cols:
-        chart_data = df_display.melt(
-            "Jahr", value_vars=selected_cols, var_name="Kategorie", value_name="Wert"
-        )
-        
-        # Create a selection that binds to the legend
-        selection = alt.selection_point(fields=['Kategorie'], bind='legend')
-
-        chart = (
-            alt.Chart(chart_data)
-            .mark_line(point=True)
-            .encode(
-                x=alt.X("Jahr:O", title="Jahr"),
-                y=alt.Y("Wert:Q", title="Betrag (€)", scale=alt.Scale(zero=False)),
-                color=alt.Color("Kategorie:N"),
-                opacity=alt.condition(selection, alt.value(1), alt.value(0.2)),
-                tooltip=[
-                    alt.Tooltip("Jahr", title="Jahr"),
-                    alt.Tooltip("Kategorie", title="Kategorie"),
-                    alt.Tooltip("Wert", title="Wert", format=",.2f"),
-                ],
-            )
-            .add_params(selection)
-            .properties(height=600)
-            .interactive()
-        )
-        st.altair_chart(chart, use_container_width=True)
+        df_hash = projection_hash(df_display)
+        cols_key = tuple(selected_cols)
+        chart_data = _chart_long_format(df_display, df_hash, cols_key)
+        spec = _line_chart_spec(df_hash, cols_key, chart_data)
+        st.vega_lite_chart(spec, use_container_width=True)
     else:
         st.info("Bitte wähle mindestens einen Wert aus.")
 
 
 def render_formeln_tab(formeln, key_suffix=""):
-    """Render the formula reference tab with search."""
+    """Render the formula reference tab with search over the register's index."""
     st.subheader("📚 Formel-Verzeichnis")
-    st.caption("Hier finden Sie alle verwendeten Berechnungen transparent erklärt.")
+    st.caption("Hier finden Sie alle verwendeten Berechnungen transparent erklärt. Mit ✓ markierte Formeln "
+               "rechnet die App genau so; die übrigen erläutern Kennzahlen der Eingaben und Übersicht.")
     search_term = st.text_input(
         "🔍 Formel suchen...",
         "",
         key=f"formel_search_{key_suffix}" if key_suffix else None,
-    ).lower()
+        help="Findet Wörter und Wortanfänge (z.B. 'abschr'); Groß-/Kleinschreibung und Umlaute egal. "
+             "Mehrere Wörter müssen alle vorkommen; 'abschreibung' findet auch die AfA-Formeln.",
+    )
 
-    for item in formeln:
-        if search_term in item["Name"].lower() or search_term in item["Beschreibung"].lower():
-            with st.expander(f"{item['Name']} ({item['Kategorie']})"):
-                st.markdown(f"**Beschreibung:** {item['Beschreibung']}")
-                st.latex(item["Formel"])
+    treffer = suche(formeln, search_term)
+    if search_term and not treffer:
+        st.info("Keine passende Formel gefunden.")
+    for i in treffer:
+        item = formeln["eintraege"][i]
+        with st.expander(formeln["labels"][i]):
+            st.markdown(f"**Beschreibung:** {item['Beschreibung']}")
+            st.latex(item["Formel"])
+            if "Funktion" in item:
+                st.caption("✓ Genau diese Formel wertet die Projektion aus.")
+            else:
+                st.caption("Nur zur Erläuterung: nicht Teil der ausführbaren Formeln.")
@@ -0,0 +1,171 @@
+"""Side-by-side comparison of several financing variants of one scenario.
+
+All variants are projected in one batched engine call (see engine.py). The
+tab shows the key figures as aligned columns, overlaid charts and the
+difference of every variant against a chosen baseline.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import altair as alt
+
+from calculations import export
+
+MAX_VARIANTEN = 8
+
+# Editor column -> input key of the scenario params dict
+_VARIANTEN_SPALTEN = {
+    "Zinssatz (%)": "zinssatz",
+    "Tilgung (%)": "tilgung",
+    "Zinsbindung (J)": "zinsbindung",
+    "Wertsteigerung (%)": "wertsteigerung_pa",
+    "Mietsteigerung (%)": "mietsteigerung_pa",
+}
+
+_CHART_SPALTEN = [
+    "Restschuld",
+    "Vermögen",
+    "Monatlicher Eigenaufwand",
+    "Cashflow",
+    "Steuerersparnis",
+    "Netto-Erlös bei Verkauf (Exit)",
+]
+# Engine columns the key figures read
+_KENNZAHL_SPALTEN = ["Restschuld", "Monatlicher Eigenaufwand", "Zinsanteil", "Steuerersparnis", "Vermögen"]
+
+
+def _default_varianten(p: dict) -> pd.DataFrame:
+    basis = {spalte: p[key] for spalte, key in _VARIANTEN_SPALTEN.items()}
+    return pd.DataFrame([
+        {"Name": "Basis", **basis},
+        {"Name": "Tilgung +1%", **basis, "Tilgung (%)": basis["Tilgung (%)"] + 1.0},
+        {"Name": "Zinsbindung 10 J.", **basis, "Zinsbindung (J)": 10},
+        {"Name": "Zinsbindung 20 J.", **basis, "Zinsbindung (J)": 20},
+    ])
+
+
+def kennzahlen(res: dict, namen: list, zinsbindung) -> pd.DataFrame:
+    """Key figures per variant (columns) from a projektion_batch result.
+
+    The Vermögen of all variants is read in one common year, the last
+    Volltilgung among them; variants repaid earlier keep their value from
+    the Volltilgung on.
+    """
+    n_jahre = res["Restschuld"].shape[1]
+    zb_idx = np.asarray(zinsbindung, dtype=int) - 1
+    restschuld_zb = np.take_along_axis(res["Restschuld"], np.clip(zb_idx, 0, n_jahre - 1)[:, None], axis=1)[:, 0]
+    restschuld_zb = np.where(zb_idx < n_jahre, np.nan_to_num(restschuld_zb), 0.0)
+    jahr = int(res["laufzeit"].max())
+    bis = (np.minimum(res["laufzeit"], jahr) - 1)[:, None]  # the projection ends with the Volltilgung
+    return pd.DataFrame(
+        {
+            "Monatliche Rate (Bank)": res["jaehrliche_rate"] / 12,
+            "Ø Monatlicher Eigenaufwand": np.nanmean(res["Monatlicher Eigenaufwand"], axis=1),
+            "Zinskosten gesamt": np.nansum(res["Zinsanteil"], axis=1),
+            "Steuerersparnis gesamt": np.nansum(res["Steuerersparnis"], axis=1),
+            "Restschuld nach Zinsbindung": restschuld_zb,
+            "Volltilgung nach (Jahren)": res["laufzeit"].astype(float),
+            f"Vermögen in Jahr {jahr}": np.take_along_axis(res["Vermögen"], bis, axis=1)[:, 0],
+        },
+        index=namen,
+    ).T
+
+
+def _long_format(res: dict, namen: list, spalte: str, basis_idx: int | None = None) -> pd.DataFrame:
+    werte = res[spalte]
+    if basis_idx is not None:
+        werte = werte - werte[basis_idx][None, :]
+    jahre = np.arange(1, werte.shape[1] + 1)
+    df = pd.DataFrame(werte.T, columns=namen)
+    df.insert(0, "Jahr", jahre)
+    return df.melt("Jahr", var_name="Variante", value_name="Wert").dropna()
+
+
+def render_varianten_tab(p: dict, berechne_batch, key_suffix: str = "", wertspalte: str = "Hauswert"):
+    """Render the variant editor, aligned key figures, diff view and overlaid charts."""
+    st.subheader("Variantenvergleich")
+    st.caption(
+        f"Bis zu {MAX_VARIANTEN} Varianten der Finanzierung werden gemeinsam berechnet. "
+        "Alle übrigen Parameter stammen aus der Seitenleiste (Werte nominal)."
+    )
+
+    editor = st.data_editor(
+        _default_varianten(p),
+        num_rows="dynamic",
+        use_container_width=True,
+        hide_index=True,
+        key=f"varianten_editor_{key_suffix}",
+        column_config={
+            "Name": st.column_config.TextColumn("Name", required=True),
+            "Zinssatz (%)": st.column_config.NumberColumn(min_value=0.1, max_value=15.0, step=0.1, format="%.2f"),
+            "Tilgung (%)": st.column_config.NumberColumn(min_value=0.5, max_value=15.0, step=0.1, format="%.2f"),
+            "Zinsbindung (J)": st.column_config.NumberColumn(min_value=1, max_value=40, step=1, format="%d"),
+            "Wertsteigerung (%)": st.column_config.NumberColumn(min_value=-5.0, max_value=15.0, step=0.1,
+                                                                format="%.2f"),
+            "Mietsteigerung (%)": st.column_config.NumberColumn(min_value=-5.0, max_value=15.0, step=0.1,
+                                                                format="%.2f"),
+        },
+    )
+    editor = editor.dropna(subset=list(_VARIANTEN_SPALTEN)).reset_index(drop=True)
+    if len(editor) > MAX_VARIANTEN:
+        st.warning(f"Es werden nur die ersten {MAX_VARIANTEN} Varianten berechnet.")
+        editor = editor.head(MAX_VARIANTEN)
+    if editor.empty:
+        st.info("Bitte mindestens eine Variante anlegen.")
+        return
+
+    namen = [
+        str(name) if isinstance(name, str) and name.strip() else f"Variante {i + 1}"
+        for i, name in enumerate(editor["Name"])
+    ]
+    namen = [f"{n} ({i + 1})" if namen.count(n) > 1 else n for i, n in enumerate(namen)]
+    varianten = {key: editor[spalte].to_numpy(dtype=float) for spalte, key in _VARIANTEN_SPALTEN.items()}
+    res = berechne_batch(p, varianten, spalten=_KENNZAHL_SPALTEN)
+
+    basis = st.selectbox("Basis für den Vergleich", namen, key=f"varianten_basis_{key_suffix}")
+    basis_idx = namen.index(basis)
+
+    kz = kennzahlen(res, namen, varianten["zinsbindung"])
+    col_abs, col_diff = st.columns(2)
+    with col_abs:
+        st.markdown("##### Kennzahlen")
+        st.dataframe(kz.style.format("{:,.0f}"), use_container_width=True)
+        st.caption("Vermögen aller Varianten im selben Jahr (letzte Volltilgung); früher getilgte Varianten "
+                   "mit dem Wert bei ihrer Volltilgung.")
+    with col_diff:
+        st.markdown(f"##### Differenz zu „{basis}“")
+        st.dataframe(kz.sub(kz[basis], axis=0).style.format("{:+,.0f}"), use_container_width=True)
+    export.render_export(lambda: export.batch_bloecke(berechne_batch(p, varianten), namen),
+                         f"varianten_{key_suffix or 'vergleich'}",
+                         key_suffix=f"varianten_{key_suffix}", label="Alle Verläufe exportieren",
+                         stand=(p, varianten, namen))
+
+    spalten = [*_CHART_SPALTEN, wertspalte]
+    col_s, col_m = st.columns([2, 1])
+    with col_s:
+        spalte = st.selectbox("Verlauf anzeigen", spalten, key=f"varianten_spalte_{key_suffix}")
+    with col_m:
+        als_differenz = st.toggle("Als Differenz zur Basis", key=f"varianten_diff_{key_suffix}")
+
+    if spalte not in res:
+        res.update(berechne_batch(p, varianten, spalten=[spalte]))
+    chart_data = _long_format(res, namen, spalte, basis_idx if als_differenz else None)
+    chart = (
+        alt.Chart(chart_data)
+        .mark_line(point=True)
+        .encode(
+            x=alt.X("Jahr:O", title="Jahr"),
+            y=alt.Y("Wert:Q", title=f"{spalte} (€)" + (" − Basis" if als_differenz else ""),
+                    scale=alt.Scale(zero=False)),
+            color=alt.Color("Variante:N", sort=namen),
+            tooltip=[
+                alt.Tooltip("Jahr", title="Jahr"),
+                alt.Tooltip("Variante", title="Variante"),
+                alt.Tooltip("Wert", title="Wert", format=",.0f"),
+            ],
+        )
+        .properties(height=450)
+        .interactive()
+    )
+    st.altair_chart(chart, use_container_width=True)
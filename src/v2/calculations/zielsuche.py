@@ -0,0 +1,107 @@
+"""Goal seek: solve one input (Tilgung, Kaufpreis, Eigenkapital) for a target figure.
+
+Batched bisection on the projection engine: every round evaluates a grid of
+candidates in one projektion_batch call and keeps the first sub-interval in
+which the target figure crosses the goal, so the bracket shrinks by the grid
+size per round. A solve is a few engine calls and fast enough to run live in
+the sidebar.
+"""
+
+import time
+
+import numpy as np
+import streamlit as st
+
+N_PUNKTE = 17
+MAX_RUNDEN = 8
+
+ZIELE = {
+    "Ø Monatlicher Eigenaufwand (€)": lambda res: np.nanmean(res["Monatlicher Eigenaufwand"], axis=1),
+    "Monatlicher Eigenaufwand im 1. Jahr (€)": lambda res: res["Monatlicher Eigenaufwand"][:, 0],
+    "Volltilgung nach (Jahren)": lambda res: res["laufzeit"].astype(float),
+}
+# Engine columns the target figures read
+_SPALTEN = ["Monatlicher Eigenaufwand"]
+
+
+def loese(berechne_batch, p: dict, varianten_fuer, ziel: str, zielwert: float, untergrenze: float,
+          obergrenze: float, *, toleranz: float, n_punkte: int = N_PUNKTE, max_runden: int = MAX_RUNDEN) -> dict:
+    """Input value in [untergrenze, obergrenze] at which *ziel* reaches *zielwert*.
+
+    *varianten_fuer* maps an array of candidate values to the *varianten*
+    dict of *berechne_batch*. Returns the value ('wert') on the side of the
+    crossing where the goal is met (figure <= *zielwert*, e.g. within the
+    budget), the target figure there ('erreicht'),
+    'gefunden' (False if the goal is not crossed in the range; 'wert' is then
+    the closest bound), the number of engine runs and the time in ms.
+    """
+    kennzahl = ZIELE[ziel]
+    t0 = time.perf_counter()
+    unten, oben = float(untergrenze), float(obergrenze)
+    for runde in range(1, max_runden + 1):
+        x = np.linspace(unten, oben, n_punkte)
+        abstand = kennzahl(berechne_batch(p, varianten_fuer(x), spalten=_SPALTEN)) - zielwert
+        ueber = abstand > 0
+        wechsel = np.flatnonzero(ueber != ueber[0])
+        if wechsel.size == 0:  # only possible in the first round: goal not crossed in the range
+            i = int(np.argmin(np.abs(abstand)))
+            return {"wert": float(x[i]), "erreicht": float(abstand[i] + zielwert), "gefunden": False,
+                    "runden": runde, "dauer_ms": (time.perf_counter() - t0) * 1000}
+        i = int(wechsel[0])
+        unten, oben = x[i - 1], x[i]
+        if oben - unten <= toleranz:
+            break
+    if not ueber[0]:  # the figure rises with the input: the met side is the point before the crossing
+        i -= 1
+    return {"wert": float(x[i]), "erreicht": float(abstand[i] + zielwert), "gefunden": True, "runden": runde,
+            "dauer_ms": (time.perf_counter() - t0) * 1000}
+
+
+def _uebernehmen(key: str, wert):
+    # the persistent widget re-reads its value from 'data' once its own state is dropped
+    st.session_state["data"][key] = wert
+    st.session_state.pop(key, None)
+
+
+def render_zielsuche(p: dict, berechne_batch, stellgroessen: dict, key_suffix: str = ""):
+    """Sidebar expander that solves one of *stellgroessen* for a target figure.
+
+    *stellgroessen* maps a label to a dict with 'aktuell', 'bereich' (lower,
+    upper), 'toleranz', 'varianten' (candidate array -> varianten dict),
+    'key' (persistent widget to update) and optionally 'versatz' (added to
+    the solution before it is written to the widget) and 'nachkomma'.
+    """
+    with st.sidebar.expander("Zielsuche", expanded=False):
+        st.caption("Welcher Wert erreicht die Vorgabe? Alle übrigen Eingaben bleiben unverändert.")
+        ziel = st.selectbox("Ziel", list(ZIELE), key=f"zs_ziel_{key_suffix}")
+        ist_laufzeit = ziel == "Volltilgung nach (Jahren)"
+        zielwert = st.number_input("Vorgabe", value=20.0 if ist_laufzeit else 800.0,
+                                   step=1.0 if ist_laufzeit else 50.0, key=f"zs_wert_{key_suffix}_{ist_laufzeit}")
+        label = st.selectbox("Stellgröße", list(stellgroessen), key=f"zs_stell_{key_suffix}")
+        s = stellgroessen[label]
+
+        unten, oben = s["bereich"]
+        if unten >= oben:
+            st.info("Für diese Stellgröße gibt es keinen gültigen Bereich.")
+            return
+        res = loese(berechne_batch, p, s["varianten"], ziel, zielwert, unten, oben, toleranz=s["toleranz"])
+        nachkomma = s.get("nachkomma", 0)
+        wert = round(res["wert"], nachkomma)
+
+        if not res["gefunden"]:
+            st.warning(f"Vorgabe im Bereich {unten:,.{nachkomma}f} – {oben:,.{nachkomma}f} nicht erreichbar. "
+                       f"Am nächsten: {label} = {wert:,.{nachkomma}f} ({res['erreicht']:,.1f}).")
+            return
+        st.metric(label, f"{wert:,.{nachkomma}f}", delta=f"{wert - s['aktuell']:+,.{nachkomma}f} zur Eingabe",
+                  delta_color="off")
+        st.caption(f"Ergibt {res['erreicht']:,.1f} ({ziel}); {res['runden']} Runden, {res['dauer_ms']:.0f} ms.")
+        if not ist_laufzeit and abs(res["erreicht"] - zielwert) > max(0.01 * abs(zielwert), 5.0):
+            st.caption("Die Zielgröße springt an dieser Stelle (die Laufzeit ändert sich um ein Jahr); "
+                       "genauer ist die Vorgabe nicht erreichbar.")
+
+        neu = round(wert + s.get("versatz", 0.0), nachkomma)
+        if neu < 0:
+            st.caption("Nicht übernehmbar: das Eigenkapital von Person A würde negativ.")
+        else:
+            st.button("Wert übernehmen", key=f"zs_apply_{key_suffix}", on_click=_uebernehmen,
+                      args=(s["key"], float(neu)), use_container_width=True)
@@ -0,0 +1,162 @@
+"""Stochastic Anschlussfinanzierung: mean-reverting rate paths after the Zinsbindung.
+
+The deterministic projection keeps the original Zinssatz until Volltilgung.
+Here the Bauzins follows a Vasicek / Ornstein-Uhlenbeck process with annual
+steps; at every refinancing date the remaining debt is repriced with the
+simulated rate as an annuity over the remaining term, so the original
+Volltilgung date is kept. All paths are computed together as (P,) vectors.
+"""
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import altair as alt
+
+N_PFADE = 2_000
+ZINS_UNTERGRENZE = 0.1  # % p.a., floor for the simulated Bauzins
+_QUANTILE = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+
+def simuliere_zinspfade(zins_start, *, mittelwert, reversion, volatilitaet, jahre, n_pfade=N_PFADE,
+                        seed=None, untergrenze=ZINS_UNTERGRENZE) -> np.ndarray:
+    """Annual Bauzins paths in % p.a. as a (n_pfade, jahre) array.
+
+    Exact discretization of dr = reversion * (mittelwert - r) dt + volatilitaet dW.
+    The recursion runs on the unfloored rate, only the returned paths are
+    floored at *untergrenze*.
+    """
+    rng = np.random.default_rng(seed)
+    phi = np.exp(-reversion)
+    std = volatilitaet * np.sqrt((1 - phi ** 2) / (2 * reversion)) if reversion > 0 else volatilitaet
+    schocks = rng.standard_normal((n_pfade, jahre)) * std
+
+    pfade = np.empty((n_pfade, jahre))
+    r = np.full(n_pfade, float(zins_start))
+    for t in range(jahre):
+        r = mittelwert + (r - mittelwert) * phi + schocks[:, t]
+        pfade[:, t] = r
+    return np.maximum(pfade, untergrenze)
+
+
+def annuitaetenfaktor(zins_pa, n_jahre):
+    """Annual annuity factor for rate *zins_pa* (decimal) over *n_jahre*; 1/n at zero rate."""
+    zins_pa = np.asarray(zins_pa, dtype=float)
+    n_jahre = np.asarray(n_jahre, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        faktor = zins_pa / (1 - (1 + zins_pa) ** -n_jahre)
+    return np.where(np.abs(zins_pa) > 1e-9, faktor, 1 / n_jahre)
+
+
+def anschlussfinanzierung(restschuld, restlaufzeit: int, zinspfade: np.ndarray, anschluss_bindung: int) -> dict:
+    """Amortize *restschuld* over *restlaufzeit* years on every rate path.
+
+    *zinspfade* is (P, >= restlaufzeit) in % p.a., column 0 being the first
+    year after the Zinsbindung. The annuity is repriced every
+    *anschluss_bindung* years. Returns (P, restlaufzeit) arrays 'zins',
+    'tilgung', 'rate', 'restschuld' and the repriced 'zinssatz'.
+    """
+    n_pfade = zinspfade.shape[0]
+    schuld = np.full(n_pfade, float(restschuld))
+    anschluss_bindung = max(1, int(anschluss_bindung))
+
+    zins = np.zeros((n_pfade, restlaufzeit))
+    tilg = np.zeros((n_pfade, restlaufzeit))
+    rest = np.zeros((n_pfade, restlaufzeit))
+    satz = np.zeros((n_pfade, restlaufzeit))
+    for t in range(restlaufzeit):
+        if t % anschluss_bindung == 0:
+            r = zinspfade[:, t] / 100
+            annuitaet = schuld * annuitaetenfaktor(r, restlaufzeit - t)
+        z = schuld * r
+        tl = np.minimum(annuitaet - z, schuld)
+        schuld = schuld - tl
+        zins[:, t], tilg[:, t], rest[:, t], satz[:, t] = z, tl, schuld, r * 100
+
+    return {"zins": zins, "tilgung": tilg, "rate": zins + tilg, "restschuld": rest, "zinssatz": satz}
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def simuliere_anschluss(restschuld: float, zinsbindung: int, restlaufzeit: int, zinssatz: float, mittelwert: float,
+                        reversion: float, volatilitaet: float, anschluss_bindung: int, n_pfade: int = N_PFADE,
+                        seed: int = 42) -> dict:
+    """Rate paths from today plus the repriced schedule after the Zinsbindung."""
+    pfade = simuliere_zinspfade(
+        zinssatz, mittelwert=mittelwert, reversion=reversion, volatilitaet=volatilitaet,
+        jahre=zinsbindung + restlaufzeit, n_pfade=n_pfade, seed=seed,
+    )
+    return anschlussfinanzierung(restschuld, restlaufzeit, pfade[:, zinsbindung:], anschluss_bindung)
+
+
+def _quantil_band(werte: np.ndarray, start_jahr: int) -> pd.DataFrame:
+    q = np.quantile(werte, _QUANTILE, axis=0)
+    return pd.DataFrame({
+        "Jahr": np.arange(start_jahr, start_jahr + werte.shape[1]),
+        "P5": q[0], "P25": q[1], "Median": q[2], "P75": q[3], "P95": q[4],
+    })
+
+
+def render_zinsrisiko(df_projektion: pd.DataFrame, zinssatz: float, zinsbindung: int, key_suffix: str = ""):
+    """Monte-Carlo view of the Anschlussfinanzierung for a nominal projection."""
+    row = df_projektion[df_projektion["Jahr"] == zinsbindung]
+    restschuld = float(row.iloc[0]["Restschuld"]) if not row.empty else 0.0
+    restlaufzeit = len(df_projektion) - zinsbindung
+    if restschuld <= 1.0 or restlaufzeit <= 0:
+        st.success("Kein Anschlussrisiko: Darlehen ist innerhalb der Zinsbindung getilgt.")
+        return
+
+    st.caption(
+        f"Restschuld {restschuld:,.0f} € nach {zinsbindung} Jahren wird mit simulierten Bauzinsen "
+        f"(mean-reverting) über die verbleibenden {restlaufzeit} Jahre neu verrentet. Werte nominal."
+    )
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        mittelwert = st.number_input("Langfristiger Zins (%)", 0.5, 10.0, 3.5, 0.1, key=f"zm_mittel_{key_suffix}")
+    with c2:
+        volatilitaet = st.number_input("Volatilität (%-Pkt. p.a.)", 0.0, 3.0, 0.8, 0.1, key=f"zm_vola_{key_suffix}")
+    with c3:
+        reversion = st.number_input("Rückkehrgeschwindigkeit", 0.01, 1.0, 0.15, 0.01,
+                                    key=f"zm_reversion_{key_suffix}",
+                                    help="Rate k der Rückkehr zum langfristigen Zins: pro Jahr wird der Anteil "
+                                         "1 − e^(−k) der Abweichung abgebaut (0,15 → 14 %, 1,0 → 63 %).")
+    with c4:
+        anschluss_bindung = st.number_input("Neue Zinsbindung (J)", 1, 30, 10, 1, key=f"zm_bindung_{key_suffix}")
+
+    sim = simuliere_anschluss(restschuld, int(zinsbindung), int(restlaufzeit), float(zinssatz), float(mittelwert),
+                              float(reversion), float(volatilitaet), int(anschluss_bindung))
+
+    monatsrate = sim["rate"] / 12
+    zinsen_gesamt = sim["zins"].sum(axis=1)
+    zinsen_det = df_projektion.loc[df_projektion["Jahr"] > zinsbindung, "Zinsanteil"].sum()
+    rate_det = df_projektion.iloc[0]["Zinsanteil"] / 12 + df_projektion.iloc[0]["Tilgungsanteil"] / 12
+
+    m1, m2, m3 = st.columns(3)
+    p5, p50, p95 = np.quantile(monatsrate[:, 0], [0.05, 0.5, 0.95])
+    m1.metric("Anschlussrate (Median)", f"{p50:,.0f} €/M", delta=f"{p50 - rate_det:+,.0f} € ggü. heute",
+              delta_color="inverse", help=f"5%–95%: {p5:,.0f} € – {p95:,.0f} € pro Monat")
+    z5, z50, z95 = np.quantile(zinsen_gesamt, [0.05, 0.5, 0.95])
+    m2.metric("Zinsen nach Zinsbindung (Median)", f"{z50:,.0f} €", delta=f"{z50 - zinsen_det:+,.0f} € ggü. Festzins",
+              delta_color="inverse", help=f"5%–95%: {z5:,.0f} € – {z95:,.0f} €")
+    m3.metric("P(Rate > heute + 20 %)", f"{(monatsrate[:, 0] > rate_det * 1.2).mean():.0%}")
+
+    band = _quantil_band(monatsrate, zinsbindung + 1)
+    basis = alt.Chart(band).encode(x=alt.X("Jahr:O", title="Jahr"))
+    chart = (
+        basis.mark_area(opacity=0.2).encode(y=alt.Y("P5:Q", title="Monatliche Rate (€)"), y2="P95:Q")
+        + basis.mark_area(opacity=0.35).encode(y="P25:Q", y2="P75:Q")
+        + basis.mark_line(point=True).encode(
+            y="Median:Q",
+            tooltip=[alt.Tooltip("Jahr"), *[alt.Tooltip(f"{c}:Q", format=",.0f") for c in ["P5", "Median", "P95"]]],
+        )
+    ).properties(height=300, title="Monatliche Rate nach Zinsbindung (Median, 50 %- und 90 %-Band)")
+    st.altair_chart(chart, use_container_width=True)
+
+    hist = (
+        alt.Chart(pd.DataFrame({"Zinsen": zinsen_gesamt}))
+        .mark_bar()
+        .encode(
+            x=alt.X("Zinsen:Q", bin=alt.Bin(maxbins=40), title="Zinsen nach Zinsbindung (€)"),
+            y=alt.Y("count():Q", title="Pfade"),
+        )
+        .properties(height=220)
+    )
+    st.altair_chart(hist, use_container_width=True)
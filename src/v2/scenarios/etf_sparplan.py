@@ -7,11 +7,20 @@ default field values from wizard inputs.
 import streamlit as st
 import pandas as pd
 
+from calculations import backtest, etf_steuer
 from calculations.formulas import get_formeln
-from calculations.ui_helpers import render_toggles, apply_inflation, render_graph_tab, render_formeln_tab
+from calculations.scenario_store import cached_projektion, input_hash
+from calculations.ui_helpers import (
+    render_toggles,
+    apply_inflation,
+    render_table_tab,
+    render_graph_tab,
+    render_formeln_tab,
+)
 from calculations.state_management import (
     persistent_number_input,
     persistent_slider,
+    persistent_radio,
 )
 
 
@@ -25,6 +34,17 @@ def _d(wizard_defaults, key, fallback):
     return val
 
 
+def berechne_projektion(p: dict) -> pd.DataFrame:
+    """Year-by-year Sparplan projection for the given input dict."""
+    res = etf_steuer.sparplan(
+        p["startkapital_gesamt"], p["etf_rendite"], p["etf_sparrate"], p["laufzeit_etf"],
+        basiszins=p["basiszins"], teilfreistellung=p["teilfreistellung"], personen=p["personen"],
+    )
+    df = pd.DataFrame({c: v[0] for c, v in res.items()})
+    df.insert(0, "Jahr", range(1, p["laufzeit_etf"] + 1))
+    return df
+
+
 def render(inflationsrate: float, wizard_defaults: dict = None):
     """Renders the ETF-Sparplan scenario with optional wizard pre-fills."""
 
@@ -70,9 +90,17 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
             "Sparrate (€)", value=1_000.0, key="etf_sparrate",
             help="Wie viel Geld steckst du jeden Monat zusätzlich in den ETF? (Vergleichbar mit dem Eigenaufwand beim Hauskauf)",
         )
-        etf_steuer = persistent_slider(
-            "Steuersatz (%)", 0.0, 30.0, 18.5, 0.5, key="etf_steuersatz",
-            help="Kapitalertragsteuer (25%) + Soli. Bei Aktienfonds oft Teilfreistellung (30% steuerfrei), daher effektiv ca. 18.5%.",
+        basiszins = persistent_number_input(
+            "Basiszins (%)", value=etf_steuer.BASISZINS, step=0.05, key="etf_basiszins",
+            help="Vom BMF jährlich veröffentlichter Zins für die Vorabpauschale (2025: 2,53 %).",
+        )
+        teilfreistellung = persistent_slider(
+            "Teilfreistellung (%)", 0.0, 30.0, etf_steuer.TEILFREISTELLUNG_AKTIENFONDS, 15.0, key="etf_teilfreistellung",
+            help="Steuerfreier Anteil der Erträge: Aktienfonds 30 %, Mischfonds 15 %, sonstige 0 %.",
+        )
+        personen = persistent_radio(
+            "Sparerpauschbetrag", ["1 Person (1.000 €)", "Zusammenveranlagung (2.000 €)"], index=1,
+            key="etf_personen", help="Freibetrag für Kapitalerträge pro Jahr.",
         )
         laufzeit_etf = persistent_slider(
             "Laufzeit (Jahre)", 5, 60, 30, key="etf_laufzeit",
@@ -82,29 +110,18 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
     # =========================================================================
     # LOGIK
     # =========================================================================
-    etf_daten = []
-    aktuelles_kapital = float(startkapital_gesamt)
-    eingezahltes_kapital = float(startkapital_gesamt)
-
-    for jahr in range(1, laufzeit_etf + 1):
-        for _m in range(12):
-            aktuelles_kapital = aktuelles_kapital * (1 + etf_rendite / 100 / 12) + etf_sparrate
-            eingezahltes_kapital += etf_sparrate
-
-        gewinn = aktuelles_kapital - eingezahltes_kapital
-        steuer = max(0, gewinn * (etf_steuer / 100))
-        netto_vermoegen = aktuelles_kapital - steuer
-
-        etf_daten.append({
-            "Jahr": jahr,
-            "Eingezahltes Kapital": eingezahltes_kapital,
-            "Brutto Vermögen": aktuelles_kapital,
-            "Gewinn (unrealisiert)": gewinn,
-            "Potenzielle Steuer": steuer,
-            "Netto Vermögen (n. St.)": netto_vermoegen,
-        })
-
-    df_etf = pd.DataFrame(etf_daten)
+    params = {
+        "szenario": "etf_sparplan",
+        "startkapital_gesamt": startkapital_gesamt,
+        "etf_rendite": etf_rendite,
+        "etf_sparrate": etf_sparrate,
+        "basiszins": basiszins,
+        "teilfreistellung": teilfreistellung,
+        "personen": 2 if personen.startswith("Zusammen") else 1,
+        "laufzeit_etf": laufzeit_etf,
+    }
+    st.session_state["v2_projektion_hash"] = input_hash(params)
+    df_etf = cached_projektion(params, berechne_projektion)
 
     # =========================================================================
     # ANZEIGE
@@ -131,6 +148,7 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
         total_invest = df_display.iloc[-1]["Eingezahltes Kapital"] if not df_display.empty else 0
         total_gewinn = df_display.iloc[-1]["Gewinn (unrealisiert)"] if not df_display.empty else 0
         end_steuer = df_display.iloc[-1]["Potenzielle Steuer"] if not df_display.empty else 0
+        steuer_vorab = df_display["Steuer (Vorabpauschale)"].sum() if not df_display.empty else 0
 
         st.metric("Netto-Vermögen am Ende", f"{end_netto:,.0f} €", help="Nach Abzug der Kapitalertragsteuer.")
         st.markdown("---")
@@ -140,20 +158,15 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
         with col_m2:
             st.metric("Gesamter Gewinn", f"{total_gewinn:,.0f} €")
         st.metric("Latente Steuerlast", f"{end_steuer:,.0f} €", help="Steuer, die bei Verkauf am Ende fällig wäre.")
+        st.metric("Bereits gezahlte Steuer", f"{steuer_vorab:,.0f} €",
+                  help="Summe der jährlichen Steuer auf die Vorabpauschale (aus dem Depot entnommen).")
 
     with col2:
         formeln = get_formeln("ETF-Sparplan (Alternative)")
-        tab_t, tab_g, tab_a, tab_f = st.tabs(["Tabelle", "Graph", "Analyse & Risiken", "📚 Formeln"])
+        tab_t, tab_g, tab_a, tab_b, tab_f = st.tabs(["Tabelle", "Graph", "Analyse & Risiken", "Backtest", "📚 Formeln"])
         with tab_t:
-            cols_all = df_display.columns.tolist()
             cols_default = ["Jahr", "Eingezahltes Kapital", "Brutto Vermögen", "Netto Vermögen (n. St.)"]
-            cols_selected = st.multiselect("Spalten anzeigen:", cols_all, default=cols_default)
-            df_filtered = df_display[cols_selected]
-            st.dataframe(
-                df_filtered.style.format("{:,.2f} €", subset=[c for c in df_filtered.columns if c != "Jahr"]).hide(
-                    axis="index"),
-                use_container_width=True, height=700, hide_index=True,
-            )
+            render_table_tab(df_display, cols_default, key_suffix="etf_v2", highlight=False)
         with tab_g:
             render_graph_tab(df_display,
                              default_cols=["Eingezahltes Kapital", "Brutto Vermögen", "Netto Vermögen (n. St.)"],
@@ -188,5 +201,8 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
                 st.info(
                     f"ℹ️ Latente Steuerlast bei Auflösung: **{end_steuer:,.0f} €** — Immobiliengewinne nach 10J steuerfrei.")
 
+        with tab_b:
+            backtest.render_backtest_tab(params, df_etf)
+
         with tab_f:
             render_formeln_tab(formeln, key_suffix="etf_v2")
@@ -6,10 +6,25 @@ default field values from wizard inputs.
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 
-from calculations.tax import berechne_einkommensteuer, get_steuerlast_zusammen
+from calculations import darlehen, engine
+from calculations.exit_analyse import render_exit_analyse
 from calculations.formulas import get_formeln
-from calculations.ui_helpers import render_toggles, apply_inflation, render_graph_tab, render_formeln_tab
+from calculations.pareto import render_pareto
+from calculations.varianten import render_varianten_tab
+from calculations.zinsmodell import render_zinsrisiko
+from calculations.sondertilgung import render_sondertilgung
+from calculations.tragfaehigkeit import render_tragfaehigkeit
+from calculations.zielsuche import render_zielsuche
+from calculations.scenario_store import cached_projektion, input_hash
+from calculations.ui_helpers import (
+    render_toggles,
+    apply_inflation,
+    render_table_tab,
+    render_graph_tab,
+    render_formeln_tab,
+)
 from calculations.state_management import (
     persistent_number_input,
     persistent_slider,
@@ -19,6 +34,14 @@ from calculations.state_management import (
 )
 
 
+SPALTEN = [
+    "Jahr", "Einkommen (zvE)", "Grenzsteuersatz (%)", "Restschuld", "Mieteinnahmen", "Instandhaltung",
+    "Mietausfall", "Zinsanteil", "Tilgungsanteil", "Monatliche Gesamtkosten", "Monatlicher Eigenaufwand", "AfA",
+    "Steuerersparnis", "Cashflow", "Hauswert", "Vermögen", "Zuwachs Vermögen", "Vorfälligkeitsentschädigung (Exit)",
+    "Netto-Erlös bei Verkauf (Exit)", "Scheidung: Ausgleichszahlung",
+]
+
+
 def _d(wizard_defaults, key, fallback):
     """Get a wizard default value or fall back to the given default."""
     val = wizard_defaults[key] if wizard_defaults and key in wizard_defaults else fallback
@@ -30,6 +53,49 @@ def _d(wizard_defaults, key, fallback):
     return val
 
 
+def berechne_projektion_batch(p: dict, varianten: dict | None = None, spalten: list | None = None) -> dict:
+    """Engine run for the inputs *p*; *varianten* maps input keys to per-variant lists.
+
+    *spalten* restricts the result to these columns (default: all).
+    """
+    p = {**p, **(varianten or {})}
+    kaufpreis = np.asarray(p["kaufpreis"], dtype=float)
+    return engine.projektion_batch(
+        kreditbetrag=p["kreditbetrag"],
+        zinssatz=p["zinssatz"],
+        tilgung=p["tilgung"],
+        zinsbindung=p["zinsbindung"],
+        anfangswert=kaufpreis,
+        anschaffungskosten=kaufpreis,
+        anteil_grundstueck=p["anteil_grundstueck"],
+        miete_pm=p["mieteinnahmen_pm"],
+        mietsteigerung_pa=p["mietsteigerung_pa"],
+        instandhaltung_pa=p["instandhaltung_pa"],
+        kostensteigerung_pa=p["kostensteigerung_pa"],
+        mietausfall_pa=p["mietausfall_pa"],
+        wertsteigerung_pa=p["wertsteigerung_pa"],
+        einkommen_a=p["std_einkommen_mann"],
+        einkommen_b=p["std_einkommen_frau"],
+        nutze_sonderzeitraum=p["nutze_sonderzeitraum"],
+        sonder_jahre=p["sonder_jahre"],
+        sonder_einkommen_a=p["sonder_einkommen_mann"],
+        sonder_einkommen_b=p["sonder_einkommen_frau"],
+        anteil_a=p["anteil_a_prozent"],
+        anteil_b=p["anteil_b_prozent"],
+        startkapital=p["startkapital_gesamt"],
+        zugewinn_ausgleich=p["alleineigentum"] and not p["vertrag_ausschluss_zugewinn"],
+        marktzins_verkauf=p["marktzins_verkauf"],
+        verkaufskosten_prozent=p["verkaufskosten_prozent"],
+        tranchen=darlehen.weitere_tranchen(p.get("tranchen")),
+        spalten=spalten,
+    )
+
+
+def berechne_projektion(p: dict) -> pd.DataFrame:
+    """Year-by-year projection for the given input dict (see render() for the keys)."""
+    return engine.als_dataframe(berechne_projektion_batch(p), 0, SPALTEN)
+
+
 def render(inflationsrate: float, wizard_defaults: dict = None):
     """Renders the complete Immobilienkauf scenario with optional wizard pre-fills."""
 
@@ -146,6 +212,7 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
                                     help="Der Teil deiner Rate, der den Schuldenberg tatsächlich verkleinert. Empfohlen sind mind. 2%.")
         zinsbindung = persistent_slider("Zinsbindung (Jahre)", 5, 30, 15, key="immo_zinsbindung",
                                         help="So lange garantiert dir die Bank den Zinssatz. Danach wird neu verhandelt (Risiko steigender Zinsen!).")
+        tranchen_tabelle = darlehen.render_tranchen_editor(key="immo_tranchen")
 
     # --- 4. Laufende Kosten & Einnahmen ---
     with st.sidebar.expander("4. Laufende Kosten & Einnahmen", expanded=False):
@@ -226,18 +293,12 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
             f"Das Eigenkapital ({startkapital_gesamt:,.2f} €) deckt Kaufpreis + Nebenkosten ({gesamtinvestition:,.2f} €). Kein Kredit notwendig.")
         st.stop()
 
-    jaehrliche_rate = kreditbetrag * (zinssatz / 100 + tilgung / 100)
+    tranchen = darlehen.weitere_tranchen(tranchen_tabelle)
+    if tranchen is not None and tranchen["betrag"].sum() > kreditbetrag:
+        st.warning(f"Die weiteren Darlehen übersteigen den Kreditbetrag ({kreditbetrag:,.0f} €).")
+    jaehrliche_rate = darlehen.jaehrliche_rate(kreditbetrag, zinssatz, tilgung, tranchen)
     monatliche_rate = jaehrliche_rate / 12
     gebaeudewert = kaufpreis * (1 - anteil_grundstueck / 100)
-    jaehrliche_afa = gebaeudewert * 0.02
-
-    jahres_daten = []
-    restschuld = kreditbetrag
-    aktuelle_jahresmiete = mieteinnahmen_pm * 12
-    aktuelle_instandhaltung = instandhaltung_pa
-    aktueller_hauswert = kaufpreis
-    anfangs_vermoegen_netto = startkapital_gesamt
-    vermoegen_vorjahr = kaufpreis - kreditbetrag
 
     if eigentums_modus == "Gemeinschaftseigentum (nach EK-Anteil)":
         kapital_a = eigenkapital_a + geschenk_a
@@ -255,97 +316,56 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
             anteil_a_prozent = 0.0
             anteil_b_prozent = 1.0
 
-    kumulierte_afa = 0.0
-    jahr = 0
-    max_laufzeit = 80
-
-    while restschuld > 1.0 and jahr < max_laufzeit:
-        jahr += 1
-
-        if nutze_sonderzeitraum and sonder_jahre[0] <= jahr <= sonder_jahre[1]:
-            ek_a = sonder_einkommen_mann
-            ek_b = sonder_einkommen_frau
-        else:
-            ek_a = std_einkommen_mann
-            ek_b = std_einkommen_frau
-
-        zinsanteil_jahr = restschuld * (zinssatz / 100)
-        tilgungsanteil_jahr = jaehrliche_rate - zinsanteil_jahr
-        if tilgungsanteil_jahr > restschuld:
-            tilgungsanteil_jahr = restschuld
-            jaehrliche_rate_effektiv = zinsanteil_jahr + tilgungsanteil_jahr
-        else:
-            jaehrliche_rate_effektiv = jaehrliche_rate
-        restschuld -= tilgungsanteil_jahr
-
-        werbungskosten = zinsanteil_jahr + jaehrliche_afa + aktuelle_instandhaltung
-        ergebnis_vv = aktuelle_jahresmiete - werbungskosten
-        steuer_ohne = get_steuerlast_zusammen(ek_a, ek_b)
-        ek_a_mit = ek_a + (ergebnis_vv * anteil_a_prozent)
-        ek_b_mit = ek_b + (ergebnis_vv * anteil_b_prozent)
-        steuer_mit = get_steuerlast_zusammen(ek_a_mit, ek_b_mit)
-        steuerersparnis = steuer_ohne - steuer_mit
-        grenzsteuersatz = (steuerersparnis / abs(ergebnis_vv)) if ergebnis_vv != 0 else 0.0
-
-        mietausfall_betrag = aktuelle_jahresmiete * (mietausfall_pa / 100)
-        cashflow_vor_steuer = aktuelle_jahresmiete - jaehrliche_rate_effektiv - aktuelle_instandhaltung - mietausfall_betrag
-        cashflow_nach_steuer = cashflow_vor_steuer + steuerersparnis
-        monatliche_gesamtkosten = (jaehrliche_rate_effektiv + aktuelle_instandhaltung + mietausfall_betrag) / 12
-        monatlicher_eigenaufwand = monatliche_gesamtkosten - (aktuelle_jahresmiete / 12)
-
-        aktueller_hauswert *= (1 + wertsteigerung_pa / 100)
-        aktuelles_vermoegen_netto = aktueller_hauswert - restschuld
-
-        zugewinn_gesamt = aktuelles_vermoegen_netto - anfangs_vermoegen_netto
-        ausgleichszahlung_scheidung = 0.0
-        if eigentums_modus == "Alleineigentum (Eine Person)":
-            if not vertrag_ausschluss_zugewinn and zugewinn_gesamt > 0:
-                ausgleichszahlung_scheidung = zugewinn_gesamt / 2
-
-        vorfaelligkeitsentschaedigung = 0.0
-        if jahr < zinsbindung:
-            restlaufzeit = zinsbindung - jahr
-            zinsdifferenz = max(0, zinssatz - marktzins_verkauf)
-            vorfaelligkeitsentschaedigung = restschuld * (zinsdifferenz / 100) * restlaufzeit
-
-        verkaufskosten = aktueller_hauswert * (verkaufskosten_prozent / 100)
-        spekulationssteuer = 0.0
-        if jahr < 10:
-            buchwert = kaufpreis - kumulierte_afa
-            veraeusserungsgewinn = (aktueller_hauswert - verkaufskosten) - buchwert
-            if veraeusserungsgewinn > 0:
-                spekulationssteuer = veraeusserungsgewinn * grenzsteuersatz
-        netto_erloes_verkauf = aktueller_hauswert - restschuld - vorfaelligkeitsentschaedigung - verkaufskosten - spekulationssteuer
-
-        jahres_daten.append({
-            "Jahr": int(jahr),
-            "Einkommen (zvE)": ek_a + ek_b,
-            "Grenzsteuersatz (%)": round(grenzsteuersatz * 100, 1),
-            "Restschuld": max(0, restschuld),
-            "Mieteinnahmen": aktuelle_jahresmiete,
-            "Instandhaltung": aktuelle_instandhaltung,
-            "Mietausfall": mietausfall_betrag,
-            "Zinsanteil": zinsanteil_jahr,
-            "Tilgungsanteil": tilgungsanteil_jahr,
-            "Monatliche Gesamtkosten": monatliche_gesamtkosten,
-            "Monatlicher Eigenaufwand": monatlicher_eigenaufwand,
-            "AfA": jaehrliche_afa,
-            "Steuerersparnis": steuerersparnis,
-            "Cashflow": cashflow_nach_steuer,
-            "Hauswert": aktueller_hauswert,
-            "Vermögen": aktuelles_vermoegen_netto,
-            "Zuwachs Vermögen": aktuelles_vermoegen_netto - vermoegen_vorjahr,
-            "Vorfälligkeitsentschädigung (Exit)": vorfaelligkeitsentschaedigung,
-            "Netto-Erlös bei Verkauf (Exit)": netto_erloes_verkauf,
-            "Scheidung: Ausgleichszahlung": ausgleichszahlung_scheidung,
-        })
-
-        vermoegen_vorjahr = aktuelles_vermoegen_netto
-        aktuelle_jahresmiete *= (1 + mietsteigerung_pa / 100)
-        aktuelle_instandhaltung *= (1 + kostensteigerung_pa / 100)
-        kumulierte_afa += jaehrliche_afa
-
-    df_projektion = pd.DataFrame(jahres_daten)
+    params = {
+        "szenario": "immobilienkauf",
+        "kaufpreis": kaufpreis,
+        "kreditbetrag": kreditbetrag,
+        "startkapital_gesamt": startkapital_gesamt,
+        "anteil_grundstueck": anteil_grundstueck,
+        "zinssatz": zinssatz,
+        "tilgung": tilgung,
+        "zinsbindung": zinsbindung,
+        "mieteinnahmen_pm": mieteinnahmen_pm,
+        "mietsteigerung_pa": mietsteigerung_pa,
+        "instandhaltung_pa": instandhaltung_pa,
+        "mietausfall_pa": mietausfall_pa,
+        "kostensteigerung_pa": kostensteigerung_pa,
+        "wertsteigerung_pa": wertsteigerung_pa,
+        "std_einkommen_mann": std_einkommen_mann,
+        "std_einkommen_frau": std_einkommen_frau,
+        "nutze_sonderzeitraum": nutze_sonderzeitraum,
+        "sonder_jahre": tuple(sonder_jahre),
+        "sonder_einkommen_mann": sonder_einkommen_mann,
+        "sonder_einkommen_frau": sonder_einkommen_frau,
+        "alleineigentum": eigentums_modus == "Alleineigentum (Eine Person)",
+        "vertrag_ausschluss_zugewinn": vertrag_ausschluss_zugewinn,
+        "anteil_a_prozent": anteil_a_prozent,
+        "anteil_b_prozent": anteil_b_prozent,
+        "marktzins_verkauf": marktzins_verkauf,
+        "verkaufskosten_prozent": verkaufskosten_prozent,
+        "tranchen": tranchen_tabelle,
+    }
+    st.session_state["v2_projektion_hash"] = input_hash(params)
+    df_projektion = cached_projektion(params, berechne_projektion)
+    jahr = len(df_projektion)
+
+    nebenkosten_faktor = 1 + (notar_grundbuch_prozent + grunderwerbsteuer_prozent) / 100
+    render_zielsuche(params, berechne_projektion_batch, {
+        "Tilgung (%)": {
+            "aktuell": tilgung, "bereich": (1.0, 10.0), "toleranz": 0.005, "nachkomma": 2,
+            "varianten": lambda x: {"tilgung": x}, "key": "immo_tilgung",
+        },
+        "Kaufpreis (€)": {
+            "aktuell": kaufpreis, "toleranz": 100.0, "key": "immo_kaufpreis",
+            "bereich": (max(50_000.0, startkapital_gesamt / nebenkosten_faktor + 1_000), 5_000_000.0),
+            "varianten": lambda x: {"kaufpreis": x, "kreditbetrag": x * nebenkosten_faktor - startkapital_gesamt},
+        },
+        "Eigenkapital (€)": {
+            "aktuell": startkapital_gesamt, "bereich": (0.0, gesamtinvestition - 1_000), "toleranz": 100.0,
+            "varianten": lambda x: {"startkapital_gesamt": x, "kreditbetrag": gesamtinvestition - x},
+            "key": "shared_ek_a", "versatz": eigenkapital_a - startkapital_gesamt,
+        },
+    }, key_suffix="immo")
 
     # ===========================================================================
     # ANZEIGE
@@ -433,19 +453,15 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
 
     with col2:
         formeln = get_formeln("Immobilienkauf (innerhalb Familie)")
-        tab_t, tab_g, tab_a, tab_f = st.tabs(["Tabelle", "Graph", "Analyse & Risiken", "📚 Formeln"])
+        tab_t, tab_g, tab_a, tab_v, tab_f = st.tabs(
+            ["Tabelle", "Graph", "Analyse & Risiken", "Varianten", "📚 Formeln"]
+        )
 
         with tab_t:
-            cols_all = df_display.columns.tolist()
             cols_default = ["Jahr", "Restschuld", "Mieteinnahmen", "Instandhaltung", "AfA", "Steuerersparnis",
                             "Cashflow", "Vermögen"]
-            cols_selected = st.multiselect("Spalten anzeigen:", cols_all, default=cols_default)
-            df_filtered = df_display[cols_selected]
-            format_dict = {col: "{:,.2f} €" for col in cols_selected if col not in ["Jahr", "Grenzsteuersatz (%)"]}
-            if "Jahr" in cols_selected: format_dict["Jahr"] = "{:.0f}"
-            if "Grenzsteuersatz (%)" in cols_selected: format_dict["Grenzsteuersatz (%)"] = "{:.1f} %"
-            styler = df_filtered.style.format(format_dict).hide(axis="index")
-            st.dataframe(styler, use_container_width=True, height=700, hide_index=True)
+            render_table_tab(df_display, cols_default, key_suffix="immo_v2",
+                             sonder_jahre=sonder_jahre if nutze_sonderzeitraum else None)
 
         with tab_g:
             render_graph_tab(df_display,
@@ -458,7 +474,7 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
                 st.caption(f"⚠️ Hinweis: Alle Beträge sind inflationsbereinigt ({inflationsrate}% p.a.).")
 
             with st.expander("1. Vermögensaufbau & Opportunitätskosten", expanded=True):
-                netto_mietrendite = (aktuelle_jahresmiete - aktuelle_instandhaltung) / gesamtinvestition * 100
+                netto_mietrendite = (mieteinnahmen_pm * 12 - instandhaltung_pa) / gesamtinvestition * 100
                 st.metric("Netto-Mietrendite (Start)", f"{netto_mietrendite:.2f} %",
                           help="(Jahreskaltmiete - Instandhaltung) / Gesamtinvestition. Das ist die 'echte' Verzinsung des Objekts vor Steuern und Finanzierung.")
                 if netto_mietrendite < zinssatz:
@@ -492,5 +508,25 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
                 else:
                     st.success("Kein Zinsrisiko: Darlehen ist innerhalb der Zinsbindung getilgt.")
 
+            with st.expander("4. Anschlussfinanzierung: Zinsszenarien", expanded=restschuld_zinsbindung > 0):
+                render_zinsrisiko(df_projektion, zinssatz, zinsbindung, key_suffix="immo_v2")
+
+            with st.expander("5. Sondertilgung optimieren", expanded=False):
+                render_sondertilgung(params, berechne_projektion_batch, key_suffix="immo_v2")
+
+            with st.expander("6. Exit-Zeitpunkt unter Unsicherheit", expanded=False):
+                render_exit_analyse(params, berechne_projektion_batch, key_suffix="immo_v2", wertspalte="Hauswert")
+
+            with st.expander("7. Finanzierbarkeit (Bankensicht)", expanded=False):
+                render_tragfaehigkeit(params, nebenkosten_prozent=notar_grundbuch_prozent + grunderwerbsteuer_prozent,
+                                      kaufpreis=kaufpreis, key_suffix="immo_v2")
+
+            with st.expander("8. Finanzierungsstruktur: Pareto-Front", expanded=False):
+                render_pareto(params, berechne_projektion_batch, gesamtinvestition=gesamtinvestition,
+                              anfangswert=kaufpreis, key_suffix="immo_v2")
+
+        with tab_v:
+            render_varianten_tab(params, berechne_projektion_batch, key_suffix="immo_v2", wertspalte="Hauswert")
+
         with tab_f:
             render_formeln_tab(formeln, key_suffix="immo_v2")
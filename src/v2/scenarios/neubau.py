@@ -6,10 +6,25 @@ default field values from wizard inputs.
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 
-from calculations.tax import get_steuerlast_zusammen
+from calculations import darlehen, engine, formulas
+from calculations.exit_analyse import render_exit_analyse
 from calculations.formulas import get_formeln
-from calculations.ui_helpers import render_toggles, apply_inflation, render_graph_tab, render_formeln_tab
+from calculations.pareto import render_pareto
+from calculations.varianten import render_varianten_tab
+from calculations.zinsmodell import render_zinsrisiko
+from calculations.sondertilgung import render_sondertilgung
+from calculations.tragfaehigkeit import render_tragfaehigkeit
+from calculations.zielsuche import render_zielsuche
+from calculations.scenario_store import cached_projektion, input_hash
+from calculations.ui_helpers import (
+    render_toggles,
+    apply_inflation,
+    render_table_tab,
+    render_graph_tab,
+    render_formeln_tab,
+)
 from calculations.state_management import (
     persistent_number_input,
     persistent_slider,
@@ -19,6 +34,15 @@ from calculations.state_management import (
 )
 
 
+SPALTEN = [
+    "Jahr", "Einkommen (zvE)", "Grenzsteuersatz (%)", "Restschuld", "Mieteinnahmen", "Instandhaltung",
+    "Mietausfall", "Zinsanteil", "Tilgungsanteil", "Monatliche Gesamtkosten", "Monatlicher Eigenaufwand", "AfA",
+    "Sonder-AfA (§7b)", "AfA Gesamt", "AfA (Methode)", "Buchwert Gebäude", "Kumulierte AfA", "Steuerersparnis",
+    "Cashflow", "Immobilienwert", "Vermögen", "Zuwachs Vermögen", "Vorfälligkeitsentschädigung (Exit)",
+    "Netto-Erlös bei Verkauf (Exit)", "Scheidung: Ausgleichszahlung",
+]
+
+
 def _d(wizard_defaults, key, fallback):
     val = wizard_defaults[key] if wizard_defaults and key in wizard_defaults else fallback
     if isinstance(fallback, float):
@@ -30,7 +54,12 @@ def _d(wizard_defaults, key, fallback):
 
 
 def berechne_neubau_afa(baukosten, methode, switch_year, wohnflaeche_m2=0, max_years=50):
-    """Return a list of dicts with annual AFA info for each year."""
+    """Return a list of dicts with annual AFA info for each year.
+
+    The yearly amounts are the Neubau AfA formulas of the register
+    (afa_linear, afa_degressiv, afa_wechsel, sonder_afa); the total of a year
+    is capped at the remaining Buchwert.
+    """
     gebaeudewert = baukosten
     nutzungsdauer = 100 / 3
     buchwert = gebaeudewert
@@ -43,25 +72,19 @@ def berechne_neubau_afa(baukosten, methode, switch_year, wohnflaeche_m2=0, max_y
 
         sonder_afa = 0.0
         if methode == "Linear (3%)":
-            afa = gebaeudewert * 0.03
-            afa = min(afa, buchwert)
+            afa = float(formulas.funktion("afa_linear")(gebaeudewert))
             label = "Linear 3%"
         elif methode in ("Degressiv (5%)", "Degressiv + §7b Sonder-AfA"):
             if jahr < switch_year:
-                afa = buchwert * 0.05
+                afa = float(formulas.funktion("afa_degressiv")(buchwert))
                 label = "Degressiv 5%"
             else:
-                remaining_years = nutzungsdauer - (jahr - 1)
-                if remaining_years > 0:
-                    afa = buchwert / remaining_years
-                    label = f"Linear (Switch J{switch_year})"
-                else:
-                    afa = buchwert
-                    label = "Linear (Rest)"
-            if methode == "Degressiv + §7b Sonder-AfA" and jahr <= 4:
-                kosten_pro_m2 = baukosten / wohnflaeche_m2 if wohnflaeche_m2 > 0 else float('inf')
-                if kosten_pro_m2 <= 5200:
-                    sonder_afa = gebaeudewert * 0.05
+                restnutzungsdauer = nutzungsdauer - (jahr - 1)
+                afa = float(formulas.funktion("afa_wechsel")(buchwert, restnutzungsdauer))
+                label = f"Linear (Switch J{switch_year})" if restnutzungsdauer > 0 else "Linear (Rest)"
+            if methode == "Degressiv + §7b Sonder-AfA":
+                sonder_afa = float(formulas.funktion("sonder_afa")(gebaeudewert, wohnflaeche_m2, jahr))
+                if sonder_afa > 0:
                     label += " + §7b"
         else:
             afa = 0.0
@@ -79,6 +102,68 @@ def berechne_neubau_afa(baukosten, methode, switch_year, wohnflaeche_m2=0, max_y
     return ergebnisse
 
 
+def _afa_schedule(p: dict) -> list:
+    return berechne_neubau_afa(p["baukosten"], p["afa_methode"], p["switch_year"], p["wohnflaeche_m2"],
+                               max_years=engine.MAX_LAUFZEIT)
+
+
+def berechne_projektion_batch(p: dict, varianten: dict | None = None, spalten: list | None = None) -> dict:
+    """Engine run for the inputs *p*; *varianten* maps input keys to per-variant lists.
+
+    *spalten* restricts the result to these columns (default: all).
+    """
+    p = {**p, **(varianten or {})}
+    if spalten is not None:
+        spalten = ["Hauswert" if s == "Immobilienwert" else s for s in spalten]
+    objektwert = np.asarray(p["grundstueckspreis"], dtype=float) + np.asarray(p["baukosten"], dtype=float)
+    afa = np.array([a["afa"] + a["sonder_afa"] for a in _afa_schedule(p)])
+    res = engine.projektion_batch(
+        kreditbetrag=p["kreditbetrag"],
+        zinssatz=p["zinssatz"],
+        tilgung=p["tilgung"],
+        zinsbindung=p["zinsbindung"],
+        anfangswert=objektwert,
+        anschaffungskosten=objektwert,
+        afa=afa,
+        miete_pm=p["mieteinnahmen_pm"],
+        mietsteigerung_pa=p["mietsteigerung_pa"],
+        instandhaltung_pa=p["instandhaltung_pa"],
+        kostensteigerung_pa=p["kostensteigerung_pa"],
+        mietausfall_pa=p["mietausfall_pa"],
+        wertsteigerung_pa=p["wertsteigerung_pa"],
+        einkommen_a=p["std_einkommen_mann"],
+        einkommen_b=p["std_einkommen_frau"],
+        nutze_sonderzeitraum=p["nutze_sonderzeitraum"],
+        sonder_jahre=p["sonder_jahre"],
+        sonder_einkommen_a=p["sonder_einkommen_mann"],
+        sonder_einkommen_b=p["sonder_einkommen_frau"],
+        anteil_a=p["anteil_a_prozent"],
+        anteil_b=p["anteil_b_prozent"],
+        startkapital=p["startkapital_gesamt"],
+        zugewinn_ausgleich=p["alleineigentum"] and not p["vertrag_ausschluss_zugewinn"],
+        marktzins_verkauf=p["marktzins_verkauf"],
+        verkaufskosten_prozent=p["verkaufskosten_prozent"],
+        tranchen=darlehen.weitere_tranchen(p.get("tranchen")),
+        spalten=spalten,
+    )
+    if "Hauswert" in res:
+        res["Immobilienwert"] = res.pop("Hauswert")
+    return res
+
+
+def berechne_projektion(p: dict) -> pd.DataFrame:
+    """Year-by-year projection for the given input dict (see render() for the keys)."""
+    df = engine.als_dataframe(berechne_projektion_batch(p), 0)
+    afa = pd.DataFrame(_afa_schedule(p)[:len(df)])
+    df["AfA Gesamt"] = df["AfA"]
+    df["AfA"] = afa["afa"]
+    df["Sonder-AfA (§7b)"] = afa["sonder_afa"]
+    df["AfA (Methode)"] = afa["methode_label"]
+    df["Buchwert Gebäude"] = afa["buchwert"]
+    df["Kumulierte AfA"] = df["AfA Gesamt"].cumsum()
+    return df[SPALTEN]
+
+
 def render(inflationsrate: float, wizard_defaults: dict = None):
     """Renders the Neubau scenario with optional wizard pre-fills."""
 
@@ -176,6 +261,7 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
                                     help="Empfohlen sind mind. 2%.")
         zinsbindung = persistent_slider("Zinsbindung (Jahre)", 5, 30, 15, key="nb_zinsbindung",
                                         help="So lange garantiert dir die Bank den Zinssatz.")
+        tranchen_tabelle = darlehen.render_tranchen_editor(key="nb_tranchen")
 
     with st.sidebar.expander("4. AfA-Methode", expanded=False):
         st.caption("Steuerliche Abschreibung des Gebäudes")
@@ -263,17 +349,11 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
             f"Das Eigenkapital ({startkapital_gesamt:,.2f} €) deckt die Gesamtkosten ({gesamtinvestition:,.2f} €). Kein Kredit notwendig.")
         st.stop()
 
-    jaehrliche_rate = kreditbetrag * (zinssatz / 100 + tilgung / 100)
+    tranchen = darlehen.weitere_tranchen(tranchen_tabelle)
+    if tranchen is not None and tranchen["betrag"].sum() > kreditbetrag:
+        st.warning(f"Die weiteren Darlehen übersteigen den Kreditbetrag ({kreditbetrag:,.0f} €).")
+    jaehrliche_rate = darlehen.jaehrliche_rate(kreditbetrag, zinssatz, tilgung, tranchen)
     monatliche_rate = jaehrliche_rate / 12
-    afa_schedule = berechne_neubau_afa(baukosten, afa_methode, switch_year, wohnflaeche_m2, max_years=80)
-
-    jahres_daten = []
-    restschuld = kreditbetrag
-    aktuelle_jahresmiete = mieteinnahmen_pm * 12
-    aktuelle_instandhaltung = instandhaltung_pa
-    aktueller_immobilienwert = grundstueckspreis + baukosten
-    anfangs_vermoegen_netto = startkapital_gesamt
-    vermoegen_vorjahr = (grundstueckspreis + baukosten) - kreditbetrag
 
     if eigentums_modus == "Gemeinschaftseigentum (nach EK-Anteil)":
         kapital_a = eigenkapital_a + geschenk_a
@@ -285,101 +365,53 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
         anteil_a_prozent = 1.0 if "Person A" in eigentuemer else 0.0
         anteil_b_prozent = 1.0 - anteil_a_prozent
 
-    kumulierte_afa_total = 0.0
-    jahr = 0
-    max_laufzeit = 80
-    grenzsteuersatz = 0.0
-
-    while restschuld > 1.0 and jahr < max_laufzeit:
-        jahr += 1
-        ek_a = sonder_einkommen_mann if (
-                    nutze_sonderzeitraum and sonder_jahre[0] <= jahr <= sonder_jahre[1]) else std_einkommen_mann
-        ek_b = sonder_einkommen_frau if (
-                    nutze_sonderzeitraum and sonder_jahre[0] <= jahr <= sonder_jahre[1]) else std_einkommen_frau
-
-        zinsanteil_jahr = restschuld * (zinssatz / 100)
-        tilgungsanteil_jahr = jaehrliche_rate - zinsanteil_jahr
-        if tilgungsanteil_jahr > restschuld:
-            tilgungsanteil_jahr = restschuld
-            jaehrliche_rate_effektiv = zinsanteil_jahr + tilgungsanteil_jahr
-        else:
-            jaehrliche_rate_effektiv = jaehrliche_rate
-        restschuld -= tilgungsanteil_jahr
-
-        afa_info = afa_schedule[jahr - 1] if jahr <= len(afa_schedule) else {'afa': 0.0, 'buchwert': 0.0,
-                                                                             'methode_label': '—', 'sonder_afa': 0.0}
-        afa_jahr = afa_info['afa'] + afa_info['sonder_afa']
-        kumulierte_afa_total += afa_jahr
-
-        werbungskosten = zinsanteil_jahr + afa_jahr + aktuelle_instandhaltung
-        ergebnis_vv = aktuelle_jahresmiete - werbungskosten
-        steuer_ohne = get_steuerlast_zusammen(ek_a, ek_b)
-        steuer_mit = get_steuerlast_zusammen(ek_a + ergebnis_vv * anteil_a_prozent,
-                                             ek_b + ergebnis_vv * anteil_b_prozent)
-        steuerersparnis = steuer_ohne - steuer_mit
-        grenzsteuersatz = (steuerersparnis / abs(ergebnis_vv)) if ergebnis_vv != 0 else 0.0
-
-        mietausfall_betrag = aktuelle_jahresmiete * (mietausfall_pa / 100)
-        cashflow_nach_steuer = aktuelle_jahresmiete - jaehrliche_rate_effektiv - aktuelle_instandhaltung - mietausfall_betrag + steuerersparnis
-        monatliche_gesamtkosten = (jaehrliche_rate_effektiv + aktuelle_instandhaltung + mietausfall_betrag) / 12
-        monatlicher_eigenaufwand = monatliche_gesamtkosten - (aktuelle_jahresmiete / 12)
-
-        aktueller_immobilienwert *= (1 + wertsteigerung_pa / 100)
-        aktuelles_vermoegen_netto = aktueller_immobilienwert - restschuld
-
-        zugewinn_gesamt = aktuelles_vermoegen_netto - anfangs_vermoegen_netto
-        ausgleichszahlung_scheidung = 0.0
-        if eigentums_modus == "Alleineigentum (Eine Person)" and not vertrag_ausschluss_zugewinn and zugewinn_gesamt > 0:
-            ausgleichszahlung_scheidung = zugewinn_gesamt / 2
-
-        vorfaelligkeitsentschaedigung = 0.0
-        if jahr < zinsbindung:
-            vorfaelligkeitsentschaedigung = restschuld * (max(0, zinssatz - marktzins_verkauf) / 100) * (
-                        zinsbindung - jahr)
-
-        verkaufskosten = aktueller_immobilienwert * (verkaufskosten_prozent / 100)
-        spekulationssteuer = 0.0
-        if jahr < 10:
-            buchwert_steuer = (grundstueckspreis + baukosten) - kumulierte_afa_total
-            veraeusserungsgewinn = (aktueller_immobilienwert - verkaufskosten) - buchwert_steuer
-            if veraeusserungsgewinn > 0:
-                spekulationssteuer = veraeusserungsgewinn * grenzsteuersatz
-
-        netto_erloes_verkauf = aktueller_immobilienwert - restschuld - vorfaelligkeitsentschaedigung - verkaufskosten - spekulationssteuer
-
-        jahres_daten.append({
-            "Jahr": int(jahr),
-            "Einkommen (zvE)": ek_a + ek_b,
-            "Grenzsteuersatz (%)": round(grenzsteuersatz * 100, 1),
-            "Restschuld": max(0, restschuld),
-            "Mieteinnahmen": aktuelle_jahresmiete,
-            "Instandhaltung": aktuelle_instandhaltung,
-            "Mietausfall": mietausfall_betrag,
-            "Zinsanteil": zinsanteil_jahr,
-            "Tilgungsanteil": tilgungsanteil_jahr,
-            "Monatliche Gesamtkosten": monatliche_gesamtkosten,
-            "Monatlicher Eigenaufwand": monatlicher_eigenaufwand,
-            "AfA": afa_info['afa'],
-            "Sonder-AfA (§7b)": afa_info['sonder_afa'],
-            "AfA Gesamt": afa_jahr,
-            "AfA (Methode)": afa_info['methode_label'],
-            "Buchwert Gebäude": afa_info['buchwert'],
-            "Kumulierte AfA": kumulierte_afa_total,
-            "Steuerersparnis": steuerersparnis,
-            "Cashflow": cashflow_nach_steuer,
-            "Immobilienwert": aktueller_immobilienwert,
-            "Vermögen": aktuelles_vermoegen_netto,
-            "Zuwachs Vermögen": aktuelles_vermoegen_netto - vermoegen_vorjahr,
-            "Vorfälligkeitsentschädigung (Exit)": vorfaelligkeitsentschaedigung,
-            "Netto-Erlös bei Verkauf (Exit)": netto_erloes_verkauf,
-            "Scheidung: Ausgleichszahlung": ausgleichszahlung_scheidung,
-        })
-
-        vermoegen_vorjahr = aktuelles_vermoegen_netto
-        aktuelle_jahresmiete *= (1 + mietsteigerung_pa / 100)
-        aktuelle_instandhaltung *= (1 + kostensteigerung_pa / 100)
-
-    df_projektion = pd.DataFrame(jahres_daten)
+    params = {
+        "szenario": "neubau",
+        "grundstueckspreis": grundstueckspreis,
+        "baukosten": baukosten,
+        "kreditbetrag": kreditbetrag,
+        "startkapital_gesamt": startkapital_gesamt,
+        "afa_methode": afa_methode,
+        "switch_year": switch_year,
+        "wohnflaeche_m2": wohnflaeche_m2,
+        "zinssatz": zinssatz,
+        "tilgung": tilgung,
+        "zinsbindung": zinsbindung,
+        "mieteinnahmen_pm": mieteinnahmen_pm,
+        "mietsteigerung_pa": mietsteigerung_pa,
+        "instandhaltung_pa": instandhaltung_pa,
+        "mietausfall_pa": mietausfall_pa,
+        "kostensteigerung_pa": kostensteigerung_pa,
+        "wertsteigerung_pa": wertsteigerung_pa,
+        "std_einkommen_mann": std_einkommen_mann,
+        "std_einkommen_frau": std_einkommen_frau,
+        "nutze_sonderzeitraum": nutze_sonderzeitraum,
+        "sonder_jahre": tuple(sonder_jahre),
+        "sonder_einkommen_mann": sonder_einkommen_mann,
+        "sonder_einkommen_frau": sonder_einkommen_frau,
+        "alleineigentum": eigentums_modus == "Alleineigentum (Eine Person)",
+        "vertrag_ausschluss_zugewinn": vertrag_ausschluss_zugewinn,
+        "anteil_a_prozent": anteil_a_prozent,
+        "anteil_b_prozent": anteil_b_prozent,
+        "marktzins_verkauf": marktzins_verkauf,
+        "verkaufskosten_prozent": verkaufskosten_prozent,
+        "tranchen": tranchen_tabelle,
+    }
+    st.session_state["v2_projektion_hash"] = input_hash(params)
+    df_projektion = cached_projektion(params, berechne_projektion)
+    jahr = len(df_projektion)
+
+    render_zielsuche(params, berechne_projektion_batch, {
+        "Tilgung (%)": {
+            "aktuell": tilgung, "bereich": (1.0, 10.0), "toleranz": 0.005, "nachkomma": 2,
+            "varianten": lambda x: {"tilgung": x}, "key": "nb_tilgung",
+        },
+        "Eigenkapital (€)": {
+            "aktuell": startkapital_gesamt, "bereich": (0.0, gesamtinvestition - 1_000), "toleranz": 100.0,
+            "varianten": lambda x: {"startkapital_gesamt": x, "kreditbetrag": gesamtinvestition - x},
+            "key": "shared_ek_a", "versatz": eigenkapital_a - startkapital_gesamt,
+        },
+    }, key_suffix="nb")
 
     # =========================================================================
     # ANZEIGE
@@ -442,19 +474,15 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
 
     with col2:
         formeln = get_formeln("Neubau (Investitions-Immobilie)")
-        tab_t, tab_g, tab_a, tab_f = st.tabs(["Tabelle", "Graph", "Analyse & Risiken", "📚 Formeln"])
+        tab_t, tab_g, tab_a, tab_v, tab_f = st.tabs(
+            ["Tabelle", "Graph", "Analyse & Risiken", "Varianten", "📚 Formeln"]
+        )
 
         with tab_t:
-            cols_all = df_display.columns.tolist()
             cols_default = ["Jahr", "Restschuld", "Mieteinnahmen", "Instandhaltung", "AfA", "Sonder-AfA (§7b)",
                             "Steuerersparnis", "Cashflow", "Vermögen"]
-            cols_selected = st.multiselect("Spalten anzeigen:", cols_all, default=cols_default)
-            df_filtered = df_display[cols_selected]
-            format_dict = {col: "{:,.2f} €" for col in cols_selected if
-                           col not in ["Jahr", "Grenzsteuersatz (%)", "AfA (Methode)"]}
-            if "Jahr" in cols_selected: format_dict["Jahr"] = "{:.0f}"
-            styler = df_filtered.style.format(format_dict).hide(axis="index")
-            st.dataframe(styler, use_container_width=True, height=700, hide_index=True)
+            render_table_tab(df_display, cols_default, key_suffix="neubau_v2",
+                             sonder_jahre=sonder_jahre if nutze_sonderzeitraum else None)
 
         with tab_g:
             render_graph_tab(df_display, default_cols=["Restschuld", "Immobilienwert", "Vermögen",
@@ -464,7 +492,7 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
             st.markdown("## 🧐 Experteneinschätzung & Risiko-Check (2026)")
 
             with st.expander("1. Neubau-Booster & Abschreibung (AfA)", expanded=True):
-                afa_jahr1 = afa_schedule[0]['afa'] + afa_schedule[0]['sonder_afa']
+                afa_jahr1 = df_projektion.iloc[0]["AfA Gesamt"]
                 st.write(f"Im ersten Jahr: **{afa_jahr1:,.0f} €** steuerlich absetzbar ({afa_methode}).")
                 if afa_methode == "Degressiv + §7b Sonder-AfA":
                     st.success("🚀 **Steuer-Turbo:** Nutze die Liquiditätsspitze für Sondertilgung!")
@@ -488,5 +516,27 @@ def render(inflationsrate: float, wizard_defaults: dict = None):
                 else:
                     st.success("✅ Schuldenfrei am Ende der Zinsbindung.")
 
+            with st.expander("4. Anschlussfinanzierung: Zinsszenarien", expanded=restschuld_zinsbindung > 0):
+                render_zinsrisiko(df_projektion, zinssatz, zinsbindung, key_suffix="neubau_v2")
+
+            with st.expander("5. Sondertilgung optimieren", expanded=False):
+                render_sondertilgung(params, berechne_projektion_batch, key_suffix="neubau_v2")
+
+            with st.expander("6. Exit-Zeitpunkt unter Unsicherheit", expanded=False):
+                render_exit_analyse(params, berechne_projektion_batch, key_suffix="neubau_v2", wertspalte="Immobilienwert")
+
+            with st.expander("7. Finanzierbarkeit (Bankensicht)", expanded=False):
+                objektwert = grundstueckspreis + baukosten
+                render_tragfaehigkeit(params, nebenkosten_prozent=(gesamtkosten / objektwert - 1) * 100,
+                                      kaufpreis=objektwert, key_suffix="neubau_v2",
+                                      objekt_label="Objektwert (Grundstück + Bau)")
+
+            with st.expander("8. Finanzierungsstruktur: Pareto-Front", expanded=False):
+                render_pareto(params, berechne_projektion_batch, gesamtinvestition=gesamtinvestition,
+                              anfangswert=objektwert, key_suffix="neubau_v2")
+
+        with tab_v:
+            render_varianten_tab(params, berechne_projektion_batch, key_suffix="neubau_v2", wertspalte="Immobilienwert")
+
         with tab_f:
             render_formeln_tab(formeln, key_suffix="neubau_v2")
@@ -0,0 +1,232 @@
+"""Scenario: Immobilien-Portfolio (mehrere Objekte) — V2.
+
+Projects several rental properties of one household. Every property has its
+own loan and AfA; the V+V results of all properties are taxed together in one
+joint assessment per year, so the progression is applied to the sum.
+"""
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+
+from calculations import engine
+from calculations.formulas import get_formeln
+from calculations.scenario_store import cached_projektion, input_hash
+from calculations.ui_helpers import (
+    render_toggles,
+    apply_inflation,
+    render_table_tab,
+    render_graph_tab,
+    render_formeln_tab,
+)
+from calculations.state_management import (
+    persistent_data_editor,
+    persistent_number_input,
+    persistent_slider,
+)
+
+MAX_OBJEKTE = 100
+
+OBJEKT_SPALTEN = {
+    "Objekt": None,
+    "Kaufpreis (€)": "kaufpreis",
+    "Nebenkosten (%)": "nebenkosten_prozent",
+    "Eigenkapital (€)": "eigenkapital",
+    "Zinssatz (%)": "zinssatz",
+    "Tilgung (%)": "tilgung",
+    "Kaltmiete (€/M)": "miete_pm",
+    "Instandhaltung (€/J)": "instandhaltung_pa",
+    "Grundstücksanteil (%)": "anteil_grundstueck",
+    "AfA-Satz (%)": "afa_satz",
+    "Wertsteigerung (%)": "wertsteigerung_pa",
+}
+
+_BEISPIEL_OBJEKTE = pd.DataFrame([
+    ["Wohnung 1", 300_000.0, 10.0, 60_000.0, 3.5, 2.0, 1_000.0, 1_500.0, 30.0, 2.0, 2.0],
+    ["Wohnung 2", 250_000.0, 10.0, 50_000.0, 3.8, 2.0, 850.0, 1_200.0, 30.0, 2.0, 1.5],
+], columns=list(OBJEKT_SPALTEN))
+
+
+def _d(wizard_defaults, key, fallback):
+    val = wizard_defaults[key] if wizard_defaults and key in wizard_defaults else fallback
+    if isinstance(fallback, float):
+        try:
+            return float(val)
+        except (ValueError, TypeError):
+            pass
+    return val
+
+
+def _objekt_arrays(objekte: list) -> dict:
+    """Column arrays of the valid property rows (missing numbers count as 0)."""
+    df = pd.DataFrame(list(objekte), columns=list(OBJEKT_SPALTEN))
+    df = df[pd.to_numeric(df["Kaufpreis (€)"], errors="coerce") > 0].head(MAX_OBJEKTE)
+    werte = {key: pd.to_numeric(df[spalte], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+             for spalte, key in OBJEKT_SPALTEN.items() if key}
+    werte["namen"] = [str(n) if isinstance(n, str) and n.strip() else f"Objekt {i + 1}"
+                      for i, n in enumerate(df["Objekt"])]
+    werte["gesamtinvestition"] = werte["kaufpreis"] * (1 + werte["nebenkosten_prozent"] / 100)
+    werte["kreditbetrag"] = np.maximum(werte["gesamtinvestition"] - werte["eigenkapital"], 0.0)
+    return werte
+
+
+def berechne_portfolio(p: dict) -> dict:
+    """Per-property summary and yearly household projection for the input dict *p*."""
+    o = _objekt_arrays(p["objekte"])
+    res = engine.haushalt_portfolio(
+        kaufpreis=o["kaufpreis"],
+        kreditbetrag=o["kreditbetrag"],
+        zinssatz=o["zinssatz"],
+        tilgung=o["tilgung"],
+        miete_pm=o["miete_pm"],
+        instandhaltung_pa=o["instandhaltung_pa"],
+        anteil_grundstueck=o["anteil_grundstueck"],
+        afa_satz=o["afa_satz"],
+        wertsteigerung_pa=o["wertsteigerung_pa"],
+        mietsteigerung_pa=p["mietsteigerung_pa"],
+        kostensteigerung_pa=p["kostensteigerung_pa"],
+        mietausfall_pa=p["mietausfall_pa"],
+        einkommen_a=p["std_einkommen_mann"],
+        einkommen_b=p["std_einkommen_frau"],
+        jahre=p["jahre"],
+    )
+    obj = res["objekte"]
+    df_objekte = pd.DataFrame({
+        "Objekt": o["namen"],
+        "Gesamtinvestition": o["gesamtinvestition"],
+        "Kreditbetrag": o["kreditbetrag"],
+        "Monatliche Rate": res["jaehrliche_rate"] / 12,
+        "Volltilgung nach (J)": res["laufzeit"],
+        "Zinsen gesamt": obj["Zinsanteil"].sum(axis=1),
+        "Ø Cashflow vor Steuer": obj["Cashflow vor Steuer"].mean(axis=1),
+        "Steuerwirkung (marginal)": obj["Steuerwirkung (marginal)"].sum(axis=1),
+        "Steuerwirkung (einzeln)": obj["Steuerwirkung (einzeln)"].sum(axis=1),
+        "Vermögen Ende": obj["Vermögen"][:, -1],
+    })
+    return {"objekte": df_objekte, "haushalt": pd.DataFrame(res["haushalt"])}
+
+
+def render(inflationsrate: float, wizard_defaults: dict = None):
+    """Renders the multi-property household portfolio."""
+
+    # =========================================================================
+    # SIDEBAR INPUTS
+    # =========================================================================
+    with st.sidebar.expander("1. Markt & Kosten", expanded=True):
+        mietsteigerung_pa = persistent_slider("Jährliche Mietsteigerung (%)", 0.0, 5.0, 2.0, 0.1,
+                                              key="pf_mietsteigerung")
+        kostensteigerung_pa = persistent_slider("Kostensteigerung Instandhaltung (%)", 0.0, 10.0, 2.0, 0.1,
+                                                key="pf_kostensteigerung")
+        mietausfall_pa = persistent_slider("Mietausfallwagnis (%)", 0.0, 10.0, 2.0, 0.5, key="pf_mietausfall",
+                                           help="Anteil der Jahresmiete, der durch Leerstand ausfällt.")
+        jahre = persistent_slider("Betrachtungszeitraum (Jahre)", 5, 60, 30, key="pf_jahre")
+
+    with st.sidebar.expander("2. Einkommen & Steuer (2026)", expanded=False):
+        st.caption("Einkommen für Zusammenveranlagung (Ehegattensplitting)")
+        std_einkommen_mann = persistent_number_input(
+            "Brutto-Einkommen Person A (Standard) €",
+            value=_d(wizard_defaults, "v2_einkommen_a", 71_000),
+            step=1_000, key="shared_ek_mann", help="Zu versteuerndes Jahreseinkommen Person A."
+        )
+        std_einkommen_frau = persistent_number_input(
+            "Brutto-Einkommen Person B (Standard) €",
+            value=_d(wizard_defaults, "v2_einkommen_b", 80_000),
+            step=1_000, key="shared_ek_frau", help="Zu versteuerndes Jahreseinkommen Person B."
+        )
+
+    st.markdown("#### Objekte")
+    st.caption(f"Bis zu {MAX_OBJEKTE} Objekte, je mit eigenem Annuitätendarlehen "
+               "(Kredit = Kaufpreis + Nebenkosten − Eigenkapital) und linearer AfA auf den Gebäudeanteil.")
+    objekte = persistent_data_editor(
+        _BEISPIEL_OBJEKTE,
+        key="pf_objekte",
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "Objekt": st.column_config.TextColumn(required=True),
+            "Kaufpreis (€)": st.column_config.NumberColumn(min_value=0.0, step=5_000.0, format="%.0f"),
+            "Eigenkapital (€)": st.column_config.NumberColumn(min_value=0.0, step=5_000.0, format="%.0f"),
+            "Kaltmiete (€/M)": st.column_config.NumberColumn(min_value=0.0, step=50.0, format="%.0f"),
+            "Instandhaltung (€/J)": st.column_config.NumberColumn(min_value=0.0, step=100.0, format="%.0f"),
+        },
+    )
+
+    # =========================================================================
+    # BERECHNUNG
+    # =========================================================================
+    params = {
+        "szenario": "portfolio",
+        "objekte": objekte.to_dict("records"),
+        "mietsteigerung_pa": mietsteigerung_pa,
+        "kostensteigerung_pa": kostensteigerung_pa,
+        "mietausfall_pa": mietausfall_pa,
+        "jahre": jahre,
+        "std_einkommen_mann": std_einkommen_mann,
+        "std_einkommen_frau": std_einkommen_frau,
+    }
+    if _objekt_arrays(params["objekte"])["kaufpreis"].size == 0:
+        st.info("Bitte mindestens ein Objekt mit Kaufpreis anlegen.")
+        st.stop()
+
+    st.session_state["v2_projektion_hash"] = input_hash(params)
+    ergebnis = cached_projektion(params, berechne_portfolio)
+    df_objekte, df_haushalt = ergebnis["objekte"], ergebnis["haushalt"]
+
+    # =========================================================================
+    # ANZEIGE
+    # =========================================================================
+    col1, col2 = st.columns([1, 3])
+    with col2:
+        show_inflation = render_toggles()
+
+    if show_inflation and inflationsrate > 0:
+        df_display = apply_inflation(df_haushalt, inflationsrate, exclude_cols=["Jahr", "Grenzsteuersatz (%)"])
+    else:
+        df_display = df_haushalt
+
+    with col1:
+        st.subheader("Übersicht")
+        if show_inflation:
+            st.caption(f"⚠️ Werte inflationsbereinigt ({inflationsrate}%)")
+        col_m1, col_m2 = st.columns(2)
+        with col_m1:
+            st.metric("Objekte", f"{len(df_objekte)}")
+            st.metric("Kredit gesamt", f"{df_objekte['Kreditbetrag'].sum():,.0f} €")
+            st.metric("Ø Cashflow (nach Steuer)", f"{df_display['Cashflow'].mean():,.0f} €")
+        with col_m2:
+            st.metric("Gesamtinvestition", f"{df_objekte['Gesamtinvestition'].sum():,.0f} €")
+            st.metric("Monatliche Raten", f"{df_objekte['Monatliche Rate'].sum():,.0f} €")
+            st.metric("Vermögen Ende", f"{df_display.iloc[-1]['Vermögen']:,.0f} €")
+        st.metric("Gesamte Steuerersparnis", f"{df_display['Steuerersparnis'].sum():,.0f} €",
+                  help="Gemeinsame Veranlagung aller Objekte: Steuer ohne Immobilien minus Steuer mit allen Objekten.")
+
+    with col2:
+        formeln = get_formeln("Immobilienkauf (innerhalb Familie)")
+        tab_o, tab_t, tab_g, tab_f = st.tabs(["Objekte", "Haushalt (Tabelle)", "Graph", "📚 Formeln"])
+
+        with tab_o:
+            st.dataframe(
+                df_objekte.style.format("{:,.0f}", subset=df_objekte.columns[1:]),
+                use_container_width=True, hide_index=True,
+            )
+            summe_einzeln = df_objekte["Steuerwirkung (einzeln)"].sum()
+            summe_haushalt = df_haushalt["Steuerersparnis"].sum()
+            st.caption(
+                "**Steuerwirkung (marginal):** Steuer des Haushalts ohne dieses Objekt minus Steuer mit allen Objekten. "
+                "**Steuerwirkung (einzeln):** Objekt allein betrachtet. Summe der Einzelbetrachtungen "
+                f"{summe_einzeln:,.0f} € vs. gemeinsame Veranlagung {summe_haushalt:,.0f} € "
+                f"(Differenz {summe_haushalt - summe_einzeln:+,.0f} € durch die Progression)."
+            )
+
+        with tab_t:
+            cols_default = ["Jahr", "Restschuld", "Mieteinnahmen", "Ergebnis V+V", "Steuerersparnis", "Cashflow",
+                            "Vermögen"]
+            render_table_tab(df_display, cols_default, key_suffix="portfolio_v2")
+
+        with tab_g:
+            render_graph_tab(df_display, default_cols=["Restschuld", "Immobilienwert", "Vermögen"],
+                             key_suffix="portfolio_v2")
+
+        with tab_f:
+            render_formeln_tab(formeln, key_suffix="portfolio_v2")
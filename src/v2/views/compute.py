@@ -1,5 +1,6 @@
 """Compute executive-overview summary statistics for all 3 scenarios."""
 
+from calculations import etf_steuer
 from calculations.tax import get_steuerlast_zusammen
 
 
@@ -7,6 +8,10 @@ def compute_all_scenarios(wizard_defaults: dict) -> dict:
     """
     Run lightweight versions of all 3 scenario calculations using wizard defaults
     and return a dict of summary metrics for the executive overview.
+
+    The exact computation takes well under a millisecond, so the overview is
+    always computed exactly; a precomputed, interpolated grid would be slower
+    to load than to recompute and only approximate.
     """
     results = {}
 
@@ -229,18 +234,9 @@ def _calc_neubau(
 
 
 def _calc_etf(startkapital, etf_rendite, sparrate, laufzeit):
-    kapital = float(startkapital)
-    eingezahlt = float(startkapital)
-    r_monatlich = etf_rendite / 100 / 12
-
-    for _ in range(laufzeit):
-        for _m in range(12):
-            kapital = kapital * (1 + r_monatlich) + sparrate
-            eingezahlt += sparrate
-
-    gewinn = kapital - eingezahlt
-    steuer = max(0.0, float(gewinn) * 0.185)
-    netto = kapital - steuer
+    res = etf_steuer.sparplan(startkapital, etf_rendite, sparrate, laufzeit, personen=2)
+    gewinn = float(res["Gewinn (unrealisiert)"][0, -1])
+    netto = float(res["Netto Vermögen (n. St.)"][0, -1])
 
     return {
         "endvermoegen": netto,
@@ -1,12 +1,106 @@
 """Professional Plan — v1-style full calculation with wizard pre-fills."""
 
+import secrets
+
 import streamlit as st
 
+from calculations import scenario_store
+
+# URL parameter holding the private key of the saved scenarios (without login)
+ABLAGE_PARAM = "ablage"
+
 
 def _nav_to(page: str):
     st.session_state["v2_page"] = page
 
 
+def _besitzer() -> str:
+    """Owner key of the saved scenarios: the login if the app uses one, else a random key kept in the URL."""
+    nutzer = getattr(st, "user", None)
+    try:
+        if nutzer is not None and nutzer.is_logged_in and nutzer.get("email"):
+            return f"login:{nutzer.email}"
+    except (AttributeError, KeyError):  # no authentication configured
+        pass
+    schluessel = st.query_params.get(ABLAGE_PARAM)
+    if not schluessel:
+        schluessel = secrets.token_urlsafe(16)
+        st.query_params[ABLAGE_PARAM] = schluessel
+    return f"link:{schluessel}"
+
+
+def _szenario_speichern(besitzer: str, name: str, szenario: str):
+    params = {
+        "data": dict(st.session_state.get("data", {})),
+        "wizard_defaults": dict(st.session_state.get("v2_wizard_defaults", {})),
+    }
+    ueberschreiben = st.session_state.get("v2_store_ueberschreiben", False)
+    if scenario_store.speichere_szenario(besitzer, name, szenario, params, st.session_state.get("v2_projektion_hash"),
+                                         ueberschreiben=ueberschreiben):
+        st.session_state["v2_store_msg"] = f"Szenario '{name}' gespeichert."
+        st.session_state["v2_store_ueberschreiben"] = False
+    else:
+        st.session_state["v2_store_warnung"] = (f"Szenario '{name}' existiert bereits. "
+                                                "Zum Ersetzen 'Vorhandenes überschreiben' anhaken.")
+
+
+def _szenario_laden(besitzer: str, name: str):
+    gespeichert = scenario_store.lade_szenario(besitzer, name)
+    if gespeichert is None:
+        return
+    params = gespeichert["params"]
+    for key, val in params.get("data", {}).items():
+        # JSON turns tuples (range sliders) into lists
+        val = tuple(val) if isinstance(val, list) else val
+        st.session_state.setdefault("data", {})[key] = val
+        # Drop the widget state so the persistent widget re-reads the value from 'data'
+        st.session_state.pop(key, None)
+    st.session_state["v2_wizard_defaults"] = params.get("wizard_defaults", {})
+    st.session_state["v2_szenario"] = gespeichert["szenario"]
+    st.session_state["v2_store_msg"] = f"Szenario '{name}' geladen."
+
+
+def _render_szenario_store(szenario: str):
+    """Sidebar block to save / load named parameter sets (SQLite-backed)."""
+    if not scenario_store.is_available():
+        return
+    besitzer = _besitzer()
+    with st.sidebar.expander("💾 Szenarien speichern / laden", expanded=False):
+        if besitzer.startswith("link:"):
+            st.caption("Gespeicherte Szenarien sind nur über diesen Link erreichbar (Lesezeichen setzen).")
+        name = st.text_input("Name (z.B. Kunde oder Variante)", key="v2_store_name")
+        gespeichert = scenario_store.liste_szenarien(besitzer)
+        if name in gespeichert:
+            st.checkbox("Vorhandenes überschreiben", key="v2_store_ueberschreiben")
+        st.button("Speichern", on_click=_szenario_speichern, args=(besitzer, name, szenario), disabled=not name,
+                  use_container_width=True)
+        if gespeichert:
+            auswahl = st.selectbox("Gespeicherte Szenarien", gespeichert, key="v2_store_auswahl")
+            col_l, col_d = st.columns(2)
+            with col_l:
+                st.button("Laden", on_click=_szenario_laden, args=(besitzer, auswahl), use_container_width=True)
+            with col_d:
+                st.button("Löschen", on_click=scenario_store.loesche_szenario, args=(besitzer, auswahl),
+                          use_container_width=True)
+        warnung = st.session_state.pop("v2_store_warnung", None)
+        if warnung:
+            st.warning(warnung)
+        msg = st.session_state.pop("v2_store_msg", None)
+        if msg:
+            st.success(msg)
+
+
+def _render_cache_statistik():
+    """Sidebar caption with the hit rate of the projection cache shared by all sessions."""
+    stats = scenario_store.cache_statistik()
+    anfragen = stats["memory"] + stats["sqlite"] + stats["miss"]
+    if anfragen:
+        st.sidebar.caption(
+            f"Berechnungs-Cache (alle Sitzungen): {stats['trefferquote']:.0%} Treffer bei {anfragen} Abrufen "
+            f"({stats['memory']} Speicher, {stats['sqlite']} SQLite, {stats['miss']} neu berechnet)."
+        )
+
+
 def render():
     st.sidebar.header("Szenario wählen")
 
@@ -15,9 +109,11 @@ def render():
         [
             "Immobilienkauf (innerhalb Familie)",
             "Neubau (Investitions-Immobilie)",
+            "Immobilien-Portfolio (mehrere Objekte)",
             "ETF-Sparplan (Alternative)",
         ],
         index=0,
+        key="v2_szenario",
         label_visibility="collapsed",
     )
 
@@ -25,6 +121,8 @@ def render():
         _nav_to("executive")
         st.rerun()
 
+    _render_szenario_store(szenario)
+
     st.sidebar.markdown("---")
     st.sidebar.header("Eingabeparameter")
 
@@ -51,6 +149,11 @@ def render():
     elif szenario == "Neubau (Investitions-Immobilie)":
         from scenarios.neubau import render as render_nb
         render_nb(inflationsrate, wizard_defaults=wizard_defaults)
+    elif szenario == "Immobilien-Portfolio (mehrere Objekte)":
+        from scenarios.portfolio import render as render_pf
+        render_pf(inflationsrate, wizard_defaults=wizard_defaults)
     else:
         from scenarios.etf_sparplan import render as render_etf
         render_etf(inflationsrate, wizard_defaults=wizard_defaults)
+
+    _render_cache_statistik()
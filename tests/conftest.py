@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app's packages (calculations, scenarios, views) live in src/v2 and are imported top-level.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "v2"))
@@ -0,0 +1,65 @@
+import numpy as np
+
+from calculations import darlehen, engine
+from calculations.formulas import funktion, get_formeln, suche
+
+REGISTER = get_formeln("Immobilienkauf (innerhalb Familie)")
+
+
+def _namen(text):
+    return {REGISTER["eintraege"][i]["Name"] for i in suche(REGISTER, text)}
+
+
+def test_prefix_matches_longer_tokens():
+    assert _namen("abschr") == _namen("abschreibung")
+    assert _namen("abschr")
+    assert _namen("Vorfälligk") == _namen("vorfalligkeitsentschadigung")
+
+
+def test_words_are_and_combined():
+    beide = _namen("afa gebaude")
+    assert beide
+    assert beide == _namen("afa") & _namen("gebaude")
+    assert beide < _namen("afa")
+
+
+def test_synonyms_and_misses():
+    assert _namen("afa") == _namen("abschreibung")
+    assert _namen("xyzunbekannt") == set()
+    assert suche(REGISTER, "") == list(range(len(REGISTER["eintraege"])))
+
+
+def _projektion(**afa):
+    return engine.projektion_batch(
+        kreditbetrag=[400_000, 600_000], zinssatz=3.5, tilgung=2.0, zinsbindung=15, anfangswert=[800_000, 900_000],
+        anschaffungskosten=[800_000, 900_000], miete_pm=2_500, mietsteigerung_pa=2.0, instandhaltung_pa=3_000,
+        kostensteigerung_pa=2.0, mietausfall_pa=2.0, wertsteigerung_pa=2.0, einkommen_a=90_000, einkommen_b=60_000,
+        spalten=["AfA", "Buchwert (steuerlich)", "Monatliche Gesamtkosten"], **afa,
+    )
+
+
+def test_afa_is_computed_by_the_plan():
+    assert "afa" in [e["Ergebnis"] for e in engine._plan(("AfA",), False)]
+    assert "afa" not in [e["Ergebnis"] for e in engine._plan(("AfA",), True)]
+
+    berechnet = _projektion(anteil_grundstueck=25.0)
+    vorgegeben = _projektion(afa=np.repeat([[12_000.0], [13_500.0]], engine.MAX_LAUFZEIT, axis=1))
+    for spalte in ("AfA", "Buchwert (steuerlich)"):
+        np.testing.assert_allclose(berechnet[spalte], vorgegeben[spalte])
+
+
+def test_loan_payment_follows_the_rate_formula():
+    plan = darlehen.tranchen_plan(100_000, 4.0, 10.0)
+    rate, zins, restschuld = plan["rate"][0], plan["zins"][0], plan["restschuld"][0]
+    vorjahr = np.concatenate([[100_000.0], restschuld[:-1]])
+    np.testing.assert_allclose(rate, funktion("rate")(plan["jaehrliche_rate"][0], zins, vorjahr))
+    assert rate[-1] < plan["jaehrliche_rate"][0]  # the last year pays only the rest
+
+
+def test_neubau_afa_entries_are_executable():
+    eintraege = {e["Name"]: e for e in get_formeln("Neubau (Investitions-Immobilie)")["eintraege"]}
+    for name in ("AfA Linear (§7 Abs. 4)", "AfA Degressiv (§7 Abs. 5a)", "Wechsel Degressiv → Linear",
+                 "§7b Sonder-AfA"):
+        assert "Funktion" in eintraege[name]
+    assert funktion("sonder_afa")(500_000.0, 100.0, 4) == 25_000.0
+    assert funktion("sonder_afa")(600_000.0, 100.0, 1) == 0.0  # above 5,200 EUR/m²
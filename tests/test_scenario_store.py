@@ -0,0 +1,12 @@
+import threading
+
+from calculations import scenario_store
+
+
+def test_unpicklable_result_is_returned_uncached(tmp_path, monkeypatch):
+    monkeypatch.setattr(scenario_store, "DB_PATH", str(tmp_path / "store.sqlite3"))
+    scenario_store.leere_speicher_cache()
+    ergebnis = {"sperre": threading.Lock()}  # cannot be pickled
+
+    assert scenario_store.cached_projektion({"test": "unpicklable"}, lambda p: ergebnis) is ergebnis
+    assert scenario_store.lade_projektion(scenario_store.input_hash({"test": "unpicklable"})) is None
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from calculations import engine
+from calculations.sondertilgung import mittlerer_grenzsteuersatz, optimiere
+
+
+def _projektion_mit_vv_gewinn():
+    # high rent on a small loan: the V+V result is a profit in every year
+    return engine.projektion_batch(
+        kreditbetrag=200_000, zinssatz=3.5, tilgung=2.0, zinsbindung=15, anfangswert=1_000_000,
+        anschaffungskosten=1_000_000, afa=12_000, miete_pm=4_000, mietsteigerung_pa=2.0, instandhaltung_pa=4_000,
+        kostensteigerung_pa=2.0, mietausfall_pa=2.0, wertsteigerung_pa=2.0, einkommen_a=120_000, einkommen_b=80_000,
+        spalten=["Grenzsteuersatz (%)", "zvE Haushalt (mit V+V)"],
+    )
+
+
+def test_grenzsteuersatz_bei_vv_gewinn_ist_positiv():
+    res = _projektion_mit_vv_gewinn()
+    # the register's effective rate on V+V is negative for a profit ...
+    assert np.nanmax(res["Grenzsteuersatz (%)"][0]) < 0
+    # ... the marginal rate of the tariff at the household zvE is not
+    assert mittlerer_grenzsteuersatz(res["zvE Haushalt (mit V+V)"][0]) == pytest.approx(42.0, abs=0.5)
+
+
+def test_negativer_grenzsteuersatz_wird_nicht_als_steuerlast_gerechnet():
+    kwargs = dict(budget_pm=1_000, cap_prozent=5.0, anlage_rendite=3.0)
+    ohne_steuer = optimiere(400_000, 3.5, 2.0, 15, grenzsteuersatz=0.0, **kwargs)
+    negativ = optimiere(400_000, 3.5, 2.0, 15, grenzsteuersatz=-13.6, **kwargs)
+    assert negativ["plan"]["Sondertilgung"].sum() == ohne_steuer["plan"]["Sondertilgung"].sum()
+
+
+def test_abzug_zum_grenzsteuersatz_macht_sondertilgung_unattraktiv():
+    res = optimiere(400_000, 3.2, 2.0, 15, budget_pm=1_000, cap_prozent=5.0, anlage_rendite=3.0,
+                    grenzsteuersatz=42.0)
+    assert res["plan"]["Sondertilgung"].sum() == 0
+
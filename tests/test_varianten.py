@@ -0,0 +1,20 @@
+import numpy as np
+
+from calculations.varianten import kennzahlen
+
+
+def test_vermoegen_in_one_common_year():
+    nan = np.nan
+    res = {
+        "laufzeit": np.array([2, 4]),
+        "jaehrliche_rate": np.array([12_000.0, 6_000.0]),
+        "Restschuld": np.array([[50.0, 0.0, nan, nan], [80.0, 60.0, 30.0, 0.0]]),
+        "Monatlicher Eigenaufwand": np.ones((2, 4)),
+        "Zinsanteil": np.ones((2, 4)),
+        "Steuerersparnis": np.zeros((2, 4)),
+        "Vermögen": np.array([[100.0, 150.0, nan, nan], [100.0, 120.0, 140.0, 170.0]]),
+    }
+    kz = kennzahlen(res, ["kurz", "lang"], [1, 1])
+
+    assert "Vermögen in Jahr 4" in kz.index
+    assert kz.loc["Vermögen in Jahr 4"].tolist() == [150.0, 170.0]
@@ -0,0 +1,30 @@
+import numpy as np
+
+from calculations.zielsuche import loese
+
+
+def _batch(steigung):
+    # Eigenaufwand constant over the years, linear in the candidate value
+    def berechne_batch(p, varianten, spalten=None):
+        werte = steigung * np.asarray(varianten["x"], dtype=float)
+        return {"Monatlicher Eigenaufwand": np.repeat(werte[:, None], 3, axis=1)}
+    return berechne_batch
+
+
+def _loese(steigung, zielwert):
+    return loese(_batch(steigung), {}, lambda x: {"x": x}, "Ø Monatlicher Eigenaufwand (€)", zielwert,
+                 0.0, 1000.0, toleranz=0.5)
+
+
+def test_rising_figure_stays_within_goal():
+    ergebnis = _loese(1.0, 800.0)
+    assert ergebnis["gefunden"]
+    assert ergebnis["erreicht"] <= 800.0
+    assert 800.0 - ergebnis["erreicht"] <= 0.5
+
+
+def test_falling_figure_stays_within_goal():
+    ergebnis = _loese(-1.0, -300.0)
+    assert ergebnis["gefunden"]
+    assert ergebnis["erreicht"] <= -300.0
+    assert ergebnis["wert"] - 300.0 <= 0.5